@@ -0,0 +1,203 @@
+"""
+Access tokens and role dependencies for the API.
+
+verify_token() checks the bearer JWT once per token rather than once per
+request: verified claims are kept in a bounded LRU cache keyed by the raw
+token, so the dozen calls an admin dashboard makes per page view decode the
+token only on the first. A cached entry is only served until the token's
+exp, and revoked tokens (see TokenCache.revoke) are rejected before the
+cache is consulted.
+
+Handlers depend on require_customer, require_admin or require_superadmin,
+which return a Principal instead of the raw claims.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+import jwt
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+SECRET_KEY = "your-secret-key-change-in-production"
+ALGORITHM = "HS256"
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+
+class RevokedTokenError(jwt.InvalidTokenError):
+    """The token was revoked before it expired"""
+
+
+class TokenCache:
+    """Bounded LRU cache of verified token claims, keyed by the encoded token"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # token -> claims
+        self._revoked = {}  # token -> exp
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._rejected = 0
+        self._decode_total = 0.0
+
+    def verify(self, token: str) -> dict:
+        """Return the claims of a valid token; raises jwt.PyJWTError"""
+        with self._lock:
+            if token in self._revoked:
+                self._rejected += 1
+                raise RevokedTokenError("Token has been revoked")
+            claims = self._entries.get(token)
+            if claims is not None:
+                if claims["exp"] > time.time():
+                    self._entries.move_to_end(token)
+                    self._hits += 1
+                    return claims
+                # Expired since it was cached; jwt.decode() below raises
+                del self._entries[token]
+                self._expired += 1
+            self._misses += 1
+
+        start = time.perf_counter()
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp"]})
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._decode_total += elapsed
+            if token not in self._revoked:
+                self._entries[token] = claims
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+        return claims
+
+    def revoke(self, token: str, expires_at: float):
+        """Reject token from now until it would have expired anyway"""
+        now = time.time()
+        with self._lock:
+            self._entries.pop(token, None)
+            # Forget revocations of tokens that have expired on their own
+            for revoked, exp in list(self._revoked.items()):
+                if exp <= now:
+                    del self._revoked[revoked]
+            if expires_at > now:
+                self._revoked[token] = expires_at
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "expired": self._expired,
+                "evictions": self._evictions,
+                "revoked": len(self._revoked),
+                "rejected_revoked": self._rejected,
+                "avg_decode_us": round(self._decode_total / self._misses * 1e6, 2) if self._misses else 0.0,
+            }
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
+
+class Principal:
+    """The caller a verified token belongs to"""
+
+    __slots__ = ("subject", "role", "user_id", "restaurant_id", "email", "token", "expires_at")
+
+    def __init__(self, claims: dict, token: str):
+        self.subject = claims["sub"]
+        self.role = claims.get("role")
+        # Admin tokens carry the restaurant's admin_id as their subject
+        self.user_id = int(self.subject) if self.role in ("customer", "superadmin") else None
+        self.restaurant_id = claims.get("restaurant_id")
+        self.email = claims.get("email")
+        self.token = token
+        self.expires_at = claims["exp"]
+
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    """Create JWT access token"""
+    to_encode = data.copy()
+    if expires_delta:
+        expire = datetime.utcnow() + expires_delta
+    else:
+        expire = datetime.utcnow() + timedelta(hours=24)
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+
+def _invalid_credentials():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Verify JWT token"""
+    try:
+        return token_cache.verify(credentials.credentials)
+    except jwt.PyJWTError:
+        raise _invalid_credentials()
+
+
+def _principal(token: str) -> Principal:
+    try:
+        return Principal(token_cache.verify(token), token)
+    except (jwt.PyJWTError, KeyError, ValueError):
+        raise _invalid_credentials()
+
+
+def get_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    """The caller behind a valid token, whatever their role"""
+    return _principal(credentials.credentials)
+
+
+def require_customer(principal: Principal = Depends(get_principal)) -> Principal:
+    if principal.role != 'customer':
+        raise HTTPException(status_code=403, detail="Customer access required")
+    return principal
+
+
+def require_admin(principal: Principal = Depends(get_principal)) -> Principal:
+    if principal.role != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if not principal.restaurant_id:
+        raise HTTPException(status_code=400, detail="Invalid admin token")
+    return principal
+
+
+def require_superadmin(principal: Principal = Depends(get_principal)) -> Principal:
+    if principal.role != 'superadmin':
+        raise HTTPException(status_code=403, detail="Super admin access required")
+    return principal
+
+
+def require_stream_admin(
+    access_token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+) -> Principal:
+    """require_admin for event streams, whose token may also come as an access_token query parameter
+
+    Browsers' EventSource cannot set an Authorization header.
+    """
+    token = credentials.credentials if credentials else access_token
+    if not token:
+        raise _invalid_credentials()
+    return require_admin(_principal(token))
@@ -0,0 +1,211 @@
+"""
+Time-slotted table availability.
+
+Bookings occupy a table for an interval [start, start + duration). The index
+keeps, per restaurant, each table's capacity and its booked intervals as a
+sorted list of disjoint (start, end) pairs in minutes, so "which tables seating
+N are free from T for D minutes" is one bisect per candidate table.
+
+The index is an in-process read model rebuilt from the bookings table on
+startup and updated after each committed booking. The first booking of each
+day also drops the bookings that ended before yesterday, so the index stays
+the size of the upcoming bookings however long the process runs. It answers
+searches only; create_booking re-checks the slot in SQL inside its
+transaction, so a stale index in another worker process can never cause a
+double booking.
+"""
+
+import bisect
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+DEFAULT_BOOKING_MINUTES = int(os.getenv("DEFAULT_BOOKING_MINUTES", "90"))
+MAX_BOOKING_MINUTES = 240
+
+_EPOCH = datetime(2000, 1, 1)
+
+
+def slot_start(date: str, time_of_day: str) -> int:
+    """Minutes since 2000-01-01 for a YYYY-MM-DD date and HH:MM time; raises ValueError"""
+    moment = datetime.strptime(f"{date} {time_of_day}", "%Y-%m-%d %H:%M")
+    return int((moment - _EPOCH).total_seconds() // 60)
+
+
+def day_start(days_ago: int = 0) -> int:
+    """slot_start() of midnight days_ago days before today, in the server's local time"""
+    return slot_start((date.today() - timedelta(days=days_ago)).isoformat(), "00:00")
+
+
+def slot_datetime(minutes: int) -> str:
+    """Inverse of slot_start(), formatted like SQLite's datetime()"""
+    return (_EPOCH + timedelta(minutes=minutes)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def slot_date_time(minutes: int) -> tuple:
+    """Inverse of slot_start() as the zero-padded (YYYY-MM-DD, HH:MM) stored in bookings
+
+    slot_start() accepts "7:00" and "2030-1-6"; bookings store the canonical
+    spelling so SQL date and time comparisons see every booking of a slot.
+    """
+    moment = slot_datetime(minutes)
+    return moment[:10], moment[11:16]
+
+
+class TableSlots:
+    """Booked intervals of one table"""
+
+    __slots__ = ("table_id", "number", "capacity", "type", "bookings", "starts", "ends")
+
+    def __init__(self, table_id: int, number: int, capacity: int, table_type: str):
+        self.table_id = table_id
+        self.number = number
+        self.capacity = capacity
+        self.type = table_type
+        self.bookings = {}  # booking_id -> (start, end)
+        self.starts = []
+        self.ends = []
+
+    def merge(self):
+        """Rebuild the disjoint interval lists from the booking map"""
+        starts, ends = [], []
+        for start, end in sorted(self.bookings.values()):
+            if ends and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        self.starts, self.ends = starts, ends
+
+    def add(self, booking_id: int, start: int, end: int):
+        self.bookings[booking_id] = (start, end)
+        # Insert in place, joining the intervals the new one overlaps or touches
+        first = bisect.bisect_left(self.starts, start)
+        if first and self.ends[first - 1] >= start:
+            first -= 1
+            start = self.starts[first]
+        last = bisect.bisect_right(self.starts, end, first)
+        if last > first:
+            end = max(end, self.ends[last - 1])
+        self.starts[first:last] = [start]
+        self.ends[first:last] = [end]
+
+    def prune(self, before: int):
+        """Drop bookings that ended before the given slot minute"""
+        kept = {booking_id: slot for booking_id, slot in self.bookings.items() if slot[1] >= before}
+        if len(kept) < len(self.bookings):
+            self.bookings = kept
+            self.merge()
+
+    def is_free(self, start: int, end: int) -> bool:
+        # Intervals are disjoint, so only the last one starting before `end` can overlap
+        index = bisect.bisect_left(self.starts, end) - 1
+        return index < 0 or self.ends[index] <= start
+
+
+class AvailabilityIndex:
+    """Per-restaurant table interval index"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._restaurants = {}  # restaurant_id -> list of TableSlots sorted by capacity
+        self._tables = {}  # table_id -> TableSlots
+        self._loaded_at = None
+        self._pruned_on = None
+        self._load_ms = 0.0
+        self._searches = 0
+        self._search_total = 0.0
+
+    def read(self, conn) -> tuple:
+        """Tables and upcoming confirmed bookings of one database, for replace()"""
+        start_time = time.perf_counter()
+        cursor = conn.cursor()
+        restaurants = {}
+        tables = {}
+
+        cursor.execute('''
+            SELECT id, restaurant_id, number, capacity, type
+            FROM tables ORDER BY restaurant_id, capacity, number
+        ''')
+        for row in cursor.fetchall():
+            slots = TableSlots(row['id'], row['number'], row['capacity'], row['type'])
+            tables[row['id']] = slots
+            restaurants.setdefault(row['restaurant_id'], []).append(slots)
+
+        # Past bookings can never conflict with a new one
+        since = (date.today() - timedelta(days=1)).isoformat()
+        cursor.execute('''
+            SELECT id, table_id, date, time, duration_minutes
+            FROM bookings
+            WHERE status = 'confirmed' AND date >= ?
+        ''', (since,))
+        for row in cursor.fetchall():
+            slots = tables.get(row['table_id'])
+            if slots is None:
+                continue
+            try:
+                start = slot_start(row['date'], row['time'])
+            except ValueError:
+                continue
+            slots.bookings[row['id']] = (start, start + row['duration_minutes'])
+
+        for slots in tables.values():
+            slots.merge()
+        return restaurants, tables, time.perf_counter() - start_time
+
+    def replace(self, parts: list):
+        """Swap in an index built from read() of each shard (just the one database when unsharded)"""
+        restaurants = {}
+        tables = {}
+        for shard_restaurants, shard_tables, _ in parts:
+            restaurants.update(shard_restaurants)
+            tables.update(shard_tables)
+
+        with self._lock:
+            self._restaurants = restaurants
+            self._tables = tables
+            self._loaded_at = datetime.utcnow().isoformat()
+            self._pruned_on = date.today()
+            self._load_ms = sum(elapsed for _, _, elapsed in parts) * 1000
+
+    def find_free_tables(self, restaurant_id: int, guests: int, start: int, duration: int) -> list:
+        """Tables seating at least `guests` that are free for the whole slot, smallest first"""
+        began = time.perf_counter()
+        end = start + duration
+        with self._lock:
+            free = [
+                {"id": slots.table_id, "number": slots.number, "capacity": slots.capacity, "type": slots.type}
+                for slots in self._restaurants.get(restaurant_id, ())
+                if slots.capacity >= guests and slots.is_free(start, end)
+            ]
+            self._searches += 1
+            self._search_total += time.perf_counter() - began
+        return free
+
+    def add_booking(self, table_id: int, booking_id: int, start: int, duration: int):
+        """Record a committed booking, first dropping past ones if the day has changed since the last prune"""
+        with self._lock:
+            if self._pruned_on != date.today():
+                before = day_start(days_ago=1)
+                for table in self._tables.values():
+                    table.prune(before)
+                self._pruned_on = date.today()
+            slots = self._tables.get(table_id)
+            if slots is not None:
+                slots.add(booking_id, start, start + duration)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "restaurants": len(self._restaurants),
+                "tables": len(self._tables),
+                "booked_intervals": sum(len(slots.starts) for slots in self._tables.values()),
+                "loaded_at": self._loaded_at,
+                "load_ms": round(self._load_ms, 3),
+                "searches": self._searches,
+                "avg_search_us": round(self._search_total / self._searches * 1e6, 2) if self._searches else 0.0,
+            }
+
+
+index = AvailabilityIndex()
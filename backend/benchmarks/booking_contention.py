@@ -0,0 +1,124 @@
+"""
+Booking contention stress check.
+
+Fires many simultaneous POST /api/bookings at one table and slot, spelled
+every way the API accepts ("7:00" and "07:00", "2030-6-7" and "2030-06-07"),
+and checks that exactly one wins, the rest get a clean 400, and none fail
+with a 5xx.
+A second round books distinct slots concurrently to measure write
+throughput under the same contention. A third books one slot once in each
+spelling the API accepts ("7:00" and "07:00", "2030-1-6" and "2030-01-06"),
+one after another, and checks that only the first succeeds.
+
+Usage:
+    python -m benchmarks.booking_contention [--requests 300]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
+
+from benchmarks.common import make_client, summarize, use_temp_database
+
+
+async def book(client, headers, payload, latencies):
+    start = time.perf_counter()
+    response = await client.post("/api/bookings", headers=headers, json=payload)
+    latencies.append(time.perf_counter() - start)
+    return response.status_code
+
+
+async def main(args) -> int:
+    use_temp_database()
+    import main as app_module
+
+    await app_module.app.router.startup()
+    try:
+        async with make_client(app_module.app) as client:
+            response = await client.post("/api/auth/signup", json={
+                "name": "Stress Tester", "email": "stress@example.com", "password": "stress-test"
+            })
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            # Round 1: everyone wants table 1 at the same time, in mixed spellings.
+            # Unpadded first, so a spelling-sensitive overlap check would let a
+            # padded request in beside the first winner.
+            same_slot = [
+                {"restaurant_id": 1, "table_id": 1, "date": date, "time": slot_time, "guests": 2}
+                for date in ("2030-6-7", "2030-06-07", "2030-6-07", "2030-06-7")
+                for slot_time in ("7:30", "07:30")
+            ]
+            contended = []
+            start = time.perf_counter()
+            codes = await asyncio.gather(*(
+                book(client, headers, same_slot[i % len(same_slot)], contended) for i in range(args.requests)
+            ))
+            contended_elapsed = time.perf_counter() - start
+
+            # Round 2: the same number of bookings, each for its own slot
+            distinct = []
+            payloads = [
+                {"restaurant_id": 1, "table_id": 2 + i % 10, "date": f"2030-07-{1 + i // 240:02d}",
+                 "time": f"{(i // 10) % 24:02d}:00", "duration_minutes": 60, "guests": 2}
+                for i in range(args.requests)
+            ]
+            start = time.perf_counter()
+            distinct_codes = await asyncio.gather(*(
+                book(client, headers, payload, distinct) for payload in payloads
+            ))
+            distinct_elapsed = time.perf_counter() - start
+
+            # Round 3: the same slot spelled differently, booked one after another
+            spellings = [
+                {"restaurant_id": 1, "table_id": 12, "date": date, "time": slot_time, "guests": 2}
+                for date, slot_time in (("2030-8-6", "7:00"), ("2030-08-06", "07:00"),
+                                        ("2030-08-06", "7:00"), ("2030-8-06", "07:00"))
+            ]
+            spelling_codes = [await book(client, headers, payload, []) for payload in spellings]
+    finally:
+        await app_module.app.router.shutdown()
+
+    contended_codes = Counter(codes)
+    distinct_codes = Counter(distinct_codes)
+    result = {
+        "same_slot": {
+            "status_codes": dict(contended_codes),
+            "requests_per_second": round(args.requests / contended_elapsed, 1),
+            "latency": summarize(contended),
+        },
+        "same_slot_spellings": {"status_codes": spelling_codes},
+        "distinct_slots": {
+            "status_codes": dict(distinct_codes),
+            "bookings_per_second": round(args.requests / distinct_elapsed, 1),
+            "latency": summarize(distinct),
+        },
+    }
+    print(json.dumps(result, indent=2))
+
+    failed = False
+    if contended_codes.get(200) != 1:
+        print(f"FAIL: {contended_codes.get(200, 0)} bookings won the same slot, expected exactly 1", file=sys.stderr)
+        failed = True
+    if contended_codes.get(400) != args.requests - 1:
+        print("FAIL: losing bookings did not all get 400", file=sys.stderr)
+        failed = True
+    if distinct_codes.get(200) != args.requests:
+        print("FAIL: not every distinct-slot booking succeeded", file=sys.stderr)
+        failed = True
+    if spelling_codes != [200] + [400] * (len(spelling_codes) - 1):
+        print(f"FAIL: one slot in different spellings got {spelling_codes}, expected one 200 then 400s",
+              file=sys.stderr)
+        failed = True
+    if failed:
+        return 1
+    print("OK: exactly one booking won the contended slot and no request failed")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    sys.exit(asyncio.run(main(parser.parse_args())))
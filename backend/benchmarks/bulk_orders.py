@@ -0,0 +1,87 @@
+"""
+Bulk order ingestion benchmark.
+
+Uploads the same set of orders twice: once as individual POST /api/orders
+calls (one transaction each) and once as POST /api/orders/bulk batches (one
+transaction and two executemany calls per batch), and compares throughput.
+
+Usage:
+    python -m benchmarks.bulk_orders [--orders 2000] [--batch-size 200] [--items 3]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from benchmarks.common import make_client, use_temp_database
+
+
+def make_orders(count: int, items: int) -> list:
+    return [
+        {
+            "restaurant_id": 1,
+            "order_type": "pickup",
+            "items": [{"id": 1 + (i + n) % 4, "quantity": 1 + n, "price": 10.0} for n in range(items)],
+            "total_amount": 10.0 * sum(1 + n for n in range(items)),
+        }
+        for i in range(count)
+    ]
+
+
+async def main(args) -> int:
+    use_temp_database()
+    import main as app_module
+
+    orders = make_orders(args.orders, args.items)
+    await app_module.app.router.startup()
+    try:
+        async with make_client(app_module.app) as client:
+            response = await client.post("/api/auth/signup", json={
+                "name": "Kiosk", "email": "kiosk@example.com", "password": "kiosk-bench"
+            })
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            start = time.perf_counter()
+            for order in orders:
+                response = await client.post("/api/orders", headers=headers, json=order)
+                if response.status_code != 200:
+                    print(f"FAIL: single order returned {response.status_code}", file=sys.stderr)
+                    return 1
+            single_elapsed = time.perf_counter() - start
+
+            created = 0
+            start = time.perf_counter()
+            for offset in range(0, len(orders), args.batch_size):
+                batch = orders[offset:offset + args.batch_size]
+                response = await client.post("/api/orders/bulk", headers=headers, json={"orders": batch})
+                if response.status_code != 200:
+                    print(f"FAIL: bulk upload returned {response.status_code}", file=sys.stderr)
+                    return 1
+                created += response.json()["created"]
+            bulk_elapsed = time.perf_counter() - start
+    finally:
+        await app_module.app.router.shutdown()
+
+    if created != len(orders):
+        print(f"FAIL: bulk upload created {created} of {len(orders)} orders", file=sys.stderr)
+        return 1
+
+    print(json.dumps({
+        "orders": len(orders),
+        "items_per_order": args.items,
+        "batch_size": args.batch_size,
+        "single_orders_per_second": round(len(orders) / single_elapsed, 1),
+        "bulk_orders_per_second": round(len(orders) / bulk_elapsed, 1),
+        "speedup": round(single_elapsed / bulk_elapsed, 2),
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--items", type=int, default=3)
+    sys.exit(asyncio.run(main(parser.parse_args())))
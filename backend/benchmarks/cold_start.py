@@ -0,0 +1,90 @@
+"""
+Cold-start benchmark for run.py.
+
+Starts `python run.py` as a real server process (RELOAD=0, on a free port)
+and measures the time from process launch until GET / answers. The first
+start creates the schema in an empty database; the following restarts run
+against the same, already current database, as a worker restart would.
+Fails if a restart exceeds the time budget.
+
+Usage:
+    python -m benchmarks.cold_start [--restarts 5] [--budget-ms 2000]
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import BACKEND_DIR, percentile
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_path: str, timeout: float) -> float:
+    """Launch run.py, wait until it serves requests, stop it; returns seconds to ready"""
+    import httpx
+
+    port = free_port()
+    env = dict(os.environ, DATABASE_PATH=database_path, PORT=str(port), RELOAD="0")
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "run.py"], cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"run.py exited with code {process.returncode}")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"run.py did not answer within {timeout}s")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=0.5).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.TransportError:
+                pass
+            time.sleep(0.01)
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def main(args) -> int:
+    directory = tempfile.mkdtemp(prefix="restaurant-cold-start-")
+    database_path = os.path.join(directory, "restaurant_management.db")
+
+    first = start_server(database_path, args.timeout)
+    restarts = [start_server(database_path, args.timeout) for _ in range(args.restarts)]
+
+    result = {
+        "first_start_ms": round(first * 1000, 1),
+        "restart_p50_ms": round(percentile(restarts, 50) * 1000, 1),
+        "restart_max_ms": round(max(restarts) * 1000, 1),
+        "budget_ms": args.budget_ms,
+    }
+    print(json.dumps(result, indent=2))
+
+    if result["restart_max_ms"] > args.budget_ms:
+        print(f"FAIL: restart took {result['restart_max_ms']}ms, budget is {args.budget_ms}ms", file=sys.stderr)
+        return 1
+    print("OK: run.py restarts within the cold-start budget")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--restarts", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=2000.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,93 @@
+"""
+Shared helpers for the backend benchmark scripts.
+
+Benchmarks drive the FastAPI app in-process through an ASGI transport, so
+no server or network is involved. Each run uses its own temporary database.
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def use_temp_database(prefix: str = "restaurant-bench-", seed: bool = True) -> str:
+    """Point DATABASE_PATH at a fresh file, migrated and seeded with demo data; call before importing main"""
+    directory = tempfile.mkdtemp(prefix=prefix)
+    path = os.path.join(directory, "restaurant_management.db")
+    os.environ["DATABASE_PATH"] = path
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+    if seed:
+        import migrations
+        import seed as demo
+
+        conn = sqlite3.connect(path)
+        try:
+            migrations.migrate(conn)
+            demo.seed_demo_data(conn)
+        finally:
+            conn.close()
+    return path
+
+
+def use_generated_database(preset: str = "tiny", seed: int = 1, source: str = None,
+                           prefix: str = "restaurant-bench-") -> str:
+    """Point DATABASE_PATH at a synthetic dataset (see datagen.py), or a copy of source; call before importing main
+
+    The demo seed runs on top so the super admin account exists.
+    """
+    directory = tempfile.mkdtemp(prefix=prefix)
+    path = os.path.join(directory, "restaurant_management.db")
+    os.environ["DATABASE_PATH"] = path
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+    import datagen
+    import migrations
+    import seed as demo
+
+    if source:
+        shutil.copyfile(source, path)
+    else:
+        datagen.DatasetGenerator(preset, seed, progress=None).generate(path)
+
+    conn = sqlite3.connect(path)
+    try:
+        migrations.migrate(conn)
+        demo.seed_demo_data(conn)
+    finally:
+        conn.close()
+    return path
+
+
+def percentile(samples, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies) -> dict:
+    """Latency summary in milliseconds for a list of durations in seconds"""
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+def make_client(app):
+    """HTTP client bound to the ASGI app"""
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(transport=transport, base_url="http://benchmark")
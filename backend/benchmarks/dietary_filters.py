@@ -0,0 +1,119 @@
+"""
+Dietary tag filter benchmark.
+
+Tops a dataset's menus up to --menu-items items (see benchmarks.search), then
+times each dietary filter two ways:
+
+  before  LIKE '%,tag,%' tests on the comma-separated menu_items.dietary text
+  after   bitwise tests on menu_items.dietary_mask, and per-tag counts read
+          from the menu_item_dietary_tags index, as the queries now do
+
+Both must return the same rows, so a mismatch fails the run.
+
+Usage:
+    python -m benchmarks.dietary_filters [--preset tiny] [--database PATH] [--menu-items 1000000] [--iterations 20]
+"""
+
+import argparse
+import contextlib
+import json
+import sqlite3
+import sys
+import time
+
+from benchmarks.common import use_generated_database
+from benchmarks.search import top_up_menus
+
+INCLUDE = "vegetarian,gluten-free"
+EXCLUDE = "spicy"
+
+
+@contextlib.contextmanager
+def text_filters(queries, dietary_tags):
+    """Run the query functions with LIKE tests on the dietary text, as before"""
+    def like_conditions(conn, dietary, exclude_dietary, column="dietary_mask"):
+        text = column.replace("dietary_mask", "dietary")
+        conditions, params = [], []
+        for tag in dietary_tags.parse(dietary):
+            conditions.append(f"',' || {text} || ',' LIKE ?")
+            params.append(f"%,{tag},%")
+        for tag in dietary_tags.parse(exclude_dietary):
+            conditions.append(f"',' || COALESCE({text}, '') || ',' NOT LIKE ?")
+            params.append(f"%,{tag},%")
+        return conditions, params
+
+    original = queries._dietary_conditions
+    queries._dietary_conditions = like_conditions
+    try:
+        yield
+    finally:
+        queries._dietary_conditions = original
+
+
+def per_call_ms(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - start) / iterations * 1000, 3)
+
+
+def main(args) -> int:
+    path = use_generated_database(args.preset, source=args.database, prefix="restaurant-dietary-bench-")
+
+    import dietary_tags
+    import queries
+    import search
+
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        added = top_up_menus(conn, args.menu_items, args.seed)
+        print(f"Added {added:,} menu items", file=sys.stderr)
+        restaurant_id = conn.execute('''
+            SELECT restaurant_id FROM menu_items GROUP BY restaurant_id ORDER BY COUNT(*) DESC LIMIT 1
+        ''').fetchone()[0]
+        terms = search.words("chicken")
+
+        def tag_counts_by_text():
+            return [{"name": name, "items": conn.execute(
+                "SELECT COUNT(*) FROM menu_items WHERE ',' || dietary || ',' LIKE ?", (f"%,{name},%",)
+            ).fetchone()[0]} for (name,) in conn.execute("SELECT name FROM dietary_tags ORDER BY bit").fetchall()]
+
+        cases = [
+            ("menu", lambda: queries.list_menu_items(conn, restaurant_id, available_only=True,
+                                                     dietary=INCLUDE, exclude_dietary=EXCLUDE), None),
+            ("search", lambda: search.search(conn, terms, 20, dietary=INCLUDE, exclude_dietary=EXCLUDE), None),
+            ("tag_counts", lambda: queries.list_dietary_tags(conn), tag_counts_by_text),
+        ]
+
+        results = {}
+        for label, after, before in cases:
+            if before is None:
+                def before(after=after):
+                    with text_filters(queries, dietary_tags):
+                        return after()
+            if before() != after():
+                print(f"{label}: results differ", file=sys.stderr)
+                return 1
+            results[label] = {
+                "before_ms": per_call_ms(before, args.iterations),
+                "after_ms": per_call_ms(after, args.iterations),
+            }
+            results[label]["speedup"] = round(results[label]["before_ms"] / results[label]["after_ms"], 2)
+        total_items = conn.execute("SELECT COUNT(*) FROM menu_items").fetchone()[0]
+    finally:
+        conn.close()
+
+    print(json.dumps({"menu_items": total_items, "include": INCLUDE, "exclude": EXCLUDE,
+                      "iterations": args.iterations, "filters": results}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", default="tiny")
+    parser.add_argument("--database", help="copy this dataset instead of generating one")
+    parser.add_argument("--menu-items", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=20)
+    sys.exit(main(parser.parse_args()))
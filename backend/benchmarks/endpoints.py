@@ -0,0 +1,472 @@
+"""
+Endpoint benchmark suite.
+
+Replays a weighted mix of public, customer, admin and super-admin traffic
+against every route in main.py, in-process through the ASGI transport, on a
+synthetic dataset (see datagen.py). Reports throughput and p50/p95/p99
+latency per endpoint.
+
+--output saves the results as JSON. --baseline compares this run with a
+saved one and exits nonzero if any endpoint's --metric latency grew by more
+than --threshold. Endpoints with fewer than --min-samples requests in either
+run, and slowdowns under --min-delta-ms, are ignored as noise; p50 is the
+default metric for the same reason, since the tail of a rarely hit route
+swings widely between identical runs. The run also fails if any request
+gets an unexpected status code.
+
+Usage:
+    python -m benchmarks.endpoints [--preset tiny] [--database PATH] [--requests 4000]
+        [--concurrency 8] [--output results.json] [--baseline previous.json]
+        [--threshold 0.25] [--metric p50_ms]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import make_client, summarize, use_generated_database
+
+HOT_RESTAURANTS = 200
+CUSTOMERS = 500
+
+
+class Fixtures:
+    """Ids the request builders draw from, read from the dataset before the run"""
+
+    def __init__(self, path: str, seed: int):
+        import datagen
+
+        self.rng = random.Random(seed)
+        conn = sqlite3.connect(path)
+        try:
+            restaurant_ids = [row[0] for row in conn.execute(
+                "SELECT id FROM restaurants WHERE is_active = 1 ORDER BY id LIMIT ?", (HOT_RESTAURANTS,)
+            )]
+            self.rng.shuffle(restaurant_ids)
+            self.restaurants = restaurant_ids
+            self.restaurant_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(restaurant_ids) + 1)))
+
+            self.menu_items = {rid: [] for rid in restaurant_ids}
+            self.tables = {rid: [] for rid in restaurant_ids}
+            self.orders = {rid: [] for rid in restaurant_ids}
+            self.deletable = {rid: [] for rid in restaurant_ids}
+            marks = ", ".join("?" * len(restaurant_ids))
+            for rid, item_id in conn.execute(
+                f"SELECT restaurant_id, id FROM menu_items WHERE available = 1 AND restaurant_id IN ({marks})",
+                restaurant_ids,
+            ):
+                self.menu_items[rid].append(item_id)
+            for rid, table_id, capacity in conn.execute(
+                f"SELECT restaurant_id, id, capacity FROM tables WHERE restaurant_id IN ({marks})", restaurant_ids
+            ):
+                self.tables[rid].append((table_id, capacity))
+            for rid in restaurant_ids:
+                self.orders[rid] = [row[0] for row in conn.execute(
+                    "SELECT id FROM orders WHERE restaurant_id = ? ORDER BY created_at DESC LIMIT 50", (rid,)
+                )]
+
+            # Menu items for DELETE /api/admin/menu/{id} to remove
+            conn.executemany('''
+                INSERT INTO menu_items (restaurant_id, name, category, price, description, image, dietary, available)
+                VALUES (?, 'Benchmark Special', 'Specials', 9.99, '', '', '', 0)
+            ''', [(rid,) for rid in restaurant_ids for _ in range(20)])
+            for rid, item_id in conn.execute(
+                f"SELECT restaurant_id, id FROM menu_items WHERE name = 'Benchmark Special' AND restaurant_id IN ({marks})",
+                restaurant_ids,
+            ):
+                self.deletable[rid].append(item_id)
+
+            self.customers = [row[0] for row in conn.execute(
+                "SELECT id FROM users WHERE role = 'customer' AND is_active = 1 ORDER BY id LIMIT ?", (CUSTOMERS,)
+            )]
+            self.customer_emails = dict(conn.execute(
+                "SELECT id, email FROM users WHERE id IN (%s)" % ", ".join(map(str, self.customers))
+            ).fetchall())
+            self.admin_ids = dict(conn.execute(
+                f"SELECT id, admin_id FROM restaurants WHERE id IN ({marks})", restaurant_ids
+            ).fetchall())
+            self.superadmin = conn.execute("SELECT id, email FROM users WHERE role = 'superadmin' LIMIT 1").fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+
+        self.customer_password = datagen.CUSTOMER_PASSWORD
+        self.admin_password = datagen.ADMIN_PASSWORD
+        self.signups = itertools.count()
+        self._tokens = {}
+
+    def restaurant(self) -> int:
+        return self.rng.choices(self.restaurants, cum_weights=self.restaurant_weights)[0]
+
+    def customer(self) -> int:
+        return self.customers[min(len(self.customers) - 1, int(len(self.customers) * self.rng.random() ** 2))]
+
+    def token(self, role: str, subject) -> dict:
+        """Authorization header for a long-lived token (created once, like a client that stays logged in)"""
+        key = (role, subject)
+        if key not in self._tokens:
+            from auth import create_access_token
+
+            if role == "customer":
+                claims = {"sub": str(subject), "email": self.customer_emails[subject], "role": "customer"}
+            elif role == "admin":
+                claims = {"sub": self.admin_ids[subject], "restaurant_id": subject, "role": "admin"}
+            else:
+                claims = {"sub": str(self.superadmin[0]), "email": self.superadmin[1], "role": "superadmin"}
+            self._tokens[key] = create_access_token(claims)
+        return {"Authorization": f"Bearer {self._tokens[key]}"}
+
+    def cart(self, rid: int) -> list:
+        items = self.menu_items[rid]
+        return [{"id": item_id, "quantity": self.rng.randint(1, 2)}
+                for item_id in self.rng.sample(items, min(len(items), self.rng.randint(1, 3)))]
+
+    def upcoming(self) -> str:
+        return (date.today() + timedelta(days=self.rng.randint(1, 21))).isoformat()
+
+
+# Each builder returns (method, url, request kwargs); labels are the route templates
+def root(f):
+    return "GET", "/", {}
+
+
+def signup(f):
+    n = next(f.signups)
+    return "POST", "/api/auth/signup", {"json": {
+        "name": "Bench User", "email": f"bench-{n}-{f.rng.getrandbits(32)}@example.com", "password": "bench-password"
+    }}
+
+
+def login(f):
+    return "POST", "/api/auth/login", {"json": {
+        "email": f.customer_emails[f.customer()], "password": f.customer_password
+    }}
+
+
+def admin_login(f):
+    return "POST", "/api/auth/admin-login", {"json": {
+        "email": f.admin_ids[f.restaurant()], "password": f.admin_password
+    }}
+
+
+def super_admin_login(f):
+    from seed import DEMO_SUPER_ADMIN
+
+    return "POST", "/api/auth/super-admin-login", {"json": {
+        "email": f.superadmin[1], "password": DEMO_SUPER_ADMIN[2], "securityCode": "777888"
+    }}
+
+
+def logout(f):
+    from auth import create_access_token
+
+    # A session of its own: the jti keeps it from matching a token another request is still using
+    user_id = f.customer()
+    token = create_access_token({"sub": str(user_id), "email": f.customer_emails[user_id], "role": "customer",
+                                 "jti": f"{f.rng.getrandbits(64):016x}"})
+    return "POST", "/api/auth/logout", {"headers": {"Authorization": f"Bearer {token}"}}
+
+
+def restaurants(f):
+    return "GET", "/api/restaurants", {}
+
+
+def restaurant(f):
+    return "GET", f"/api/restaurants/{f.restaurant()}", {}
+
+
+def menu(f):
+    return "GET", f"/api/restaurants/{f.restaurant()}/menu", {}
+
+
+def availability(f):
+    params = {"date": f.upcoming(), "time": f.rng.choice(["12:00", "18:30", "19:00", "20:00"]),
+              "guests": f.rng.choice([2, 2, 4, 6])}
+    return "GET", f"/api/restaurants/{f.restaurant()}/availability", {"params": params}
+
+
+def booking(f):
+    rid = f.restaurant()
+    table_id, capacity = f.rng.choice(f.tables[rid])
+    return "POST", "/api/bookings", {"headers": f.token("customer", f.customer()), "json": {
+        "restaurant_id": rid, "table_id": table_id, "date": f.upcoming(),
+        "time": f.rng.choice(["18:00", "19:30", "21:00"]), "guests": min(capacity, 2)
+    }}
+
+
+def order(f):
+    rid = f.restaurant()
+    return "POST", "/api/orders", {"headers": f.token("customer", f.customer()), "json": {
+        "restaurant_id": rid, "order_type": f.rng.choice(["pickup", "delivery", "dine-in"]), "items": f.cart(rid)
+    }}
+
+
+def bulk_orders(f):
+    orders = []
+    for _ in range(10):
+        rid = f.restaurant()
+        orders.append({"restaurant_id": rid, "order_type": "pickup", "items": f.cart(rid)})
+    return "POST", "/api/orders/bulk", {"headers": f.token("customer", f.customer()), "json": {"orders": orders}}
+
+
+def admin_restaurant(f):
+    return "GET", "/api/admin/restaurant", {"headers": f.token("admin", f.restaurant())}
+
+
+def admin_menu(f):
+    return "GET", "/api/admin/menu", {"headers": f.token("admin", f.restaurant())}
+
+
+def admin_create_menu_item(f):
+    return "POST", "/api/admin/menu", {"headers": f.token("admin", f.restaurant()), "json": {
+        "name": "Seasonal Plate", "category": "Specials", "price": round(f.rng.uniform(8, 30), 2),
+        "description": "Benchmark item", "image": "", "dietary": "vegetarian"
+    }}
+
+
+def admin_update_menu_item(f):
+    rid = f.restaurant()
+    return "PUT", f"/api/admin/menu/{f.rng.choice(f.menu_items[rid])}", {
+        "headers": f.token("admin", rid), "json": {"description": f"Updated {f.rng.getrandbits(16)}"}
+    }
+
+
+def admin_delete_menu_item(f):
+    rid = f.restaurant()
+    item_id = f.deletable[rid].pop() if f.deletable[rid] else 0
+    return "DELETE", f"/api/admin/menu/{item_id}", {"headers": f.token("admin", rid)}
+
+
+def admin_orders(f):
+    params = f.rng.choice([{}, {"limit": 50}, {"status": "pending"}, {"status": "completed", "limit": 20}])
+    return "GET", "/api/admin/orders", {"headers": f.token("admin", f.restaurant()), "params": params}
+
+
+def admin_analytics(f):
+    params = f.rng.choice([{}, {}, {"granularity": "month"}, {"granularity": "hour",
+                                                               "date_from": (date.today() - timedelta(days=6)).isoformat()}])
+    return "GET", "/api/admin/analytics", {"headers": f.token("admin", f.restaurant()), "params": params}
+
+
+def admin_order_status(f):
+    rid = f.restaurant()
+    order_id = f.rng.choice(f.orders[rid]) if f.orders[rid] else 0
+    return "PUT", f"/api/admin/orders/{order_id}/status", {
+        "headers": f.token("admin", rid),
+        "json": {"status": f.rng.choice(["confirmed", "preparing", "ready", "completed"])}
+    }
+
+
+def admin_export_orders(f):
+    params = {"format": f.rng.choice(["ndjson", "csv"]), "date_from": (date.today() - timedelta(days=30)).isoformat()}
+    if f.rng.random() < 0.5:
+        params["gzip"] = "true"
+    return "GET", "/api/admin/orders/export", {"headers": f.token("admin", f.restaurant()), "params": params}
+
+
+def admin_export_bookings(f):
+    params = {"format": f.rng.choice(["ndjson", "csv"]), "date_from": date.today().isoformat()}
+    return "GET", "/api/admin/bookings/export", {"headers": f.token("admin", f.restaurant()), "params": params}
+
+
+def admin_bookings(f):
+    return "GET", "/api/admin/bookings", {"headers": f.token("admin", f.restaurant())}
+
+
+def super_admin_restaurants(f):
+    params = f.rng.choice([{}, {"is_active": "true"}, {"name": f.rng.choice(["Go", "Red", "Lucky"])}])
+    return "GET", "/api/super-admin/restaurants", {"headers": f.token("superadmin", None), "params": params}
+
+
+def super_admin_users(f):
+    params = f.rng.choice([{}, {"role": "customer", "is_active": "true"}, {"name": f.rng.choice(["Em", "li", "Omar"])},
+                           {"email": "user0000"}, {"created_from": (date.today() - timedelta(days=30)).isoformat()}])
+    return "GET", "/api/super-admin/users", {"headers": f.token("superadmin", None), "params": params}
+
+
+def super_admin_analytics(f):
+    return "GET", "/api/super-admin/analytics", {"headers": f.token("superadmin", None)}
+
+
+def super_admin_performance(f):
+    return "GET", "/api/super-admin/performance", {"headers": f.token("superadmin", None)}
+
+
+# (label, weight, builder, accepted status codes). Weights approximate a
+# day's traffic: browsing dominates, then ordering and the admin dashboards.
+TRAFFIC_MIX = [
+    ("GET /", 1, root, {200}),
+    ("POST /api/auth/signup", 1, signup, {200}),
+    ("POST /api/auth/login", 2, login, {200}),
+    ("POST /api/auth/admin-login", 1, admin_login, {200}),
+    ("POST /api/auth/super-admin-login", 0.2, super_admin_login, {200}),
+    ("POST /api/auth/logout", 1, logout, {200}),
+    ("GET /api/restaurants", 18, restaurants, {200}),
+    ("GET /api/restaurants/{id}", 10, restaurant, {200}),
+    ("GET /api/restaurants/{id}/menu", 18, menu, {200}),
+    ("GET /api/restaurants/{id}/availability", 8, availability, {200}),
+    ("POST /api/bookings", 3, booking, {200, 400}),  # 400: slot already taken
+    ("POST /api/orders", 6, order, {200, 409}),  # 409: menu changed mid-order
+    ("POST /api/orders/bulk", 0.5, bulk_orders, {200}),
+    ("GET /api/admin/restaurant", 3, admin_restaurant, {200}),
+    ("GET /api/admin/menu", 3, admin_menu, {200}),
+    ("POST /api/admin/menu", 0.5, admin_create_menu_item, {200}),
+    ("PUT /api/admin/menu/{id}", 0.5, admin_update_menu_item, {200}),
+    ("DELETE /api/admin/menu/{id}", 0.5, admin_delete_menu_item, {200, 404}),  # 404: pool used up
+    ("GET /api/admin/orders", 6, admin_orders, {200}),
+    ("GET /api/admin/analytics", 3, admin_analytics, {200}),
+    ("PUT /api/admin/orders/{id}/status", 2, admin_order_status, {200, 404}),  # 404: restaurant has no orders
+    ("GET /api/admin/bookings", 3, admin_bookings, {200}),
+    ("GET /api/admin/orders/export", 0.3, admin_export_orders, {200}),
+    ("GET /api/admin/bookings/export", 0.3, admin_export_bookings, {200}),
+    ("GET /api/super-admin/restaurants", 0.5, super_admin_restaurants, {200}),
+    ("GET /api/super-admin/users", 0.5, super_admin_users, {200}),
+    ("GET /api/super-admin/analytics", 0.5, super_admin_analytics, {200}),
+    ("GET /api/super-admin/performance", 0.5, super_admin_performance, {200}),
+]
+
+
+async def replay(client, fixtures: Fixtures, count: int, concurrency: int, seed: int) -> tuple:
+    """Send count requests drawn from TRAFFIC_MIX; returns ({label: (latencies, statuses)}, elapsed)"""
+    rng = random.Random(seed)
+    plan = rng.choices(TRAFFIC_MIX, weights=[weight for _, weight, _, _ in TRAFFIC_MIX], k=count)
+    # Every endpoint appears at least once, however small its weight
+    plan[:len(TRAFFIC_MIX)] = TRAFFIC_MIX
+    rng.shuffle(plan)
+    results = {label: ([], {}) for label, _, _, _ in TRAFFIC_MIX}
+    remaining = iter(plan)
+
+    async def worker():
+        for label, _, build, _ in remaining:
+            method, url, kwargs = build(fixtures)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies, statuses = results[label]
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.perf_counter() - start
+
+
+def compare(current: dict, baseline: dict, threshold: float, metric: str, min_delta_ms: float,
+            min_samples: int) -> list:
+    """Endpoints whose metric regressed past threshold: [(label, baseline ms, current ms)]"""
+    regressions = []
+    for label, stats in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(label)
+        if not before or min(before["count"], stats["count"]) < min_samples:
+            continue
+        old, new = before[metric], stats[metric]
+        if new > old * (1 + threshold) and new - old >= min_delta_ms:
+            regressions.append((label, old, new))
+    return regressions
+
+
+async def main(args) -> int:
+    path = use_generated_database(args.preset, args.seed, source=args.database)
+    fixtures = Fixtures(path, args.seed)
+    import main as app_module
+
+    await app_module.app.router.startup()
+    try:
+        async with make_client(app_module.app) as client:
+            if args.warmup:
+                await replay(client, fixtures, args.warmup, args.concurrency, args.seed + 1)
+            results, elapsed = await replay(client, fixtures, args.requests, args.concurrency, args.seed)
+    finally:
+        await app_module.app.router.shutdown()
+
+    accepted = {label: codes for label, _, _, codes in TRAFFIC_MIX}
+    endpoints = {}
+    unexpected = {}
+    for label, (latencies, statuses) in results.items():
+        stats = summarize(latencies)
+        stats["requests_per_second"] = round(len(latencies) / elapsed, 1)
+        stats["status_codes"] = {str(code): n for code, n in sorted(statuses.items())}
+        endpoints[label] = stats
+        bad = {code: n for code, n in statuses.items() if code not in accepted[label]}
+        if bad:
+            unexpected[label] = bad
+
+    all_latencies = [latency for latencies, _ in results.values() for latency in latencies]
+    report = {
+        "meta": {
+            "preset": args.preset if not args.database else None,
+            "database": args.database,
+            "seed": args.seed,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        },
+        "overall": dict(summarize(all_latencies), requests_per_second=round(len(all_latencies) / elapsed, 1)),
+        "endpoints": endpoints,
+    }
+
+    width = max(len(label) for label in endpoints)
+    print(f"{'endpoint':<{width}}  {'n':>5}  {'req/s':>7}  {'p50':>8}  {'p95':>8}  {'p99':>8}")
+    for label, stats in sorted(endpoints.items(), key=lambda entry: -entry[1][args.metric]):
+        print(f"{label:<{width}}  {stats['count']:>5}  {stats['requests_per_second']:>7}  "
+              f"{stats['p50_ms']:>8}  {stats['p95_ms']:>8}  {stats['p99_ms']:>8}")
+    overall = report["overall"]
+    print(f"{'overall':<{width}}  {overall['count']:>5}  {overall['requests_per_second']:>7}  "
+          f"{overall['p50_ms']:>8}  {overall['p95_ms']:>8}  {overall['p99_ms']:>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    failed = False
+    for label, codes in unexpected.items():
+        print(f"FAIL: {label} returned unexpected status codes {codes}", file=sys.stderr)
+        failed = True
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ("preset", "database", "requests", "concurrency"):
+            if baseline.get("meta", {}).get(key) != report["meta"][key]:
+                print(f"WARNING: the baseline was recorded with a different {key}", file=sys.stderr)
+        for label, old, new in compare(report, baseline, args.threshold, args.metric, args.min_delta_ms,
+                                          args.min_samples):
+            print(f"FAIL: {label} {args.metric} {old}ms -> {new}ms "
+                  f"(+{(new / old - 1) * 100 if old else float('inf'):.0f}%, threshold {args.threshold:.0%})",
+                  file=sys.stderr)
+            failed = True
+        if not failed:
+            print(f"OK: no endpoint's {args.metric} regressed by more than {args.threshold:.0%}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    import datagen
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=sorted(datagen.PRESETS), default="tiny",
+                        help="synthetic dataset size (see manage.py generate)")
+    parser.add_argument("--database", default=None,
+                        help="benchmark a copy of this database instead of generating one")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--warmup", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", default=None, help="write results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="compare with results from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--metric", choices=["p50_ms", "p95_ms", "p99_ms"], default="p50_ms")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="ignore slowdowns smaller than this many milliseconds")
+    parser.add_argument("--min-samples", type=int, default=30,
+                        help="ignore endpoints with fewer requests than this in either run")
+    sys.exit(asyncio.run(main(parser.parse_args())))
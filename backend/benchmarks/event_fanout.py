@@ -0,0 +1,84 @@
+"""
+Event feed fan-out benchmark.
+
+Connects N subscribers to one restaurant's channel of events.EventHub and
+publishes a stream of order events to it, for several values of N. For
+each it reports the cost of one publish (encoding the frame once and
+queueing it to every subscriber), the latency from publish to a subscriber
+receiving the frame, and how many subscribers fell too far behind and were
+disconnected.
+
+Usage:
+    python -m benchmarks.event_fanout [--subscribers 1,10,100,1000] [--events 500] [--interval-ms 1]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import events
+from benchmarks.common import summarize
+
+
+async def consume(hub, subscription, sent: dict, latencies: list, total: int):
+    """Read frames until the last event arrives, recording publish-to-receive latency"""
+    async for frame in hub.stream(subscription):
+        received = time.perf_counter()
+        seq = int(frame[4:frame.index(b"\n")].rpartition(b"-")[2]) if frame.startswith(b"id: ") else 0
+        if seq in sent:
+            latencies.append(received - sent[seq])
+        if seq >= total:
+            return
+
+
+async def run(subscribers: int, total: int, interval: float) -> dict:
+    hub = events.EventHub()
+    sent = {}
+    latencies = []
+    subscriptions = [hub.subscribe(1) for _ in range(subscribers)]
+    consumers = [asyncio.create_task(consume(hub, subscription, sent, latencies, total))
+                 for subscription in subscriptions]
+    await asyncio.sleep(0)
+
+    publish_times = []
+    for order_id in range(1, total + 1):
+        start = time.perf_counter()
+        sent[order_id] = start
+        hub.publish(1, "order.created", {"order_id": order_id, "status": "pending", "order_type": "takeaway",
+                                         "total_amount": 42.5, "items": [{"menu_item_id": 7, "quantity": 2,
+                                                                          "price": 21.25}]})
+        publish_times.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+
+    await asyncio.wait(consumers, timeout=10)
+    for consumer in consumers:
+        consumer.cancel()
+    stats = hub.stats()
+    publish = summarize(publish_times)
+    return {
+        "subscribers": subscribers,
+        "publish_avg_us": stats["avg_publish_us"],
+        "publish_p99_us": round(publish["p99_ms"] * 1000, 2),
+        "per_subscriber_us": round(stats["avg_publish_us"] / subscribers, 3),
+        "delivery": summarize(latencies),
+        "delivered": stats["delivered"],
+        "lagged_disconnects": stats["lagged_disconnects"],
+    }
+
+
+async def main(args) -> int:
+    results = []
+    for subscribers in (int(value) for value in args.subscribers.split(",")):
+        results.append(await run(subscribers, args.events, args.interval_ms / 1000))
+    print(json.dumps({"events": args.events, "interval_ms": args.interval_ms, "runs": results}, indent=2))
+    return 0 if all(result["lagged_disconnects"] == 0 for result in results) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", default="1,10,100,1000")
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--interval-ms", type=float, default=1.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
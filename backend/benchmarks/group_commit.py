@@ -0,0 +1,117 @@
+"""
+Group commit throughput benchmark.
+
+Places orders and books distinct table slots through a GroupCommit at each
+--concurrency level, first one transaction per operation (batch size
+1), then batched with no delay, then batched with --delay milliseconds of
+lingering. Reports throughput, latency and the average batch size for each.
+
+--synchronous FULL syncs the WAL on every commit, which is where batching
+saves the most; the default NORMAL only syncs at checkpoints.
+
+Usage:
+    python -m benchmarks.group_commit [--concurrency 1,4,16,64] [--operations 2000] [--delay 2] [--synchronous NORMAL]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import summarize, use_temp_database
+
+
+async def drive(writes, availability, queries, kind: str, concurrency: int, operations: int,
+                order, version: int, offset: int):
+    """Run operations writes from concurrency callers; returns (elapsed, latencies, failures)"""
+    latencies = []
+    failures = 0
+    issued = iter(range(operations))
+
+    async def caller():
+        nonlocal failures
+        for i in issued:
+            if kind == "orders":
+                call = (queries.create_order, 1, order, version)
+            else:
+                # Every booking gets its own slot: 20 tables x 24 hours per day
+                slot = offset + i
+                booking = SimpleNamespace(restaurant_id=1, table_id=1 + slot % 20,
+                                          date=f"2031-{1 + slot // 5760 % 12:02d}-{1 + slot // 480 % 12:02d}",
+                                          time=f"{slot // 20 % 24:02d}:00", guests=2, special_requests=None)
+                call = (queries.create_booking, 1, booking, availability.slot_start(booking.date, booking.time), 60)
+            began = time.perf_counter()
+            try:
+                if await writes.run(1, *call) is None:
+                    failures += 1
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - began)
+
+    began = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    return time.perf_counter() - began, latencies, failures
+
+
+async def main(args) -> int:
+    os.environ["DB_SYNCHRONOUS"] = args.synchronous
+    use_temp_database(prefix="restaurant-group-commit-bench-")
+    import availability
+    import database
+    import group_commit
+    import queries
+
+    modes = {
+        "per_operation": (1, 0.0),
+        "batched": (args.max_batch, 0.0),
+        f"batched_{args.delay:g}ms": (args.max_batch, args.delay),
+    }
+    version, items = await database.run_shard(1, queries.menu_price_map, 1)
+    item_id, (price, _) = next((item_id, entry) for item_id, entry in items.items() if entry[1])
+    order = SimpleNamespace(restaurant_id=1, order_type="pickup", total_amount=price, scheduled_time=None,
+                            special_instructions=None, items=[{"id": item_id, "quantity": 1, "price": price}])
+
+    results = {}
+    offset = 0
+    try:
+        for kind in ("orders", "bookings"):
+            for concurrency in args.concurrency:
+                row = {}
+                for mode, (max_batch, delay_ms) in modes.items():
+                    writes = group_commit.GroupCommit(max_batch, delay_ms)
+                    elapsed, latencies, failures = await drive(writes, availability, queries, kind, concurrency,
+                                                               args.operations, order, version, offset)
+                    await writes.close()
+                    offset += args.operations
+                    stats = writes.stats()
+                    row[mode] = {
+                        "per_second": round(args.operations / elapsed, 1),
+                        "failures": failures,
+                        "avg_batch_size": stats["avg_batch_size"],
+                        "latency": summarize(latencies),
+                    }
+                results.setdefault(kind, {})[concurrency] = row
+    finally:
+        database.shutdown()
+
+    print(json.dumps({"synchronous": args.synchronous, "operations": args.operations, **results}, indent=2))
+    failed = [(kind, concurrency, mode) for kind, levels in results.items() for concurrency, row in levels.items()
+              for mode, result in row.items() if result["failures"]]
+    if failed:
+        print(f"FAIL: writes failed in {failed}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=lambda value: [int(level) for level in value.split(",")],
+                        default=[1, 4, 16, 64])
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--delay", type=float, default=2.0)
+    parser.add_argument("--synchronous", default="NORMAL", choices=["OFF", "NORMAL", "FULL", "EXTRA"])
+    sys.exit(asyncio.run(main(parser.parse_args())))
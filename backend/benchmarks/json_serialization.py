@@ -0,0 +1,116 @@
+"""
+List endpoint serialization benchmark.
+
+For each list endpoint, times fetching its query result and turning it into
+a response body two ways:
+
+  before  sqlite3.Row rows copied with dict(row), then FastAPI's
+          jsonable_encoder() and json.dumps() (what returning a dict did)
+  after   tuple rows turned into dicts in one pass, then responses.dumps()
+          (orjson when installed), as the handlers now do
+
+Both bodies are decoded and compared, so a mismatch fails the run.
+
+Usage:
+    python -m benchmarks.json_serialization [--preset tiny] [--database PATH] [--iterations 50]
+"""
+
+import argparse
+import contextlib
+import json
+import sqlite3
+import sys
+import time
+
+from benchmarks.common import use_generated_database
+
+
+@contextlib.contextmanager
+def row_objects(queries):
+    """Run the query functions with sqlite3.Row rows and dict(row) copies, as before"""
+    tuple_cursor, rows = queries._tuple_cursor, queries._rows
+    queries._tuple_cursor = lambda conn: conn.cursor()
+    queries._rows = lambda cursor: [dict(row) for row in cursor.fetchall()]
+    try:
+        yield
+    finally:
+        queries._tuple_cursor, queries._rows = tuple_cursor, rows
+
+
+def cases(conn, queries, page, limit: int) -> list:
+    """(label, fn() returning the response value) for every list endpoint"""
+    restaurant_id = conn.execute('''
+        SELECT restaurant_id FROM orders GROUP BY restaurant_id ORDER BY COUNT(*) DESC LIMIT 1
+    ''').fetchone()[0]
+    date_to = conn.execute("SELECT date(MAX(created_at)) FROM orders").fetchone()[0]
+    date_from = conn.execute("SELECT date(?, '-29 days')", (date_to,)).fetchone()[0]
+
+    def listing(fn, name, *args):
+        return lambda: page(fn(conn, *args), limit, lambda row: (row['created_at'], row['id']), name=name)
+
+    return [
+        ("restaurants", lambda: queries.list_active_restaurants(conn)),
+        ("admin_menu", lambda: queries.list_menu_items(conn, restaurant_id)),
+        ("admin_orders", listing(queries.list_orders, "orders", restaurant_id, limit)),
+        ("admin_bookings", lambda: queries.list_bookings(conn, restaurant_id)),
+        ("admin_analytics", lambda: queries.sales_analytics(conn, restaurant_id, "day", date_from, date_to)),
+        ("super_admin_restaurants", listing(queries.list_restaurants, "restaurants", limit)),
+        ("super_admin_users", listing(queries.list_users, "users", limit)),
+    ]
+
+
+def per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - start) / iterations * 1e6, 1)
+
+
+def main(args) -> int:
+    path = use_generated_database(args.preset, source=args.database, prefix="restaurant-json-bench-")
+
+    from fastapi.encoders import jsonable_encoder
+
+    import queries
+    import responses
+    from pagination import page
+
+    def before_body(fn):
+        with row_objects(queries):
+            value = fn()
+        return json.dumps(jsonable_encoder(value), ensure_ascii=False, allow_nan=False,
+                          separators=(",", ":")).encode("utf-8")
+
+    def after_body(fn):
+        return responses.dumps(fn())
+
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    results = {}
+    try:
+        for label, fn in cases(conn, queries, page, args.limit):
+            before, after = before_body(fn), after_body(fn)
+            if json.loads(before) != json.loads(after):
+                print(f"{label}: response bodies differ", file=sys.stderr)
+                return 1
+            results[label] = {
+                "bytes": len(after),
+                "before_us": per_call_us(lambda: before_body(fn), args.iterations),
+                "after_us": per_call_us(lambda: after_body(fn), args.iterations),
+            }
+            results[label]["speedup"] = round(results[label]["before_us"] / results[label]["after_us"], 2)
+    finally:
+        conn.close()
+
+    print(json.dumps({"preset": args.preset, "database": args.database, "encoder": responses.encoder(),
+                      "iterations": args.iterations, "endpoints": results}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", default="tiny")
+    parser.add_argument("--database", help="copy this dataset instead of generating one")
+    parser.add_argument("--limit", type=int, default=200, help="page size for the paginated listings")
+    parser.add_argument("--iterations", type=int, default=50)
+    sys.exit(main(parser.parse_args()))
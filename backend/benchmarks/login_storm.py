@@ -0,0 +1,98 @@
+"""
+Login storm benchmark.
+
+Fires many concurrent POST /api/auth/login requests and reports logins per
+second and login latency percentiles. While the storm runs, a second client
+polls GET /api/restaurants; since password hashing runs on the credential
+process pool, that endpoint's tail latency should stay low. Fails if it
+does not.
+
+Usage:
+    python -m benchmarks.login_storm [--logins 400] [--concurrency 32] [--users 20]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from benchmarks.common import make_client, summarize, use_temp_database
+
+
+async def main(args) -> int:
+    use_temp_database()
+    import main as app_module
+    from credentials import service
+
+    await app_module.app.router.startup()
+    try:
+        async with make_client(app_module.app) as client:
+            accounts = [(f"storm{n}@example.com", f"password-{n}") for n in range(args.users)]
+            for email, password in accounts:
+                response = await client.post("/api/auth/signup", json={
+                    "name": "Storm", "email": email, "password": password
+                })
+                response.raise_for_status()
+
+            logins = []
+            statuses = {}
+            remaining = iter(range(args.logins))
+
+            async def login_worker():
+                for n in remaining:
+                    email, password = accounts[n % len(accounts)]
+                    start = time.perf_counter()
+                    response = await client.post("/api/auth/login", json={"email": email, "password": password})
+                    logins.append(time.perf_counter() - start)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            storm_running = True
+            directory = []
+
+            async def directory_poller():
+                while storm_running:
+                    start = time.perf_counter()
+                    response = await client.get("/api/restaurants")
+                    directory.append(time.perf_counter() - start)
+                    response.raise_for_status()
+                    await asyncio.sleep(0.005)
+
+            poller = asyncio.ensure_future(directory_poller())
+            start = time.perf_counter()
+            await asyncio.gather(*(login_worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - start
+            storm_running = False
+            await poller
+    finally:
+        await app_module.app.router.shutdown()
+
+    result = {
+        "logins": args.logins,
+        "concurrency": args.concurrency,
+        "status_codes": statuses,
+        "logins_per_second": round(args.logins / elapsed, 1),
+        "login_latency": summarize(logins),
+        "directory_latency_during_storm": summarize(directory),
+        "credentials": service.stats(),
+    }
+    print(json.dumps(result, indent=2))
+
+    if statuses.get(200) != args.logins:
+        print("FAIL: not every login succeeded", file=sys.stderr)
+        return 1
+    if result["directory_latency_during_storm"]["p99_ms"] > args.max_p99_ms:
+        print(f"FAIL: /api/restaurants p99 {result['directory_latency_during_storm']['p99_ms']}ms "
+              f"exceeds {args.max_p99_ms}ms during the login storm", file=sys.stderr)
+        return 1
+    print("OK: the event loop stayed responsive during the login storm")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--max-p99-ms", type=float, default=100.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,96 @@
+"""
+Event-loop latency check.
+
+Measures request latency for a cheap endpoint on its own, then again while
+slow queries run through database.run_db(). If database work blocked the
+event loop, the cheap requests would queue behind the slow queries and their
+tail latency would jump to the slow query's duration.
+
+Usage:
+    python -m benchmarks.loop_latency [--requests 400] [--concurrency 8] [--slow-rows 3000000]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from benchmarks.common import make_client, summarize, use_temp_database
+
+
+def slow_query(conn, rows: int):
+    """A deliberately expensive query"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM counter WHERE x < ?)
+        SELECT SUM(x) FROM counter
+    ''', (rows,))
+    return cursor.fetchone()[0]
+
+
+async def fire(client, url: str, total: int, concurrency: int):
+    latencies = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def main(args) -> int:
+    use_temp_database()
+    import main as app_module
+    from database import run_db
+
+    await app_module.app.router.startup()
+    try:
+        async with make_client(app_module.app) as client:
+            url = "/api/restaurants/1/menu"
+            await fire(client, url, 50, args.concurrency)  # warm up
+
+            baseline = await fire(client, url, args.requests, args.concurrency)
+
+            slow_start = time.perf_counter()
+            slow = asyncio.ensure_future(
+                asyncio.gather(*(run_db(slow_query, args.slow_rows) for _ in range(args.slow_queries)))
+            )
+            await asyncio.sleep(0)
+            loaded = await fire(client, url, args.requests, args.concurrency)
+            loaded_done = time.perf_counter() - slow_start
+            await slow
+            slow_duration = time.perf_counter() - slow_start
+    finally:
+        await app_module.app.router.shutdown()
+
+    result = {
+        "baseline": summarize(baseline),
+        "during_slow_query": summarize(loaded),
+        "slow_query_ms": round(slow_duration * 1000, 3),
+        "load_finished_before_slow_query": loaded_done < slow_duration,
+    }
+    print(json.dumps(result, indent=2))
+
+    # Tail latency must stay well below the slow query's own duration
+    limit = max(result["baseline"]["p99_ms"] * args.max_ratio, result["slow_query_ms"] / 4)
+    if result["during_slow_query"]["p99_ms"] > limit:
+        print(f"FAIL: p99 {result['during_slow_query']['p99_ms']}ms exceeds {limit:.1f}ms", file=sys.stderr)
+        return 1
+    print("OK: event loop stayed responsive while the slow query ran")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--slow-rows", type=int, default=3_000_000)
+    parser.add_argument("--slow-queries", type=int, default=2)
+    parser.add_argument("--max-ratio", type=float, default=5.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,100 @@
+"""
+Order pricing benchmark.
+
+Places orders through POST /api/orders with the price map warm (the normal
+path) and again with it invalidated before every order, which costs one menu
+lookup per order like pricing straight from the database would. Also times
+PriceMap.price_cart() on its own. The two modes alternate in rounds so that
+database growth affects both alike. Fails if the warm path's median latency
+is meaningfully slower than the uncached one's.
+
+Usage:
+    python -m benchmarks.order_pricing [--orders 1000] [--rounds 10] [--concurrency 8] [--items 5]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from benchmarks.common import make_client, summarize, use_temp_database
+
+
+async def place_orders(client, headers, order: dict, total: int, concurrency: int, before=None):
+    latencies = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            if before:
+                before()
+            start = time.perf_counter()
+            response = await client.post("/api/orders", headers=headers, json=order)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def main(args) -> int:
+    use_temp_database()
+    import main as app_module
+    from pricing import prices
+
+    order = {
+        "restaurant_id": 1,
+        "order_type": "pickup",
+        "items": [{"id": 1 + n % 4, "quantity": 1 + n} for n in range(args.items)],
+    }
+
+    await app_module.app.router.startup()
+    try:
+        async with make_client(app_module.app) as client:
+            response = await client.post("/api/auth/signup", json={
+                "name": "Pricing Bench", "email": "pricing@example.com", "password": "pricing-bench"
+            })
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            await place_orders(client, headers, order, 50, args.concurrency)  # warm up
+            warm, uncached = [], []
+            per_round = max(1, args.orders // args.rounds)
+            for _ in range(args.rounds):
+                warm += await place_orders(client, headers, order, per_round, args.concurrency)
+                uncached += await place_orders(client, headers, order, per_round, args.concurrency,
+                                               before=lambda: prices.invalidate(1))
+
+            price_map = await prices.get(1)
+            start = time.perf_counter()
+            for _ in range(args.orders):
+                price_map.price_cart(order["items"])
+            price_cart_us = (time.perf_counter() - start) / args.orders * 1e6
+    finally:
+        await app_module.app.router.shutdown()
+
+    result = {
+        "items_per_order": args.items,
+        "warm_price_map": summarize(warm),
+        "uncached_price_map": summarize(uncached),
+        "price_cart_us": round(price_cart_us, 2),
+        "price_maps": prices.stats(),
+    }
+    print(json.dumps(result, indent=2))
+
+    limit = result["uncached_price_map"]["p50_ms"] * args.max_ratio
+    if result["warm_price_map"]["p50_ms"] > limit:
+        print(f"FAIL: warm p50 {result['warm_price_map']['p50_ms']}ms exceeds {limit:.3f}ms", file=sys.stderr)
+        return 1
+    print("OK: pricing from the cached map adds no latency over a per-order menu lookup")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--max-ratio", type=float, default=1.2)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,105 @@
+"""
+Search latency benchmark.
+
+Generates a dataset (--preset, or a copy of --database), tops its menus up
+to --menu-items items with dishes from the generator's vocabulary (through
+the normal inserts, so the search triggers index them), then times a mix
+of search queries: broad single words, prefixes, multi-word queries and
+filtered searches. Exits 1 if any query's p95 exceeds --budget-ms. Ranking
+and facet counts read every match, so the default budget is set by the
+broadest query ("chi", about a quarter of a million items) rather than
+the typical one.
+
+Usage:
+    python -m benchmarks.search [--preset tiny] [--database PATH] [--menu-items 1000000] [--repeat 50]
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from benchmarks.common import summarize, use_generated_database
+
+QUERIES = [
+    ("chicken", {}),
+    ("chi", {}),
+    ("grilled chick", {}),
+    ("thai curry", {}),
+    ("truffle tea", {}),
+    ("golden drag", {}),
+    ("chicken", {"cuisine": "Vegan"}),
+    ("chicken", {"category": "Desserts"}),
+    ("noodles", {"dietary": "gluten-free"}),
+    ("smoked salmon", {"cuisine": "Japanese", "dietary": "spicy"}),
+]
+
+
+def top_up_menus(conn, target: int, seed: int) -> int:
+    """Add dishes across the restaurants until there are target menu items; returns how many were added"""
+    import datagen
+
+    existing = conn.execute("SELECT COUNT(*) FROM menu_items").fetchone()[0]
+    if existing >= target:
+        return 0
+    rng = random.Random(seed)
+    restaurant_ids = [row[0] for row in conn.execute("SELECT id FROM restaurants")]
+
+    def rows():
+        for _ in range(target - existing):
+            category, base_price, _ = rng.choice(datagen.MENU_CATEGORIES)
+            yield (rng.choice(restaurant_ids), f"{rng.choice(datagen.DISH_WORDS)} {rng.choice(datagen.DISH_NOUNS)}",
+                   category, round(base_price * rng.uniform(0.7, 1.5), 2),
+                   ",".join(tag for tag in datagen.DIETARY_TAGS if rng.random() < 0.15))
+
+    conn.executemany('''
+        INSERT INTO menu_items (restaurant_id, name, category, price, dietary) VALUES (?, ?, ?, ?, ?)
+    ''', rows())
+    conn.commit()
+    conn.execute("INSERT INTO menu_search (menu_search) VALUES ('optimize')")
+    conn.commit()
+    return target - existing
+
+
+def main(args) -> int:
+    use_generated_database(args.preset, source=args.database, prefix="restaurant-search-bench-")
+
+    import search
+    from database import pool
+
+    results = {}
+    failed = False
+    with pool.connection() as conn:
+        start = time.perf_counter()
+        added = top_up_menus(conn, args.menu_items, args.seed)
+        print(f"Added {added:,} menu items in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        total_items = conn.execute("SELECT COUNT(*) FROM menu_items").fetchone()[0]
+
+        for text, filters in QUERIES:
+            terms = search.words(text)
+            search.search(conn, terms, args.limit, **filters)
+            latencies = []
+            for _ in range(args.repeat):
+                began = time.perf_counter()
+                found = search.search(conn, terms, args.limit, **filters)
+                latencies.append(time.perf_counter() - began)
+            label = text + "".join(f" {key}={value}" for key, value in filters.items())
+            results[label] = dict(summarize(latencies), matches=found["matches"])
+            if results[label]["p95_ms"] > args.budget_ms:
+                failed = True
+
+    print(json.dumps({"menu_items": total_items, "budget_ms": args.budget_ms, "queries": results}, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", default="tiny")
+    parser.add_argument("--database", help="copy this dataset instead of generating one")
+    parser.add_argument("--menu-items", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    sys.exit(main(parser.parse_args()))
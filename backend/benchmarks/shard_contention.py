@@ -0,0 +1,121 @@
+"""
+Cross-restaurant write contention benchmark.
+
+Generates a dataset (--preset, or a copy of --database) and splits a copy
+into --shards shards (see sharding.py). Then, once against the single file
+and once against the split, --hot-workers processes (standing in for server
+workers) place orders at one busy restaurant as fast as they can while a
+probe process places orders at restaurants in other shards. Reports the
+probe's order latency and both sides' throughput and busy failures.
+
+With one file every order waits for the one write lock, so the probe's
+latency follows the hot restaurant's load; with shards it should not.
+
+Usage:
+    python -m benchmarks.shard_contention [--preset tiny] [--database PATH] [--shards 4] [--hot-workers 3] [--seconds 5]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import summarize, use_generated_database
+
+
+def place_orders(database_path: str, restaurant_ids: list, seconds: float, results):
+    """Worker process: place one-item orders round-robin at restaurant_ids until time is up"""
+    os.environ["DATABASE_PATH"] = database_path
+    import database
+    import queries
+
+    async def run():
+        menus = {}
+        for restaurant_id in restaurant_ids:
+            version, items = await database.run_shard(restaurant_id, queries.menu_price_map, restaurant_id)
+            item_id, (price, _) = next((item_id, entry) for item_id, entry in items.items() if entry[1])
+            menus[restaurant_id] = (version, SimpleNamespace(
+                restaurant_id=restaurant_id, order_type="pickup", total_amount=price, scheduled_time=None,
+                special_instructions=None, items=[{"id": item_id, "quantity": 1, "price": price}]
+            ))
+
+        latencies = []
+        busy = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            restaurant_id = restaurant_ids[len(latencies) % len(restaurant_ids)]
+            version, order = menus[restaurant_id]
+            began = time.perf_counter()
+            try:
+                await database.run_shard_write(restaurant_id, queries.create_order, 1, order, version)
+            except database.DatabaseBusy:
+                busy += 1
+            latencies.append(time.perf_counter() - began)
+        database.shutdown()
+        return latencies, busy
+
+    latencies, busy = asyncio.run(run())
+    results.put((restaurant_ids, latencies, busy))
+
+
+def contend(database_path: str, hot_id: int, probe_ids: list, args) -> dict:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = [context.Process(target=place_orders, args=(database_path, [hot_id], args.seconds, results))
+               for _ in range(args.hot_workers)]
+    workers.append(context.Process(target=place_orders, args=(database_path, probe_ids, args.seconds, results)))
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    hot = [outcome for outcome in outcomes if outcome[0] == [hot_id]]
+    probe = next(outcome for outcome in outcomes if outcome[0] == probe_ids)
+    return {
+        "hot_orders_per_second": round(sum(len(latencies) for _, latencies, _ in hot) / args.seconds, 1),
+        "hot_busy_failures": sum(busy for _, _, busy in hot),
+        "probe_orders_per_second": round(len(probe[1]) / args.seconds, 1),
+        "probe_busy_failures": probe[2],
+        "probe_latency": summarize(probe[1]),
+    }
+
+
+def main(args) -> int:
+    path = use_generated_database(args.preset, source=args.database, prefix="restaurant-shard-bench-")
+
+    import sharding
+
+    output = tempfile.mkdtemp(prefix="restaurant-shard-bench-split-")
+    try:
+        sharding.Splitter(path, output, args.shards, progress=lambda message: None).split()
+        # The busy restaurant in shard 0, one probe restaurant in each other shard
+        hot_id = args.shards
+        probe_ids = list(range(1, args.shards))
+
+        results = {
+            "single_file": contend(path, hot_id, probe_ids, args),
+            "sharded": contend(os.path.join(output, "catalog.db"), hot_id, probe_ids, args),
+        }
+    finally:
+        shutil.rmtree(output, ignore_errors=True)
+
+    print(json.dumps({"shards": args.shards, "hot_workers": args.hot_workers, "seconds": args.seconds,
+                      "hot_restaurant": hot_id, "probe_restaurants": probe_ids, **results}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", default="tiny")
+    parser.add_argument("--database", help="copy this dataset instead of generating one")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--hot-workers", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,197 @@
+"""
+In-process response caches for hot read endpoints.
+
+Caches live in the worker process and are invalidated explicitly by the write
+paths that change their source rows. A TTL bounds staleness when several
+worker processes share one database, since an invalidation only reaches the
+process that performed the write.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from database import run_shard
+from responses import dumps
+
+DIRECTORY_CACHE_TTL = float(os.getenv("DIRECTORY_CACHE_TTL", "30"))
+MENU_CACHE_SIZE = int(os.getenv("MENU_CACHE_SIZE", "1024"))
+MENU_CACHE_TTL = float(os.getenv("MENU_CACHE_TTL", "300"))
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """True if an If-None-Match header value covers etag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class CachedQuery:
+    """Caches the result of one query until invalidated or expired
+
+    loader() is a coroutine function; it runs the query on the database pool
+    (fanning it out to the shards if need be) and returns the value to cache.
+    """
+
+    def __init__(self, name: str, loader, ttl: float = 0):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded_at = 0.0
+        self._valid = False
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._rebuilds = 0
+        self._rebuild_total = 0.0
+        self._last_rebuild = 0.0
+
+    def _fresh(self) -> bool:
+        if not self._valid:
+            return False
+        return not self.ttl or time.monotonic() - self._loaded_at < self.ttl
+
+    async def _rebuild(self):
+        with self._lock:
+            generation = self._generation
+        start = time.perf_counter()
+        value = await self.loader()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._rebuilds += 1
+            self._rebuild_total += elapsed
+            self._last_rebuild = elapsed
+            # A write that landed while we were loading makes this result stale
+            if generation == self._generation:
+                self._value = value
+                self._loaded_at = time.monotonic()
+                self._valid = True
+        return value
+
+    async def get(self):
+        """Return the cached value, rebuilding it on the database pool if needed"""
+        with self._lock:
+            if self._fresh():
+                self._hits += 1
+                return self._value
+            self._misses += 1
+        return await self._rebuild()
+
+    def invalidate(self):
+        """Drop the cached value; the next get() rebuilds it"""
+        with self._lock:
+            self._generation += 1
+            self._valid = False
+            self._value = None
+            self._invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self._invalidations,
+                "rebuilds": self._rebuilds,
+                "last_rebuild_ms": round(self._last_rebuild * 1000, 3),
+                "avg_rebuild_ms": round(self._rebuild_total / self._rebuilds * 1000, 3) if self._rebuilds else 0.0,
+                "ttl_seconds": self.ttl,
+            }
+
+
+class ResponseCache:
+    """Bounded LRU cache of pre-serialized JSON bodies and their ETags, keyed by restaurant id
+
+    loader(conn, key) returns the value to serialize for a key; it runs on
+    the restaurant's shard.
+    """
+
+    def __init__(self, name: str, loader, max_entries: int, ttl: float = 0):
+        self.name = name
+        self.loader = loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (body, etag, loaded_at)
+        self._generations = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._not_modified = 0
+
+    def _rebuild(self, conn, key):
+        with self._lock:
+            generation = self._generations.get(key, 0)
+        body = dumps(self.loader(conn, key))
+        etag = make_etag(body)
+        with self._lock:
+            # Skip storing if the key was invalidated while we were loading
+            if self._generations.get(key, 0) == generation:
+                self._store(key, (body, etag, time.monotonic()))
+        return body, etag
+
+    def _store(self, key, entry):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous[0])
+        self._entries[key] = entry
+        self._bytes += len(entry[0])
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted[0])
+            self._evictions += 1
+
+    async def get(self, key):
+        """Return (body, etag) for key, loading it on the database pool on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (not self.ttl or time.monotonic() - entry[2] < self.ttl):
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0], entry[1]
+            self._misses += 1
+        return await run_shard(key, self._rebuild, key)
+
+    def invalidate(self, key):
+        """Drop the entry for key; the next get() reloads it"""
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= len(entry[0])
+            self._invalidations += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self._not_modified += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "not_modified": self._not_modified,
+                "ttl_seconds": self.ttl,
+            }
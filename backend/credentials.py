@@ -0,0 +1,226 @@
+"""
+Password hashing for the API.
+
+Passwords are stored as salted scrypt (default) or PBKDF2-SHA256 hashes in a
+self-describing format, so the algorithm and its cost can be raised later
+without invalidating stored hashes:
+
+    scrypt$<n>$<r>$<p>$<salt>$<hash>
+    pbkdf2_sha256$<iterations>$<salt>$<hash>
+
+A slow KDF costs tens of milliseconds of CPU per call, so the async login
+and signup handlers never run it on the event loop. CredentialService runs
+it on a bounded process pool (KDF_WORKERS), where it neither blocks the
+loop nor competes with request handling for the GIL. At most
+KDF_MAX_PENDING calls may be queued; past that, callers get CredentialsBusy
+rather than an ever-growing login backlog.
+
+Unsalted SHA-256 hex digests from before this scheme still verify.
+CredentialService.check_password() hands back a fresh hash whenever the
+stored one is legacy or was made with a different cost, and the login
+handlers save it.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+PASSWORD_KDF = os.getenv("PASSWORD_KDF", "scrypt")
+SCRYPT_N = int(os.getenv("SCRYPT_N", "16384"))
+SCRYPT_R = int(os.getenv("SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.getenv("PBKDF2_ITERATIONS", "600000"))
+KDF_WORKERS = int(os.getenv("KDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+KDF_MAX_PENDING = int(os.getenv("KDF_MAX_PENDING", "256"))
+
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+class CredentialsBusy(Exception):
+    """Too many password hashes are already queued"""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024, dklen=HASH_BYTES)
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations, dklen=HASH_BYTES)
+
+
+def _current_prefix() -> str:
+    """Hash prefix (algorithm and cost) that new hashes are made with"""
+    if PASSWORD_KDF == "pbkdf2":
+        return f"pbkdf2_sha256${PBKDF2_ITERATIONS}"
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}"
+
+
+def hash_password(password: str, salt: bytes = None) -> str:
+    """Hash a password with the configured KDF (blocking; see CredentialService)
+
+    salt defaults to SALT_BYTES random bytes; only pass one to get
+    reproducible hashes, as datagen does.
+    """
+    salt = salt if salt is not None else secrets.token_bytes(SALT_BYTES)
+    if PASSWORD_KDF == "pbkdf2":
+        digest = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+    else:
+        digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{_current_prefix()}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """Check a password against a stored hash of any supported format (blocking)"""
+    if not stored:
+        return False
+    parts = stored.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            digest = _scrypt(password, _b64decode(parts[4]), n, r, p)
+        elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            digest = _pbkdf2(password, _b64decode(parts[2]), int(parts[1]))
+        elif len(parts) == 1:
+            # Legacy unsalted SHA-256 hex digest
+            return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+        else:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest, _b64decode(parts[-1]))
+
+
+def needs_rehash(stored: str) -> bool:
+    """True if stored was not made with the current algorithm and cost"""
+    return stored.rsplit("$", 2)[0] != _current_prefix()
+
+
+def _check(password: str, stored):
+    """Worker-side verify; returns (ok, replacement hash or None)"""
+    if stored is None:
+        # Unknown account: spend the same time as a real check
+        hash_password(password)
+        return False, None
+    if not verify_password(password, stored):
+        return False, None
+    return True, hash_password(password) if needs_rehash(stored) else None
+
+
+class CredentialService:
+    """Runs KDF work on a bounded process pool"""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+        self._hashes = 0
+        self._checks = 0
+        self._failures = 0
+        self._upgrades = 0
+        self._rejected = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise CredentialsBusy("Too many logins in progress, please retry")
+            self._pending += 1
+        start = time.perf_counter()
+        try:
+            executor = self._pool()
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # A worker died; the next call starts a fresh pool
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise CredentialsBusy("Password hashing workers restarted, please retry")
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._pending -= 1
+                self._total += elapsed
+                self._max = max(self._max, elapsed)
+
+    async def start(self):
+        """Start the worker processes so the first logins don't pay for it
+
+        Call this before the app starts any threads: where processes are
+        forked, the workers should not inherit locks held by other threads.
+        """
+        await asyncio.gather(*(
+            asyncio.get_running_loop().run_in_executor(self._pool(), _current_prefix)
+            for _ in range(self.workers)
+        ))
+
+    async def hash_password(self, password: str) -> str:
+        digest = await self._run(hash_password, password)
+        with self._lock:
+            self._hashes += 1
+        return digest
+
+    async def check_password(self, password: str, stored) -> tuple:
+        """Verify a password; returns (ok, new hash to store or None)
+
+        Pass stored=None for an unknown account so the caller's response time
+        does not reveal whether it exists.
+        """
+        ok, upgraded = await self._run(_check, password, stored)
+        with self._lock:
+            self._checks += 1
+            self._failures += 0 if ok else 1
+            self._upgrades += 1 if upgraded else 0
+        return ok, upgraded
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = self._hashes + self._checks
+            return {
+                "algorithm": _current_prefix(),
+                "workers": self.workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "hashes": self._hashes,
+                "checks": self._checks,
+                "failed_checks": self._failures,
+                "upgrades": self._upgrades,
+                "rejected": self._rejected,
+                "avg_ms": round(self._total / calls * 1000, 3) if calls else 0.0,
+                "max_ms": round(self._max * 1000, 3),
+            }
+
+
+service = CredentialService(KDF_WORKERS, KDF_MAX_PENDING)
@@ -0,0 +1,423 @@
+"""
+Database access for the Restaurant Management System backend.
+
+Connections are served from a fixed-size pool instead of being opened per
+request. Every pooled connection runs in WAL mode with tuned pragmas and keeps
+its own prepared-statement cache, so repeated queries skip re-parsing.
+
+Async handlers must not touch SQLite directly: run_db() executes a query
+function on a bounded thread pool and awaits the result, so a slow query only
+occupies one worker thread instead of the whole event loop.
+
+Writes go through run_db_write(), which opens the transaction with BEGIN
+IMMEDIATE so the write lock is taken before any read-check-write sequence
+starts. Lock contention is retried with jittered exponential backoff and
+surfaces as DatabaseBusy, never as a half-applied write.
+
+A database can be split into shards (`python manage.py split-shards`): the
+file at DATABASE_PATH becomes the catalog of users and restaurants, and each
+restaurant's tables, menu, orders and bookings live in shard file
+restaurant_id % shard count. Shards take their write locks independently, so
+a burst of orders at one restaurant no longer queues writers elsewhere.
+run_shard() and run_shard_write() route a call to a restaurant's shard and
+run_each_shard() fans one out to all of them. An unsharded database is its
+own single shard, so the same calls work before and after a split.
+"""
+
+import asyncio
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+# Configuration
+DATABASE_PATH = os.getenv("DATABASE_PATH", "restaurant_management.db")
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_WORKERS = int(os.getenv("DB_WORKERS", str(POOL_SIZE)))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+WRITE_RETRIES = int(os.getenv("DB_WRITE_RETRIES", "4"))
+WRITE_BACKOFF_MS = float(os.getenv("DB_WRITE_BACKOFF_MS", "10"))
+SHARD_POOL_SIZE = int(os.getenv("DB_SHARD_POOL_SIZE", str(POOL_SIZE)))
+# NORMAL syncs the WAL only at checkpoints; FULL syncs it on every commit
+SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+if SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    raise ValueError(f"DB_SYNCHRONOUS must be OFF, NORMAL, FULL or EXTRA, not {SYNCHRONOUS!r}")
+
+# Applied to every new connection
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    f"PRAGMA synchronous = {SYNCHRONOUS}",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free in time"""
+
+
+class DatabaseBusy(Exception):
+    """Raised when a write could not get the database lock after retrying"""
+
+
+def is_lock_error(error: Exception) -> bool:
+    """True for SQLite 'database is locked' / busy errors"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that goes back to its pool on close()"""
+
+    pool = None
+    checked_out_at = None
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+    def dispose(self):
+        """Really close the underlying connection"""
+        super().close()
+
+
+def _file_uri(path: str, mode: str = None) -> str:
+    uri = "file:" + pathname2url(os.path.abspath(path))
+    return f"{uri}?mode={mode}" if mode else uri
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared by readers and writers
+
+    Connections to a shard attach its catalog read-only, and a temporary
+    users view over catalog.users shadows the shard's own empty users table,
+    so queries joining users read the customers from the catalog.
+    """
+
+    def __init__(self, database: str, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT, catalog: str = None):
+        self.database = database
+        self.catalog = catalog
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._releases = 0
+        self._hold_total = 0.0
+        self._hold_max = 0.0
+        self._in_use = 0
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.database,
+            factory=PooledConnection,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            uri=self.catalog is not None,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        if self.catalog is not None:
+            conn.execute("ATTACH DATABASE ? AS catalog", (_file_uri(self.catalog, "ro"),))
+            conn.execute("CREATE TEMP VIEW users AS SELECT * FROM catalog.users")
+        conn.pool = self
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        """Check out a connection, opening a new one while below the pool size"""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+        start = time.perf_counter()
+        waited = False
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                waited = True
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s")
+
+        now = time.perf_counter()
+        wait = now - start
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            if waited:
+                self._waits += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+        conn.checked_out_at = now
+        return conn
+
+    def release(self, conn: PooledConnection):
+        """Return a connection to the pool, rolling back anything left open"""
+        if conn.checked_out_at is None:
+            return
+        hold = time.perf_counter() - conn.checked_out_at
+        conn.checked_out_at = None
+
+        broken = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            broken = True
+
+        with self._lock:
+            self._in_use -= 1
+            self._releases += 1
+            self._hold_total += hold
+            self._hold_max = max(self._hold_max, hold)
+            if broken or self._closed:
+                self._created -= 1
+
+        if broken or self._closed:
+            conn.dispose()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out and back in"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        """Pool usage statistics (times in milliseconds)"""
+        with self._lock:
+            checkouts = self._checkouts
+            releases = self._releases
+            return {
+                "size": self.size,
+                "open_connections": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "avg_wait_ms": round(self._wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 3),
+                "avg_checkout_ms": round(self._hold_total / releases * 1000, 3) if releases else 0.0,
+                "max_checkout_ms": round(self._hold_max * 1000, 3),
+            }
+
+    def close(self):
+        """Close all idle connections; busy ones are closed when released"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+            conn.dispose()
+
+
+class ShardMap:
+    """Routes each restaurant to the pool of the database file holding its tenant tables
+
+    The shard files are listed in the catalog's shards table, by path
+    relative to the catalog. While it is empty the catalog holds every table
+    and is the only shard.
+    """
+
+    def __init__(self, catalog: ConnectionPool):
+        self.catalog = catalog
+        self._pools = None
+        self._lock = threading.Lock()
+
+    def load(self) -> int:
+        """(Re)read the shard list from the catalog; returns the number of shard files"""
+        with self.catalog.connection() as conn:
+            try:
+                rows = conn.execute("SELECT id, path FROM shards ORDER BY id").fetchall()
+            except sqlite3.OperationalError:
+                rows = []  # catalog not migrated yet
+        if [row['id'] for row in rows] != list(range(len(rows))):
+            raise RuntimeError("Shard ids in the catalog must run from 0 without gaps")
+
+        directory = os.path.dirname(os.path.abspath(self.catalog.database))
+        pools = [ConnectionPool(os.path.join(directory, row['path']), size=SHARD_POOL_SIZE,
+                                catalog=self.catalog.database) for row in rows]
+        with self._lock:
+            previous, self._pools = self._pools, pools
+        for shard in previous or ():
+            shard.close()
+        return len(pools)
+
+    @property
+    def pools(self) -> list:
+        """One pool per shard, in shard order; just the catalog's when unsharded"""
+        if self._pools is None:
+            self.load()
+        return self._pools or [self.catalog]
+
+    @property
+    def sharded(self) -> bool:
+        return self.pools[0] is not self.catalog
+
+    def shard_of(self, restaurant_id: int) -> int:
+        return restaurant_id % len(self.pools)
+
+    def pool_for(self, restaurant_id: int) -> ConnectionPool:
+        pools = self.pools
+        return pools[restaurant_id % len(pools)]
+
+    def stats(self) -> dict:
+        if not self.sharded:
+            return {"shards": 0}
+        pools = [shard.stats() for shard in self.pools]
+        return {
+            "shards": len(pools),
+            "open_connections": sum(stats["open_connections"] for stats in pools),
+            "in_use": sum(stats["in_use"] for stats in pools),
+            "checkouts": sum(stats["checkouts"] for stats in pools),
+            "waits": sum(stats["waits"] for stats in pools),
+            "max_wait_ms": max(stats["max_wait_ms"] for stats in pools),
+        }
+
+    def close(self):
+        for shard in self._pools or ():
+            shard.close()
+
+
+pool = ConnectionPool(DATABASE_PATH)
+shards = ShardMap(pool)
+
+
+# Worker threads for database calls; never more than the pool can serve
+_executor = ThreadPoolExecutor(max_workers=min(DB_WORKERS, POOL_SIZE), thread_name_prefix="db")
+
+
+def _call_with_connection(db_pool, fn, args, kwargs):
+    with db_pool.connection() as conn:
+        return fn(conn, *args, **kwargs)
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run fn(conn, *args, **kwargs) on the catalog database and await it"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _call_with_connection, pool, fn, args, kwargs)
+
+
+async def run_shard(restaurant_id: int, fn, *args, **kwargs):
+    """Run fn(conn, *args, **kwargs) on the shard holding the restaurant's tables and await it"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _call_with_connection, shards.pool_for(restaurant_id),
+                                      fn, args, kwargs)
+
+
+async def run_each_shard(fn, *args, **kwargs) -> list:
+    """Run fn(conn, *args, **kwargs) on every shard concurrently; returns the results in shard order"""
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(_executor, _call_with_connection, shard, fn, args, kwargs)
+        for shard in shards.pools
+    ))
+
+
+def _call_in_write_transaction(db_pool, fn, args, kwargs):
+    with db_pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, *args, **kwargs)
+            if conn.in_transaction:
+                conn.commit()
+            return result
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+
+_write_stats = {"transactions": 0, "lock_retries": 0, "busy_failures": 0}
+
+
+async def run_pool_write(db_pool: ConnectionPool, fn, *args, **kwargs):
+    """run_db_write() on the given pool"""
+    loop = asyncio.get_running_loop()
+    for attempt in range(WRITE_RETRIES + 1):
+        try:
+            result = await loop.run_in_executor(_executor, _call_in_write_transaction, db_pool, fn, args, kwargs)
+            _write_stats["transactions"] += 1
+            return result
+        except sqlite3.OperationalError as e:
+            if not is_lock_error(e):
+                raise
+            if attempt == WRITE_RETRIES:
+                _write_stats["busy_failures"] += 1
+                raise DatabaseBusy("Database is busy, please retry") from e
+            _write_stats["lock_retries"] += 1
+            # Back off off-thread so waiting writers don't hold database workers
+            delay = WRITE_BACKOFF_MS * (2 ** attempt) * random.uniform(0.5, 1.5)
+            await asyncio.sleep(delay / 1000)
+
+
+async def run_db_write(fn, *args, **kwargs):
+    """Run fn(conn, ...) on the catalog in an IMMEDIATE transaction, retrying on lock contention
+
+    fn may commit itself; anything it leaves open is committed afterwards.
+    Raises DatabaseBusy once the retries are exhausted.
+    """
+    return await run_pool_write(pool, fn, *args, **kwargs)
+
+
+async def run_shard_write(restaurant_id: int, fn, *args, **kwargs):
+    """run_db_write() on the shard holding the restaurant's tables"""
+    return await run_pool_write(shards.pool_for(restaurant_id), fn, *args, **kwargs)
+
+
+def write_stats() -> dict:
+    return dict(_write_stats)
+
+
+def shutdown():
+    """Stop the database workers and close pooled connections"""
+    _executor.shutdown(wait=True)
+    shards.close()
+    pool.close()
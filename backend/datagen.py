@@ -0,0 +1,442 @@
+"""
+Synthetic datasets for load testing.
+
+`python manage.py generate --preset large --seed 7` builds a database with
+thousands of restaurants and millions of users, orders, order items and
+bookings. The output depends only on the preset, the seed and the end date,
+so two runs with the same arguments produce the same rows, password hashes
+included (their salts are drawn from the seed). Only the bookkeeping
+timestamps in schema_migrations and platform_stats record the run itself.
+
+The data is skewed the way real traffic is: a few restaurants get most of
+the orders (Zipf), early sign-ups order far more often than recent ones,
+order volume grows over the year, peaks at lunch and dinner and on Fridays
+and Saturdays, and bookings cluster in the evening slots.
+
+Loading takes the fast paths a fresh, throwaway file allows:
+
+- rows are streamed through executemany() with explicit ids
+- secondary indexes and triggers are dropped first and recreated once at
+  the end, so each index is built in one sorted pass
+- journaling and fsync are off while loading (a crash leaves a file to
+  delete, not one to repair)
+- platform_stats, the sales rollups, the dietary tag masks and the search
+  index are recomputed in bulk afterwards instead of by a trigger per row
+"""
+
+import bisect
+import itertools
+import math
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import credentials
+import migrations
+import queries
+
+PRESETS = {
+    "tiny": {"restaurants": 50, "users": 5_000, "orders": 50_000, "bookings": 10_000},
+    "small": {"restaurants": 500, "users": 50_000, "orders": 500_000, "bookings": 100_000},
+    "medium": {"restaurants": 2_000, "users": 500_000, "orders": 2_000_000, "bookings": 500_000},
+    "large": {"restaurants": 5_000, "users": 2_000_000, "orders": 3_000_000, "bookings": 1_000_000},
+    "xl": {"restaurants": 10_000, "users": 5_000_000, "orders": 10_000_000, "bookings": 3_000_000},
+}
+
+HISTORY_DAYS = 365
+BOOKING_LEAD_DAYS = 30
+CHUNK_SIZE = 50_000
+
+CUSTOMER_PASSWORD = "password123"
+ADMIN_PASSWORD = "admin123"
+
+CUISINES = [
+    ("Italian", 14), ("American", 12), ("Mexican", 10), ("Chinese", 10), ("Japanese", 8),
+    ("Indian", 8), ("Thai", 6), ("Mediterranean", 6), ("French", 4), ("Korean", 4),
+    ("Vietnamese", 4), ("Greek", 3), ("Spanish", 3), ("Fine Dining", 2), ("Vegan", 2),
+]
+NAME_FIRST = ["Golden", "Red", "Blue", "Little", "Old", "Happy", "Silver", "Green", "Royal", "Urban",
+              "Rustic", "Lucky", "Sunny", "Wild", "Hidden", "Corner", "Harbor", "Garden", "Copper", "Velvet"]
+NAME_SECOND = ["Spoon", "Fork", "Lantern", "Table", "Olive", "Dragon", "Lotus", "Oak", "Pepper", "Kettle",
+               "Basil", "Tiger", "Bamboo", "Anchor", "Fig", "Saffron", "Ember", "Orchard", "Mill", "Plate"]
+NAME_SUFFIX = ["Kitchen", "Bistro", "House", "Grill", "Cafe", "Eatery", "Diner", "Tavern", "Bar", "Room"]
+STREETS = ["Main St", "Oak Ave", "Market St", "Park Blvd", "River Rd", "Elm St", "Harbor Way", "Hill St"]
+
+FIRST_NAMES = ["James", "Mary", "Wei", "Aisha", "Carlos", "Priya", "Noah", "Olivia", "Yuki", "Fatima",
+               "Liam", "Emma", "Mateo", "Sofia", "Arjun", "Chloe", "Omar", "Hana", "Lucas", "Zara"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Patel", "Kim", "Nguyen", "Johnson", "Rossi", "Khan", "Silva",
+              "Brown", "Martin", "Tanaka", "Lopez", "Müller", "Haddad", "Novak", "Okafor", "Jensen", "Costa"]
+
+MENU_CATEGORIES = [("Starters", 9.0, 5), ("Mains", 22.0, 8), ("Sides", 6.0, 3), ("Desserts", 9.0, 3), ("Drinks", 4.5, 4)]
+DISH_WORDS = ["Grilled", "Crispy", "Roasted", "Spicy", "Smoked", "Braised", "Seared", "Garlic", "Lemon", "Truffle",
+              "Herb", "Honey", "Chili", "Ginger", "Sesame", "Charred"]
+DISH_NOUNS = ["Chicken", "Salmon", "Tofu", "Beef", "Noodles", "Salad", "Soup", "Dumplings", "Risotto", "Tacos",
+              "Curry", "Shrimp", "Lamb", "Pasta", "Burger", "Flatbread", "Tart", "Pudding", "Lemonade", "Tea"]
+DIETARY_TAGS = ["vegetarian", "vegan", "gluten-free", "healthy", "spicy", "dairy-free"]
+
+TABLE_CAPACITIES = [2, 2, 4, 4, 4, 6, 8]
+TABLE_TYPES = ["window", "corner", "center", "private"]
+TABLE_FEATURES = "WiFi,Power Outlet"
+
+ORDER_TYPES = [("dine-in", 40), ("pickup", 35), ("delivery", 25)]
+OPEN_STATUSES = [("pending", 20), ("confirmed", 20), ("preparing", 15), ("ready", 10), ("completed", 30), ("cancelled", 5)]
+ORDER_ITEM_COUNTS = [(1, 30), (2, 30), (3, 20), (4, 12), (5, 8)]
+QUANTITIES = [(1, 80), (2, 15), (3, 5)]
+# Share of the day's orders placed in each hour (lunch and dinner peaks)
+ORDER_HOURS = [0, 0, 0, 0, 0, 0, 1, 2, 3, 3, 4, 8, 12, 9, 4, 3, 4, 8, 12, 11, 7, 4, 2, 1]
+# Monday..Sunday
+WEEKDAY_WEIGHTS = [0.8, 0.85, 0.9, 1.0, 1.35, 1.45, 1.15]
+
+BOOKING_SLOTS = [("11:30", 1), ("13:30", 1), ("17:00", 2), ("19:00", 4), ("21:00", 2)]
+BOOKING_GUESTS = [(1, 5), (2, 40), (3, 12), (4, 25), (5, 6), (6, 8), (7, 2), (8, 2)]
+BOOKING_DURATION = 90
+
+
+def _weighted(pairs):
+    """(values, cumulative weights) for rng.choices()"""
+    values = [value for value, _ in pairs]
+    return values, list(itertools.accumulate(weight for _, weight in pairs))
+
+
+def _zipf_weights(count: int, exponent: float = 1.1) -> list:
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def _split(total: int, weights: list) -> list:
+    """Spread total over len(weights) buckets in proportion to weights, summing exactly to total"""
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    remainders = sorted(range(len(weights)), key=lambda i: counts[i] - weights[i] * scale)
+    for i in remainders[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def _timestamp(day: date, seconds: int) -> str:
+    return f"{day.isoformat()} {seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class DatasetGenerator:
+    """Generates one dataset into an empty SQLite file"""
+
+    def __init__(self, preset: str, seed: int, end_date: date = None, progress=print):
+        self.preset = preset
+        self.sizes = PRESETS[preset]
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.end_date = end_date or date.today()
+        self.start_date = self.end_date - timedelta(days=HISTORY_DAYS)
+        self.progress = progress or (lambda message: None)
+        self.counts = {}
+        self.timings = {}
+
+        # Filled in as tables are generated; later tables draw from them
+        self.restaurant_ids = []
+        self.restaurant_weights = []
+        self.opened = {}  # restaurant_id -> (day, second of day) the restaurant joined
+        self.menus = {}  # restaurant_id -> (item ids, prices, cumulative weights)
+        self.tables = {}  # restaurant_id -> [(capacity, table_id)] sorted by capacity
+
+    # -- helpers --------------------------------------------------------
+
+    def _load(self, conn, table: str, columns: tuple, rows):
+        """Stream rows into table in CHUNK_SIZE transactions"""
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        rows = iter(rows)
+        loaded = 0
+        while True:
+            chunk = list(itertools.islice(rows, CHUNK_SIZE))
+            if not chunk:
+                break
+            conn.executemany(sql, chunk)
+            conn.commit()
+            loaded += len(chunk)
+        self.counts[table] = self.counts.get(table, 0) + loaded
+
+    def _timed(self, label: str, fn, *args):
+        start = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - start
+        self.timings[label] = round(elapsed, 2)
+        count = self.counts.get(label)
+        rows = f"{count:,} rows in " if count is not None else ""
+        self.progress(f"  {label}: {rows}{elapsed:.1f}s")
+
+    def _customer(self, max_user_id: int) -> int:
+        """A customer who had signed up by then; early sign-ups order far more often"""
+        return 1 + int(max_user_id * self.rng.random() ** 2.5)
+
+    def _users_by(self, day_index: int) -> int:
+        """Highest user id signed up by day_index of the history window"""
+        fraction = min(1.0, max(day_index, 1) / HISTORY_DAYS)
+        return max(1, min(self.sizes["users"], int(self.sizes["users"] * fraction ** 2)))
+
+    # -- tables ---------------------------------------------------------
+
+    def _restaurants(self, admin_hash: str):
+        rng = self.rng
+        cuisines, cuisine_weights = _weighted(CUISINES)
+        for restaurant_id in range(1, self.sizes["restaurants"] + 1):
+            name = f"{rng.choice(NAME_FIRST)} {rng.choice(NAME_SECOND)} {rng.choice(NAME_SUFFIX)}"
+            cuisine = rng.choices(cuisines, cum_weights=cuisine_weights)[0]
+            opened = self.start_date - timedelta(days=rng.randint(0, 3 * HISTORY_DAYS))
+            opened_at = rng.randint(0, 86399)
+            self.opened[restaurant_id] = (opened, opened_at)
+            yield (
+                restaurant_id, name, cuisine, round(rng.uniform(3.2, 5.0), 1), None,
+                f"{rng.randint(1, 9999)} {rng.choice(STREETS)}", f"+1 (555) {rng.randint(0, 9999999):07d}",
+                f"{cuisine} food at {name}", f"R{restaurant_id:06d}", admin_hash,
+                0 if rng.random() < 0.03 else 1, _timestamp(opened, opened_at), 1,
+            )
+
+    def _tables(self):
+        rng = self.rng
+        table_id = 0
+        for restaurant_id in self.restaurant_ids:
+            layout = []
+            for number in range(1, rng.randint(6, 40) + 1):
+                table_id += 1
+                capacity = rng.choice(TABLE_CAPACITIES)
+                layout.append((capacity, table_id))
+                yield (table_id, restaurant_id, number, capacity, 'available', rng.choice(TABLE_TYPES),
+                       TABLE_FEATURES, None, (number % 5) * 18 + 10, (number // 5) * 20 + 10)
+            self.tables[restaurant_id] = sorted(layout)
+
+    def _menu_items(self):
+        rng = self.rng
+        item_id = 0
+        for restaurant_id in self.restaurant_ids:
+            ids, prices = [], []
+            # Dishes were added between opening and the start of the order history
+            opened, opened_at = self.opened[restaurant_id]
+            menu_days = (self.start_date - opened).days
+            for category, base_price, max_items in MENU_CATEGORIES:
+                for _ in range(rng.randint(2, max_items)):
+                    item_id += 1
+                    price = round(base_price * math.exp(rng.gauss(0, 0.35)), 2)
+                    dietary = ",".join(tag for tag in DIETARY_TAGS if rng.random() < 0.15)
+                    ids.append(item_id)
+                    prices.append(price)
+                    added = rng.randint(0, menu_days)
+                    added_at = rng.randrange(0 if added else opened_at, 86400)
+                    yield (item_id, restaurant_id, f"{rng.choice(DISH_WORDS)} {rng.choice(DISH_NOUNS)}", category,
+                           price, None, None, dietary, 1 if rng.random() < 0.05 else 0, 1,
+                           _timestamp(opened + timedelta(days=added), added_at))
+            # A handful of dishes sell most of the plates
+            order = list(range(len(ids)))
+            rng.shuffle(order)
+            self.menus[restaurant_id] = ([ids[i] for i in order], [prices[i] for i in order],
+                                         _zipf_weights(len(ids), 0.9))
+
+    def _users(self, customer_hash: str):
+        rng = self.rng
+        total = self.sizes["users"]
+        span = HISTORY_DAYS * 86400
+        for user_id in range(1, total + 1):
+            # Sign-ups accelerate: ids grow with the square of time
+            offset = int(span * math.sqrt(user_id / total)) - 1
+            created = _timestamp(self.start_date + timedelta(days=offset // 86400), offset % 86400)
+            yield (user_id, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", f"user{user_id:08d}@example.com",
+                   f"+1 (555) {rng.randint(0, 9999999):07d}", customer_hash, 'customer', created,
+                   0 if rng.random() < 0.02 else 1)
+
+    def _days(self, total: int, first: int, last: int, weight_of):
+        """(day index, count) for each day in [first, last), counts following weight_of(day index)"""
+        indexes = list(range(first, last))
+        return zip(indexes, _split(total, [weight_of(i) for i in indexes]))
+
+    def _order_day_weight(self, day_index: int) -> float:
+        day = self.start_date + timedelta(days=day_index)
+        return (0.4 + day_index / HISTORY_DAYS) * WEEKDAY_WEIGHTS[day.weekday()]
+
+    def _orders(self, conn):
+        """Orders and their items, generated day by day so ids follow created_at"""
+        rng = self.rng
+        order_types, order_type_weights = _weighted(ORDER_TYPES)
+        open_statuses, open_status_weights = _weighted(OPEN_STATUSES)
+        item_counts, item_count_weights = _weighted(ORDER_ITEM_COUNTS)
+        quantities, quantity_weights = _weighted(QUANTITIES)
+        hour_weights = list(itertools.accumulate(ORDER_HOURS))
+        restaurants, restaurant_weights = self.restaurant_ids, self.restaurant_weights
+        menus = self.menus
+
+        order_columns = ("id", "user_id", "restaurant_id", "order_type", "status", "total_amount", "created_at")
+        item_columns = ("id", "order_id", "menu_item_id", "quantity", "price")
+        order_id = item_id = 0
+        orders, items = [], []
+
+        for day_index, count in self._days(self.sizes["orders"], 1, HISTORY_DAYS + 1, self._order_day_weight):
+            day = self.start_date + timedelta(days=day_index)
+            recent = day_index >= HISTORY_DAYS - 1
+            max_user = self._users_by(day_index)
+            hours = rng.choices(range(24), cum_weights=hour_weights, k=count)
+            seconds = sorted(hour * 3600 + rng.randrange(3600) for hour in hours)
+            chosen = rng.choices(restaurants, cum_weights=restaurant_weights, k=count)
+
+            for second, restaurant_id in zip(seconds, chosen):
+                order_id += 1
+                menu_ids, menu_prices, menu_weights = menus[restaurant_id]
+                total = 0.0
+                for _ in range(rng.choices(item_counts, cum_weights=item_count_weights)[0]):
+                    item_id += 1
+                    index = bisect.bisect(menu_weights, rng.random() * menu_weights[-1])
+                    quantity = rng.choices(quantities, cum_weights=quantity_weights)[0]
+                    items.append((item_id, order_id, menu_ids[index], quantity, menu_prices[index]))
+                    total += menu_prices[index] * quantity
+
+                if recent:
+                    status = rng.choices(open_statuses, cum_weights=open_status_weights)[0]
+                else:
+                    status = 'cancelled' if rng.random() < 0.06 else 'completed'
+                orders.append((order_id, self._customer(max_user), restaurant_id,
+                               rng.choices(order_types, cum_weights=order_type_weights)[0],
+                               status, round(total, 2), _timestamp(day, second)))
+
+            if len(orders) >= CHUNK_SIZE:
+                self._load(conn, "orders", order_columns, orders)
+                self._load(conn, "order_items", item_columns, items)
+                orders, items = [], []
+
+        self._load(conn, "orders", order_columns, orders)
+        self._load(conn, "order_items", item_columns, items)
+
+    def _booking_day_weight(self, day_index: int) -> float:
+        day = self.start_date + timedelta(days=day_index)
+        weight = WEEKDAY_WEIGHTS[day.weekday()] ** 2
+        if day_index > HISTORY_DAYS:
+            # Fewer bookings made yet the further ahead the date
+            weight *= 1 - (day_index - HISTORY_DAYS) / (BOOKING_LEAD_DAYS + 1)
+        return weight
+
+    def _bookings(self):
+        rng = self.rng
+        slots, slot_weights = _weighted(BOOKING_SLOTS)
+        guest_counts, guest_weights = _weighted(BOOKING_GUESTS)
+        restaurants, restaurant_weights = self.restaurant_ids, self.restaurant_weights
+        taken = set()
+        booking_id = 0
+        skipped = 0
+
+        days = self._days(self.sizes["bookings"], 1, HISTORY_DAYS + BOOKING_LEAD_DAYS + 1, self._booking_day_weight)
+        for day_index, count in days:
+            day = (self.start_date + timedelta(days=day_index)).isoformat()
+            max_user = self._users_by(min(day_index, HISTORY_DAYS))
+            for _ in range(count):
+                guests = rng.choices(guest_counts, cum_weights=guest_weights)[0]
+                # Slots are two hours apart, so one booking per table and slot never overlaps
+                for _attempt in range(4):
+                    restaurant_id = rng.choices(restaurants, cum_weights=restaurant_weights)[0]
+                    layout = self.tables[restaurant_id]
+                    first = bisect.bisect_left(layout, (guests, 0))
+                    if first == len(layout):
+                        continue
+                    table_id = layout[rng.randrange(first, len(layout))][1]
+                    slot = rng.choices(slots, cum_weights=slot_weights)[0]
+                    if (table_id, day_index, slot) not in taken:
+                        break
+                else:
+                    skipped += 1
+                    continue
+                taken.add((table_id, day_index, slot))
+
+                booking_id += 1
+                booked_on = self.start_date + timedelta(days=max(0, day_index - rng.randint(0, 14)))
+                yield (booking_id, self._customer(max_user), restaurant_id, table_id, day, slot, guests,
+                       None, 'cancelled' if rng.random() < 0.08 else 'confirmed',
+                       _timestamp(min(booked_on, self.end_date), rng.randrange(86400)), BOOKING_DURATION)
+
+        self.counts["bookings_skipped"] = skipped
+
+    # -- driver ---------------------------------------------------------
+
+    def generate(self, path: str) -> dict:
+        """Build the dataset into path, which must not exist yet"""
+        if os.path.exists(path):
+            raise FileExistsError(f"{path} already exists")
+
+        start = time.perf_counter()
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        try:
+            migrations.migrate(conn)
+
+            # Secondary indexes and triggers are rebuilt once the rows are in
+            deferred = conn.execute('''
+                SELECT type, name, sql FROM sqlite_master
+                WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+            ''').fetchall()
+            for kind, name, _ in deferred:
+                conn.execute(f"DROP {kind.upper()} {name}")
+            conn.commit()
+
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            conn.execute("PRAGMA cache_size = -262144")
+
+            self.progress(f"Generating '{self.preset}' dataset (seed {self.seed}, ending {self.end_date}) into {path}")
+            # Two hashes for every account: the KDF is far too slow to run per row.
+            # Their salts come from the seed too, so the hashes are reproducible.
+            salts = random.Random(f"salts-{self.seed}")
+            admin_hash = credentials.hash_password(ADMIN_PASSWORD, salts.randbytes(credentials.SALT_BYTES))
+            customer_hash = credentials.hash_password(CUSTOMER_PASSWORD, salts.randbytes(credentials.SALT_BYTES))
+
+            self._timed("restaurants", self._load, conn, "restaurants",
+                        ("id", "name", "cuisine", "rating", "image", "address", "phone", "description",
+                         "admin_id", "admin_password_hash", "is_active", "created_at", "menu_version"),
+                        self._restaurants(admin_hash))
+            self.restaurant_ids = list(range(1, self.sizes["restaurants"] + 1))
+            self.rng.shuffle(self.restaurant_ids)
+            self.restaurant_weights = _zipf_weights(len(self.restaurant_ids))
+
+            self._timed("tables", self._load, conn, "tables",
+                        ("id", "restaurant_id", "number", "capacity", "status", "type", "features", "image", "x", "y"),
+                        self._tables())
+            self._timed("menu_items", self._load, conn, "menu_items",
+                        ("id", "restaurant_id", "name", "category", "price", "description", "image", "dietary",
+                         "chef_special", "available", "created_at"),
+                        self._menu_items())
+            self._timed("users", self._load, conn, "users",
+                        ("id", "name", "email", "phone", "password_hash", "role", "created_at", "is_active"),
+                        self._users(customer_hash))
+            self._timed("orders", self._orders, conn)
+            self.progress(f"    ({self.counts['order_items']:,} order items)")
+            self._timed("bookings", self._load, conn, "bookings",
+                        ("id", "user_id", "restaurant_id", "table_id", "date", "time", "guests",
+                         "special_requests", "status", "created_at", "duration_minutes"),
+                        self._bookings())
+
+            def rebuild_indexes():
+                for kind, _, sql in deferred:
+                    if kind == 'index':
+                        conn.execute(sql)
+                conn.commit()
+
+            def rebuild_derived():
+                queries.rebuild_sales_rollups(conn)
+                queries.reconcile_platform_stats(conn, fix=True)
+                queries.rebuild_dietary_index(conn)
+                queries.rebuild_search_index(conn)
+                for kind, _, sql in deferred:
+                    if kind == 'trigger':
+                        conn.execute(sql)
+                conn.commit()
+
+            self._timed("indexes", rebuild_indexes)
+            self._timed("rollups, stats, tags and search", rebuild_derived)
+            self._timed("analyze", conn.execute, "ANALYZE")
+
+            conn.execute("PRAGMA locking_mode = NORMAL")
+            conn.execute("PRAGMA journal_mode = WAL")
+        finally:
+            conn.close()
+
+        self.timings["total"] = round(time.perf_counter() - start, 2)
+        rows = sum(count for table, count in self.counts.items() if table != "bookings_skipped")
+        self.progress(f"Done: {rows:,} rows in {self.timings['total']:.1f}s "
+                      f"({os.path.getsize(path) / 1024 / 1024:.0f} MB)")
+        return {"preset": self.preset, "seed": self.seed, "end_date": self.end_date.isoformat(),
+                "rows": dict(self.counts), "seconds": dict(self.timings)}
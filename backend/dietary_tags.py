@@ -0,0 +1,40 @@
+"""
+Dietary tags.
+
+menu_items.dietary stays the comma-separated list the API reads and writes,
+but it is stored in canonical form (lower case, hyphenated, no duplicates),
+and every tag in it is registered in the dietary_tags dictionary with a bit
+number (migration 9). Triggers keep menu_items.dietary_mask, the OR of the
+item's tag bits, and the menu_item_dietary_tags join table in step with the
+list, so "vegetarian and gluten-free but not spicy" is one bitwise test per
+row in SQL:
+
+    dietary_mask & :include = :include AND dietary_mask & :exclude = 0
+
+A mask is a signed 64-bit SQLite integer, so the dictionary holds at most
+MAX_TAGS tags.
+"""
+
+import re
+
+MAX_TAGS = 63
+
+_SEPARATORS = re.compile(r"[\s_]+")
+
+
+def parse(text) -> list:
+    """Canonical tags of a comma-separated list, in their original order"""
+    if not text:
+        return []
+    tags = []
+    for tag in text.split(","):
+        tag = _SEPARATORS.sub("-", tag.strip().lower())
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def canonical(text):
+    """The stored form of a dietary list, or None when it has no tags"""
+    return ",".join(parse(text)) or None
+
@@ -0,0 +1,180 @@
+"""
+Per-restaurant push feed of order and booking changes.
+
+Write handlers publish a compact event to the hub once their transaction
+has committed, and admin dashboards keep a Server-Sent Events stream open
+(GET /api/admin/events) instead of re-polling the orders list.
+
+Each restaurant has its own channel with a sequence number. An event is
+encoded into its SSE frame once and the same bytes are queued to every
+subscriber, so fan-out costs one queue put per connected client. The last
+EVENT_BACKLOG frames per channel are kept: a client that reconnects with
+Last-Event-ID is sent what it missed, or a "reset" event when the gap is
+older than the backlog or comes from before a restart, after which it
+should reload from the REST endpoints.
+
+A subscriber that falls EVENT_QUEUE_SIZE frames behind is disconnected
+rather than left to buffer without bound; its reconnect resumes from the
+backlog. Like the response caches, the hub lives in the worker process,
+so with several workers a stream only carries writes handled by the
+worker it is connected to.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+
+from responses import dumps
+
+EVENT_BACKLOG = int(os.getenv("EVENT_BACKLOG", "1000"))
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+EVENT_HEARTBEAT = float(os.getenv("EVENT_HEARTBEAT", "15"))
+
+HEARTBEAT = b": keepalive\n\n"
+
+
+class _Channel:
+    __slots__ = ("seq", "backlog", "subscribers")
+
+    def __init__(self):
+        self.seq = 0
+        self.backlog = deque(maxlen=EVENT_BACKLOG)
+        self.subscribers = set()
+
+
+class Subscription:
+    """One connected client: frames to replay first, then its live queue"""
+
+    __slots__ = ("restaurant_id", "replay", "queue", "lagged")
+
+    def __init__(self, restaurant_id: int, replay: list):
+        self.restaurant_id = restaurant_id
+        self.replay = replay
+        self.queue = asyncio.Queue(EVENT_QUEUE_SIZE)
+        self.lagged = False
+
+
+class EventHub:
+    """In-process publish/subscribe hub with one channel per restaurant
+
+    publish() and subscribe() must be called from the event loop.
+    """
+
+    def __init__(self):
+        # Prefixes event ids so ids from before a restart are recognised as stale
+        self.epoch = format(int(time.time() * 1000), "x")
+        self._channels = {}
+        self._subscribers = 0
+        self._peak_subscribers = 0
+        self._connections = 0
+        self._published = 0
+        self._delivered = 0
+        self._lagged = 0
+        self._resumes = 0
+        self._replayed = 0
+        self._resets = 0
+        self._publish_total = 0.0
+        self._publish_max = 0.0
+
+    def _channel(self, restaurant_id: int) -> _Channel:
+        channel = self._channels.get(restaurant_id)
+        if channel is None:
+            channel = self._channels[restaurant_id] = _Channel()
+        return channel
+
+    def _frame(self, seq: int, event: str, data: dict) -> bytes:
+        return b"id: %s-%d\nevent: %s\ndata: %s\n\n" % (self.epoch.encode(), seq, event.encode(), dumps(data))
+
+    def _parse_id(self, last_event_id: str):
+        """Sequence number of an event id from this process, or None"""
+        epoch, _, seq = last_event_id.strip().rpartition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def publish(self, restaurant_id: int, event: str, data: dict):
+        """Append an event to the restaurant's channel and queue it to every subscriber"""
+        start = time.perf_counter()
+        channel = self._channel(restaurant_id)
+        channel.seq += 1
+        frame = self._frame(channel.seq, event, data)
+        channel.backlog.append((channel.seq, frame))
+        for subscription in channel.subscribers:
+            if subscription.lagged:
+                continue
+            try:
+                subscription.queue.put_nowait(frame)
+                self._delivered += 1
+            except asyncio.QueueFull:
+                subscription.lagged = True
+                self._lagged += 1
+        elapsed = time.perf_counter() - start
+        self._published += 1
+        self._publish_total += elapsed
+        self._publish_max = max(self._publish_max, elapsed)
+
+    def subscribe(self, restaurant_id: int, last_event_id: str = None) -> Subscription:
+        """Register a client, resuming after last_event_id when it is still in the backlog"""
+        channel = self._channel(restaurant_id)
+        if last_event_id is None:
+            replay = [self._frame(channel.seq, "ready", {"seq": channel.seq})]
+        else:
+            seq = self._parse_id(last_event_id)
+            oldest = channel.backlog[0][0] if channel.backlog else channel.seq + 1
+            if seq is None or seq > channel.seq or seq < oldest - 1:
+                replay = [self._frame(channel.seq, "reset", {"seq": channel.seq})]
+                self._resets += 1
+            else:
+                replay = [frame for frame_seq, frame in channel.backlog if frame_seq > seq]
+                self._resumes += 1
+                self._replayed += len(replay)
+
+        subscription = Subscription(restaurant_id, replay)
+        channel.subscribers.add(subscription)
+        self._connections += 1
+        self._subscribers += 1
+        self._peak_subscribers = max(self._peak_subscribers, self._subscribers)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        channel = self._channels.get(subscription.restaurant_id)
+        if channel is not None and subscription in channel.subscribers:
+            channel.subscribers.discard(subscription)
+            self._subscribers -= 1
+
+    async def stream(self, subscription: Subscription, expires_at: float = None):
+        """SSE frames for a subscription until the client goes away, lags or its token expires"""
+        try:
+            for frame in subscription.replay:
+                yield frame
+            subscription.replay = None
+            while not subscription.lagged and (expires_at is None or time.time() < expires_at):
+                try:
+                    frame = await asyncio.wait_for(subscription.queue.get(), EVENT_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    frame = HEARTBEAT
+                yield frame
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "channels": len(self._channels),
+            "subscribers": self._subscribers,
+            "peak_subscribers": self._peak_subscribers,
+            "connections": self._connections,
+            "published": self._published,
+            "delivered": self._delivered,
+            "lagged_disconnects": self._lagged,
+            "resumes": self._resumes,
+            "replayed": self._replayed,
+            "resets": self._resets,
+            "avg_publish_us": round(self._publish_total / self._published * 1e6, 2) if self._published else 0.0,
+            "max_publish_us": round(self._publish_max * 1e6, 2),
+            "backlog": EVENT_BACKLOG,
+            "queue_size": EVENT_QUEUE_SIZE,
+        }
+
+
+hub = EventHub()
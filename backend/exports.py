@@ -0,0 +1,131 @@
+"""
+Streaming exports of a restaurant's order and booking history.
+
+An export is read in chunks of EXPORT_CHUNK_SIZE rows, each fetched by its
+own short keyset query (see queries.export_orders/export_bookings) on the
+database thread pool. No connection or read transaction is held between
+chunks, so a long export neither pins a pool connection nor keeps an old
+WAL snapshot alive, and it never takes the write lock. Rows created after
+the export started are left out, so it always ends.
+
+Each chunk is encoded (NDJSON or CSV) and optionally gzipped on the same
+worker thread before it is handed to the response, so memory stays at one
+chunk and the event loop does no per-row work.
+"""
+
+import csv
+import io
+import os
+import zlib
+from datetime import datetime
+
+import queries
+from database import run_shard
+from responses import dumps
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+EXPORT_FORMATS = ["ndjson", "csv"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+# CSV has one row per order line; order columns repeat on each of its lines
+ORDER_COLUMNS = ["order_id", "created_at", "status", "order_type", "total_amount", "scheduled_time",
+                 "special_instructions", "customer_name", "customer_email",
+                 "menu_item_id", "item_name", "quantity", "price"]
+BOOKING_COLUMNS = ["id", "date", "time", "duration_minutes", "guests", "status", "special_requests",
+                   "created_at", "table_number", "table_capacity", "customer_name", "customer_email",
+                   "customer_phone"]
+
+_stats = {"started": 0, "completed": 0, "aborted": 0, "active": 0, "rows": 0, "bytes": 0}
+
+
+def _order_lines(order: dict):
+    base = [order['id'], order['created_at'], order['status'], order['order_type'], order['total_amount'],
+            order['scheduled_time'], order['special_instructions'], order['customer_name'],
+            order['customer_email']]
+    if not order['items']:
+        yield base + [None, None, None, None]
+    for item in order['items']:
+        yield base + [item['menu_item_id'], item['item_name'], item['quantity'], item['price']]
+
+
+def _booking_lines(booking: dict):
+    yield [booking[column] for column in BOOKING_COLUMNS]
+
+
+class _Export:
+    """State of one export between chunks"""
+
+    def __init__(self, fetch, key, lines, columns, restaurant_id: int, export_format: str,
+                 compress: bool, date_from, date_to):
+        self.fetch = fetch
+        self.key = key
+        self.lines = lines
+        self.columns = columns
+        self.restaurant_id = restaurant_id
+        self.export_format = export_format
+        self.date_from = date_from
+        self.date_to = date_to
+        self.until = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        self.after = None
+        self.done = False
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def _encode(self, rows: list, header: bool) -> bytes:
+        if self.export_format == "ndjson":
+            return b"".join(dumps(row) + b"\n" for row in rows)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(self.columns)
+        for row in rows:
+            writer.writerows(self.lines(row))
+        return buffer.getvalue().encode("utf-8")
+
+    def next_chunk(self, conn) -> tuple:
+        """Fetch and encode the next chunk; returns (rows, bytes)"""
+        rows = self.fetch(conn, self.restaurant_id, EXPORT_CHUNK_SIZE, self.until, after=self.after,
+                          date_from=self.date_from, date_to=self.date_to)
+        data = self._encode(rows, header=self.after is None and self.export_format == "csv")
+        if rows:
+            self.after = self.key(rows[-1])
+        if self.compressor:
+            data = self.compressor.compress(data)
+        # A short chunk is the last one; no need for a query that comes back empty
+        if len(rows) < EXPORT_CHUNK_SIZE:
+            self.done = True
+            if self.compressor:
+                data += self.compressor.flush()
+        return len(rows), data
+
+    async def stream(self):
+        _stats["started"] += 1
+        _stats["active"] += 1
+        try:
+            while not self.done:
+                rows, data = await run_shard(self.restaurant_id, self.next_chunk)
+                _stats["rows"] += rows
+                _stats["bytes"] += len(data)
+                if data:
+                    yield data
+        finally:
+            _stats["active"] -= 1
+            _stats["completed" if self.done else "aborted"] += 1
+
+
+def stream_orders(restaurant_id: int, export_format: str, compress: bool, date_from=None, date_to=None):
+    """Async iterator of the restaurant's orders, oldest first"""
+    export = _Export(queries.export_orders, lambda order: (order['created_at'], order['id']), _order_lines,
+                     ORDER_COLUMNS, restaurant_id, export_format, compress, date_from, date_to)
+    return export.stream()
+
+
+def stream_bookings(restaurant_id: int, export_format: str, compress: bool, date_from=None, date_to=None):
+    """Async iterator of the restaurant's bookings, by booking date and time"""
+    export = _Export(queries.export_bookings, lambda booking: (booking['date'], booking['time'], booking['id']),
+                     _booking_lines, BOOKING_COLUMNS, restaurant_id, export_format, compress, date_from, date_to)
+    return export.stream()
+
+
+def stats() -> dict:
+    return dict(_stats, chunk_size=EXPORT_CHUNK_SIZE)
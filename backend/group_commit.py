@@ -0,0 +1,187 @@
+"""
+Group commit for order and booking inserts.
+
+Run one at a time, every order and booking pays for its own transaction:
+a trip to the database workers, BEGIN IMMEDIATE, the lock handoff and a
+commit that appends to the WAL (and syncs it, with DB_SYNCHRONOUS=FULL).
+GroupCommit queues them instead. One writer task per database file takes
+up to WRITE_BATCH_SIZE queued operations, waiting at most
+WRITE_BATCH_DELAY_MS after the oldest for more to arrive, and runs them in
+a single transaction with one commit. Operations that queue up while a
+batch is committing go into the next one, so batches grow with load even
+with no delay.
+
+Each operation runs in its own savepoint. One that raises is rolled back
+alone, and its caller gets the exception while the rest of the batch
+commits. Operations see the writes of those before them in the batch, so
+two bookings for one slot still cannot both succeed. If the batch cannot
+get the write lock (DatabaseBusy) or fails to commit, every caller in it
+gets that error and none of its writes are kept.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+
+from database import DatabaseBusy, is_lock_error, run_pool_write, shards
+
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "64"))
+WRITE_BATCH_DELAY_MS = float(os.getenv("WRITE_BATCH_DELAY_MS", "0"))
+
+
+def _apply(conn, operations: list) -> list:
+    """Run each (fn, args, kwargs) in its own savepoint; returns (ok, result or exception) for each"""
+    outcomes = []
+    for fn, args, kwargs in operations:
+        conn.execute("SAVEPOINT operation")
+        try:
+            outcomes.append((True, fn(conn, *args, **kwargs)))
+        except Exception as e:
+            # Lock errors abort the batch so the whole of it is retried
+            if is_lock_error(e):
+                raise
+            conn.execute("ROLLBACK TO operation")
+            outcomes.append((False, e))
+        conn.execute("RELEASE operation")
+    return outcomes
+
+
+class _Operation:
+    __slots__ = ("fn", "args", "kwargs", "future", "queued_at")
+
+    def __init__(self, fn, args, kwargs, future):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+
+class _WriteQueue:
+    """Pending operations of one database file and the task that commits them"""
+
+    def __init__(self, owner, db_pool):
+        self.owner = owner
+        self.db_pool = db_pool
+        self.pending = deque()
+        self.arrived = asyncio.Event()
+        self.closing = False
+        self.task = asyncio.create_task(self._run())
+
+    def put(self, operation: _Operation):
+        self.pending.append(operation)
+        self.arrived.set()
+
+    async def _linger(self):
+        """Wait until the batch is full or the oldest operation has waited max_delay"""
+        deadline = self.pending[0].queued_at + self.owner.max_delay
+        while len(self.pending) < self.owner.max_batch and not self.closing:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return
+            self.arrived.clear()
+            try:
+                await asyncio.wait_for(self.arrived.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+
+    async def _run(self):
+        while True:
+            await self.arrived.wait()
+            self.arrived.clear()
+            while self.pending:
+                if self.owner.max_delay > 0:
+                    await self._linger()
+                batch = [self.pending.popleft() for _ in range(min(self.owner.max_batch, len(self.pending)))]
+                # Callers that gave up before their turn are dropped, not written
+                batch = [operation for operation in batch if not operation.future.done()]
+                if batch:
+                    await self.owner._commit(self.db_pool, batch)
+            if self.closing:
+                return
+
+
+class GroupCommit:
+    """Batches writes per database file into shared transactions; used from the event loop only"""
+
+    def __init__(self, max_batch: int = WRITE_BATCH_SIZE, max_delay_ms: float = WRITE_BATCH_DELAY_MS):
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay_ms / 1000
+        self._queues = {}  # ConnectionPool -> _WriteQueue
+        self._loop = None
+        self._batches = 0
+        self._operations = 0
+        self._failed = 0
+        self._busy_batches = 0
+        self._largest_batch = 0
+        self._wait_total = 0.0
+        self._commit_total = 0.0
+
+    async def run(self, restaurant_id: int, fn, *args, **kwargs):
+        """Run fn(conn, *args, **kwargs) in a group commit on the restaurant's shard and return its result
+
+        fn must not commit. Raises what fn raised, or DatabaseBusy if the
+        batch could not get the write lock.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._queues = loop, {}
+        db_pool = shards.pool_for(restaurant_id)
+        queue = self._queues.get(db_pool)
+        if queue is None:
+            queue = self._queues[db_pool] = _WriteQueue(self, db_pool)
+        future = loop.create_future()
+        queue.put(_Operation(fn, args, kwargs, future))
+        return await future
+
+    async def _commit(self, db_pool, batch: list):
+        started = time.perf_counter()
+        try:
+            outcomes = await run_pool_write(db_pool, _apply, [(op.fn, op.args, op.kwargs) for op in batch])
+        except Exception as e:
+            outcomes = [(False, e)] * len(batch)
+            self._busy_batches += isinstance(e, DatabaseBusy)
+        finished = time.perf_counter()
+
+        self._batches += 1
+        self._operations += len(batch)
+        self._failed += sum(1 for ok, _ in outcomes if not ok)
+        self._largest_batch = max(self._largest_batch, len(batch))
+        self._wait_total += sum(started - op.queued_at for op in batch)
+        self._commit_total += finished - started
+
+        for operation, (ok, value) in zip(batch, outcomes):
+            if operation.future.done():
+                continue
+            if ok:
+                operation.future.set_result(value)
+            else:
+                operation.future.set_exception(value)
+
+    async def close(self):
+        """Commit everything still queued, then stop the writer tasks"""
+        queues, self._queues = list(self._queues.values()), {}
+        for queue in queues:
+            queue.closing = True
+            queue.arrived.set()
+        await asyncio.gather(*(queue.task for queue in queues), return_exceptions=True)
+
+    def stats(self) -> dict:
+        batches = self._batches
+        operations = self._operations
+        return {
+            "max_batch": self.max_batch,
+            "max_delay_ms": self.max_delay * 1000,
+            "batches": batches,
+            "operations": operations,
+            "failed_operations": self._failed,
+            "busy_batches": self._busy_batches,
+            "avg_batch_size": round(operations / batches, 2) if batches else 0.0,
+            "max_batch_size": self._largest_batch,
+            "avg_queue_wait_ms": round(self._wait_total / operations * 1000, 3) if operations else 0.0,
+            "avg_commit_ms": round(self._commit_total / batches * 1000, 3) if batches else 0.0,
+        }
+
+
+writes = GroupCommit()
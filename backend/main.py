@@ -1,14 +1,33 @@
-import sqlite3
-import hashlib
-import jwt
+import asyncio
+import heapq
 import os
+import time
 from datetime import datetime, timedelta
 from typing import Optional, List
-from fastapi import FastAPI, HTTPException, Depends, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
+import availability
+from auth import (Principal, create_access_token, get_principal, require_admin, require_customer,
+                  require_stream_admin, require_superadmin, token_cache)
+import database
+import events
+import exports
+import group_commit
+import migrations
+import queries
+import search
+import sharding
+from credentials import CredentialsBusy, service as credential_service
+from cache import (CachedQuery, ResponseCache, DIRECTORY_CACHE_TTL, MENU_CACHE_SIZE,
+                   MENU_CACHE_TTL, etag_matches)
+from database import (DatabaseBusy, pool as db_pool, run_db, run_db_write, run_each_shard, run_shard,
+                      run_shard_write, shards)
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, page
+from pricing import PricingError, prices
+from responses import dumps, encoder, json_response, raw_json_response
 
 # Initialize FastAPI app
 app = FastAPI(title="Restaurant Management System API", version="1.0.0")
@@ -22,276 +41,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Security
-security = HTTPBearer()
-SECRET_KEY = "your-secret-key-change-in-production"
-ALGORITHM = "HS256"
-
-# Database setup
-DATABASE_PATH = "restaurant_management.db"
+# Caches
+async def load_restaurant_directory():
+    shard_lists = await run_each_shard(queries.list_active_restaurants)
+    return dumps(list(heapq.merge(*shard_lists, key=lambda restaurant: restaurant['id'])))
+
+async def load_dietary_tags():
+    return dumps(sharding.merge_dietary_tags(await run_each_shard(queries.list_dietary_tags)))
+
+restaurant_directory = CachedQuery("restaurant_directory", load_restaurant_directory, ttl=DIRECTORY_CACHE_TTL)
+dietary_tag_directory = CachedQuery("dietary_tags", load_dietary_tags, ttl=DIRECTORY_CACHE_TTL)
+menu_cache = ResponseCache(
+    "menu",
+    lambda conn, restaurant_id: queries.list_menu_items(conn, restaurant_id, available_only=True),
+    max_entries=MENU_CACHE_SIZE,
+    ttl=MENU_CACHE_TTL
+)
 
 def init_database():
-    """Initialize the database with all required tables"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            phone TEXT,
-            password_hash TEXT NOT NULL,
-            role TEXT DEFAULT 'customer',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_active BOOLEAN DEFAULT 1
-        )
-    ''')
-    
-    # Restaurants table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS restaurants (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            cuisine TEXT NOT NULL,
-            rating REAL DEFAULT 4.5,
-            image TEXT,
-            address TEXT,
-            phone TEXT,
-            description TEXT,
-            admin_id TEXT UNIQUE NOT NULL,
-            admin_password_hash TEXT NOT NULL,
-            is_active BOOLEAN DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Tables table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tables (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            restaurant_id INTEGER,
-            number INTEGER NOT NULL,
-            capacity INTEGER NOT NULL,
-            status TEXT DEFAULT 'available',
-            type TEXT DEFAULT 'standard',
-            features TEXT,
-            image TEXT,
-            x INTEGER DEFAULT 0,
-            y INTEGER DEFAULT 0,
-            FOREIGN KEY (restaurant_id) REFERENCES restaurants (id)
-        )
-    ''')
-    
-    # Menu items table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS menu_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            restaurant_id INTEGER,
-            name TEXT NOT NULL,
-            category TEXT NOT NULL,
-            price REAL NOT NULL,
-            description TEXT,
-            image TEXT,
-            dietary TEXT,
-            chef_special BOOLEAN DEFAULT 0,
-            available BOOLEAN DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (restaurant_id) REFERENCES restaurants (id)
-        )
-    ''')
-    
-    # Bookings table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS bookings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            restaurant_id INTEGER,
-            table_id INTEGER,
-            date TEXT NOT NULL,
-            time TEXT NOT NULL,
-            guests INTEGER NOT NULL,
-            special_requests TEXT,
-            status TEXT DEFAULT 'confirmed',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (restaurant_id) REFERENCES restaurants (id),
-            FOREIGN KEY (table_id) REFERENCES tables (id)
-        )
-    ''')
-    
-    # Orders table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            restaurant_id INTEGER,
-            order_type TEXT NOT NULL,
-            status TEXT DEFAULT 'pending',
-            total_amount REAL NOT NULL,
-            scheduled_time TEXT,
-            special_instructions TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (restaurant_id) REFERENCES restaurants (id)
-        )
-    ''')
-    
-    # Order items table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS order_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id INTEGER,
-            menu_item_id INTEGER,
-            quantity INTEGER NOT NULL,
-            price REAL NOT NULL,
-            FOREIGN KEY (order_id) REFERENCES orders (id),
-            FOREIGN KEY (menu_item_id) REFERENCES menu_items (id)
-        )
-    ''')
-    
-    # AI chat history table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS ai_chat_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            message TEXT NOT NULL,
-            response TEXT NOT NULL,
-            context TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Insert sample data
-    insert_sample_data(cursor)
-    
-    conn.commit()
-    conn.close()
-
-def insert_sample_data(cursor):
-    """Insert sample restaurants and menu items"""
-    
-    # Sample restaurants with admin credentials
-    restaurants_data = [
-        (1, 'The Golden Spoon', 'Fine Dining', 4.8, 'https://images.pexels.com/photos/262978/pexels-photo-262978.jpeg', 
-         '123 Gourmet Street, Downtown', '+1 (555) 123-4567', 'Exquisite fine dining experience with contemporary cuisine', 
-         'GS001', hash_password('admin123')),
-        (2, 'Sakura Sushi', 'Japanese', 4.6, 'https://images.pexels.com/photos/357756/pexels-photo-357756.jpeg', 
-         '456 Zen Garden Ave, Midtown', '+1 (555) 234-5678', 'Authentic Japanese cuisine with fresh sushi and sashimi', 
-         'SS002', hash_password('admin123')),
-        (3, 'Mama\'s Italian', 'Italian', 4.7, 'https://images.pexels.com/photos/315755/pexels-photo-315755.jpeg', 
-         '789 Pasta Lane, Little Italy', '+1 (555) 345-6789', 'Traditional Italian flavors in a cozy family atmosphere', 
-         'MI003', hash_password('admin123'))
-    ]
-    
-    cursor.executemany('''
-        INSERT OR IGNORE INTO restaurants 
-        (id, name, cuisine, rating, image, address, phone, description, admin_id, admin_password_hash) 
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', restaurants_data)
-    
-    # Sample tables for each restaurant
-    tables_data = []
-    for restaurant_id in [1, 2, 3]:
-        table_count = 20 if restaurant_id == 1 else (15 if restaurant_id == 2 else 18)
-        for i in range(1, table_count + 1):
-            capacity = [2, 4, 6, 8][i % 4]
-            status = 'available' if i <= table_count * 0.6 else ['reserved', 'occupied', 'cleaning'][i % 3]
-            x = (i % 5) * 18 + 10
-            y = (i // 5) * 20 + 10
-            table_type = ['window', 'corner', 'center', 'private'][i % 4]
-            features = 'WiFi,Power Outlet,Premium View,Quiet Zone'
-            image = f'https://images.pexels.com/photos/67468/pexels-photo-67468.jpeg?auto=compress&cs=tinysrgb&w=300&h=200&fit=crop&crop=center'
-            
-            tables_data.append((restaurant_id, i, capacity, status, table_type, features, image, x, y))
-    
-    cursor.executemany('''
-        INSERT OR IGNORE INTO tables 
-        (restaurant_id, number, capacity, status, type, features, image, x, y) 
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', tables_data)
-    
-    # Sample menu items
-    menu_items_data = [
-        # The Golden Spoon
-        (1, 'Wagyu Beef Tenderloin', 'Mains', 89.99, 'Premium wagyu beef with truffle sauce and seasonal vegetables', 
-         'https://images.pexels.com/photos/361184/asparagus-steak-veal-steak-veal-361184.jpeg', 'gluten-free', 1, 1),
-        (1, 'Pan-Seared Salmon', 'Mains', 32.99, 'Fresh Atlantic salmon with lemon herb butter and quinoa', 
-         'https://images.pexels.com/photos/262959/pexels-photo-262959.jpeg', 'gluten-free,healthy', 0, 1),
-        (1, 'Truffle Arancini', 'Starters', 18.99, 'Crispy risotto balls with black truffle and parmesan', 
-         'https://images.pexels.com/photos/4518843/pexels-photo-4518843.jpeg', 'vegetarian', 0, 1),
-        (1, 'Lobster Thermidor', 'Mains', 65.99, 'Fresh lobster with creamy cognac sauce and herbs', 
-         'https://images.pexels.com/photos/725991/pexels-photo-725991.jpeg', 'gluten-free', 0, 1),
-        (1, 'Chocolate Soufflé', 'Desserts', 16.99, 'Warm chocolate soufflé with vanilla ice cream', 
-         'https://images.pexels.com/photos/291528/pexels-photo-291528.jpeg', 'vegetarian', 0, 1),
-        
-        # Sakura Sushi
-        (2, 'Sashimi Platter', 'Sashimi', 45.99, 'Fresh selection of tuna, salmon, and yellowtail', 
-         'https://images.pexels.com/photos/357756/pexels-photo-357756.jpeg', 'gluten-free,healthy', 0, 1),
-        (2, 'Dragon Roll', 'Sushi', 18.99, 'Eel and cucumber topped with avocado and eel sauce', 
-         'https://images.pexels.com/photos/2098085/pexels-photo-2098085.jpeg', '', 0, 1),
-        (2, 'Miso Soup', 'Starters', 6.99, 'Traditional soybean paste soup with tofu and seaweed', 
-         'https://images.pexels.com/photos/5409751/pexels-photo-5409751.jpeg', 'vegetarian,healthy', 0, 1),
-        
-        # Mama's Italian
-        (3, 'Margherita Pizza', 'Pizza', 22.99, 'Fresh mozzarella, tomato sauce, and basil', 
-         'https://images.pexels.com/photos/315755/pexels-photo-315755.jpeg', 'vegetarian', 0, 1),
-        (3, 'Fettuccine Alfredo', 'Pasta', 19.99, 'Creamy parmesan sauce with fresh fettuccine', 
-         'https://images.pexels.com/photos/1279330/pexels-photo-1279330.jpeg', 'vegetarian', 0, 1),
-        (3, 'Tiramisu', 'Desserts', 12.99, 'Classic Italian dessert with coffee and mascarpone', 
-         'https://images.pexels.com/photos/6880219/pexels-photo-6880219.jpeg', 'vegetarian', 0, 1)
-    ]
-    
-    cursor.executemany('''
-        INSERT OR IGNORE INTO menu_items 
-        (restaurant_id, name, category, price, description, image, dietary, chef_special, available) 
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', menu_items_data)
-    
-    # Sample super admin user
-    cursor.execute('''
-        INSERT OR IGNORE INTO users (name, email, password_hash, role) 
-        VALUES (?, ?, ?, ?)
-    ''', ('Platform Owner', 'owner@restaurantai.com', hash_password('superadmin2025'), 'superadmin'))
+    """Apply pending schema migrations to the catalog and any shards; a no-op when the schema is current
+
+    Demo data is not inserted here; run `python manage.py seed` for that.
+    """
+    conn = get_db_connection()
+    
+    try:
+        applied = migrations.migrate(conn)
+    finally:
+        conn.close()
+    
+    shards.load()
+    for shard_applied in sharding.migrate_shards(shards).values():
+        applied.extend(version for version in shard_applied if version not in applied)
+    return applied
 
 def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def hash_password(password: str) -> str:
-    """Hash password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def verify_password(password: str, hashed: str) -> bool:
-    """Verify password against hash"""
-    return hash_password(password) == hashed
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    """Create JWT access token"""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(hours=24)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Verify JWT token"""
+    """Get a pooled database connection; close() hands it back to the pool"""
+    return db_pool.acquire()
+
+async def check_credentials(password: str, stored_hash: Optional[str]) -> tuple:
+    """Verify a password off the event loop; returns (ok, upgraded hash or None)"""
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except jwt.PyJWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        return await credential_service.check_password(password, stored_hash)
+    except CredentialsBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+async def save_upgraded_hash(update, *args):
+    """Store a re-hashed password; if the database is busy the next login retries"""
+    try:
+        await run_db_write(update, *args)
+    except DatabaseBusy:
+        pass
 
 # Pydantic models
 class UserSignup(BaseModel):
@@ -320,15 +120,19 @@ class BookingCreate(BaseModel):
     time: str
     guests: int
     special_requests: Optional[str] = None
+    duration_minutes: int = availability.DEFAULT_BOOKING_MINUTES
 
 class OrderCreate(BaseModel):
     restaurant_id: int
     order_type: str
     items: List[dict]
-    total_amount: float
+    total_amount: Optional[float] = None  # ignored; orders are priced from the menu
     scheduled_time: Optional[str] = None
     special_instructions: Optional[str] = None
 
+class BulkOrderCreate(BaseModel):
+    orders: List[OrderCreate]
+
 class MenuItemCreate(BaseModel):
     name: str
     category: str
@@ -348,12 +152,128 @@ class MenuItemUpdate(BaseModel):
     chef_special: Optional[bool] = None
     available: Optional[bool] = None
 
+ANALYTICS_GRANULARITIES = ['hour', 'day', 'month']
+MAX_HOURLY_ANALYTICS_DAYS = 92
+
+MAX_BULK_ORDERS = int(os.getenv("MAX_BULK_ORDERS", "500"))
+
+MAX_SEARCH_RESULTS = 50
+
+ORDER_TYPES = ['pickup', 'delivery', 'dine-in']
+
+USER_ROLES = ['customer', 'superadmin']
+
+ORDER_STATUSES = ['pending', 'confirmed', 'preparing', 'ready', 'completed', 'cancelled']
+
+def parse_slot(date: str, time_of_day: str, duration_minutes: int) -> int:
+    """Validate a booking slot and return its start in slot minutes"""
+    if not 15 <= duration_minutes <= availability.MAX_BOOKING_MINUTES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Duration must be between 15 and {availability.MAX_BOOKING_MINUTES} minutes"
+        )
+    try:
+        return availability.slot_start(date, time_of_day)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date or time, expected YYYY-MM-DD and HH:MM")
+
+def price_order(order_data: OrderCreate, price_map) -> OrderCreate:
+    """Copy of the order with item prices and total taken from the menu; raises PricingError"""
+    if price_map is None:
+        raise PricingError("Restaurant not found")
+    if order_data.order_type not in ORDER_TYPES:
+        raise PricingError(f"Order type must be one of: {', '.join(ORDER_TYPES)}")
+    items, total = price_map.price_cart(order_data.items)
+    return order_data.model_copy(update={"items": items, "total_amount": total})
+
+def publish_order(order_id: int, order_data: OrderCreate, principal: Principal):
+    """Push a new order to its restaurant's event stream"""
+    events.hub.publish(order_data.restaurant_id, "order.created", {
+        "order_id": order_id,
+        "status": "pending",
+        "order_type": order_data.order_type,
+        "total_amount": order_data.total_amount,
+        "scheduled_time": order_data.scheduled_time,
+        "special_instructions": order_data.special_instructions,
+        "customer_email": principal.email,
+        "items": [{"menu_item_id": item['id'], "quantity": item['quantity'], "price": item['price']}
+                  for item in order_data.items],
+    })
+
+def parse_date(value: Optional[str], field: str) -> Optional[str]:
+    """Validate an optional YYYY-MM-DD query parameter"""
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {field}, expected YYYY-MM-DD")
+
+def parse_listing_cursor(cursor: Optional[str], sort: str) -> Optional[list]:
+    """Decode a super-admin listing cursor; it must come from a page with the same sort"""
+    if not cursor:
+        return None
+    try:
+        cursor_sort, key, row_id = decode_cursor(cursor, 3)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if cursor_sort != sort:
+        raise HTTPException(status_code=400, detail="Cursor belongs to a different search")
+    # Every LISTING_SORTS column holds text (created_at as a timestamp string)
+    if not isinstance(key, str) or not isinstance(row_id, int) or isinstance(row_id, bool):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return [key, row_id]
+
+def listing_key(sort: str):
+    """Cursor key of a super-admin listing row"""
+    column = queries.LISTING_SORTS[sort][0]
+    return lambda row: (sort, row[column], row['id'])
+
+def export_response(stream, name: str, restaurant_id: int, export_format: str, compress: bool,
+                    date_from: Optional[str], date_to: Optional[str]) -> StreamingResponse:
+    """Streaming download of an export, as .ndjson/.csv or gzipped"""
+    if export_format not in exports.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {', '.join(exports.EXPORT_FORMATS)}")
+    body = stream(restaurant_id, export_format, compress,
+                  parse_date(date_from, "date_from"), parse_date(date_to, "date_to"))
+    
+    filename = f"{name}-{restaurant_id}.{export_format}" + (".gz" if compress else "")
+    return StreamingResponse(
+        body,
+        media_type="application/gzip" if compress else exports.MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 # API Routes
 
+# Where the last startup spent its time, reported by the performance endpoint
+startup_stats = {}
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on startup"""
-    init_database()
+    """Start password-hashing workers, then initialize database and availability index"""
+    started = time.perf_counter()
+    await credential_service.start()
+    workers_ready = time.perf_counter()
+    applied = init_database()
+    migrated = time.perf_counter()
+    availability.index.replace(await run_each_shard(availability.index.read))
+    finished = time.perf_counter()
+    
+    startup_stats.update({
+        "credential_workers_ms": round((workers_ready - started) * 1000, 3),
+        "migrations_applied": applied,
+        "migrate_ms": round((migrated - workers_ready) * 1000, 3),
+        "availability_index_ms": round((finished - migrated) * 1000, 3),
+        "total_ms": round((finished - started) * 1000, 3),
+    })
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Commit queued writes, stop database and password-hashing workers and close pooled connections on shutdown"""
+    await group_commit.writes.close()
+    database.shutdown()
+    credential_service.shutdown()
 
 @app.get("/")
 async def root():
@@ -363,687 +283,641 @@ async def root():
 @app.post("/api/auth/signup")
 async def signup(user_data: UserSignup):
     """User signup endpoint"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        # Check if user already exists
-        cursor.execute("SELECT id FROM users WHERE email = ?", (user_data.email,))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="Email already registered")
-        
         # Create new user
-        hashed_password = hash_password(user_data.password)
-        cursor.execute('''
-            INSERT INTO users (name, email, phone, password_hash, role) 
-            VALUES (?, ?, ?, ?, ?)
-        ''', (user_data.name, user_data.email, user_data.phone, hashed_password, 'customer'))
-        
-        user_id = cursor.lastrowid
-        conn.commit()
-        
-        # Create access token
-        access_token = create_access_token(
-            data={"sub": str(user_id), "email": user_data.email, "role": "customer"}
-        )
-        
-        return {
-            "message": "User created successfully",
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user": {
-                "id": user_id,
-                "name": user_data.name,
-                "email": user_data.email,
-                "phone": user_data.phone,
-                "role": "customer"
-            }
-        }
-    
+        hashed_password = await credential_service.hash_password(user_data.password)
+        user_id = await run_db_write(queries.create_user, user_data.name, user_data.email,
+                                     user_data.phone, hashed_password, 'customer')
+    except (DatabaseBusy, CredentialsBusy) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
+    
+    if user_id is None:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    # Create access token
+    access_token = create_access_token(
+        data={"sub": str(user_id), "email": user_data.email, "role": "customer"}
+    )
+    
+    return {
+        "message": "User created successfully",
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": {
+            "id": user_id,
+            "name": user_data.name,
+            "email": user_data.email,
+            "phone": user_data.phone,
+            "role": "customer"
+        }
+    }
 
 @app.post("/api/auth/login")
 async def login(login_data: UserLogin):
     """User login endpoint"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            SELECT id, name, email, phone, password_hash, role 
-            FROM users WHERE email = ? AND is_active = 1
-        ''', (login_data.email,))
-        
-        user = cursor.fetchone()
-        if not user or not verify_password(login_data.password, user['password_hash']):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        
-        # Create access token
-        access_token = create_access_token(
-            data={"sub": str(user['id']), "email": user['email'], "role": user['role']}
-        )
-        
-        return {
-            "message": "Login successful",
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user": {
-                "id": user['id'],
-                "name": user['name'],
-                "email": user['email'],
-                "phone": user['phone'],
-                "role": user['role']
-            }
+    user = await run_db(queries.find_user_by_email, login_data.email)
+    ok, upgraded_hash = await check_credentials(login_data.password, user['password_hash'] if user else None)
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if upgraded_hash:
+        await save_upgraded_hash(queries.update_password_hash, user['id'], user['password_hash'], upgraded_hash)
+    
+    # Create access token
+    access_token = create_access_token(
+        data={"sub": str(user['id']), "email": user['email'], "role": user['role']}
+    )
+    
+    return {
+        "message": "Login successful",
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": {
+            "id": user['id'],
+            "name": user['name'],
+            "email": user['email'],
+            "phone": user['phone'],
+            "role": user['role']
         }
-    
-    finally:
-        conn.close()
+    }
 
 @app.post("/api/auth/admin-login")
 async def admin_login(login_data: AdminLogin):
     """Admin login endpoint"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            SELECT id, name, cuisine, admin_id, admin_password_hash 
-            FROM restaurants WHERE admin_id = ? AND is_active = 1
-        ''', (login_data.email,))
-        
-        restaurant = cursor.fetchone()
-        if not restaurant or not verify_password(login_data.password, restaurant['admin_password_hash']):
-            raise HTTPException(status_code=401, detail="Invalid admin credentials")
-        
-        # Create access token
-        access_token = create_access_token(
-            data={
-                "sub": restaurant['admin_id'], 
-                "restaurant_id": restaurant['id'],
-                "role": "admin"
-            }
-        )
-        
-        return {
-            "message": "Admin login successful",
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user": {
-                "name": f"Admin - {restaurant['name']}",
-                "email": restaurant['admin_id'],
-                "role": "admin",
-                "restaurant_id": restaurant['id'],
-                "restaurant_name": restaurant['name']
-            }
+    restaurant = await run_db(queries.find_restaurant_admin, login_data.email)
+    ok, upgraded_hash = await check_credentials(login_data.password,
+                                                restaurant['admin_password_hash'] if restaurant else None)
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid admin credentials")
+    if upgraded_hash:
+        await save_upgraded_hash(queries.update_admin_password_hash, restaurant['id'],
+                                 restaurant['admin_password_hash'], upgraded_hash)
+    
+    # Create access token
+    access_token = create_access_token(
+        data={
+            "sub": restaurant['admin_id'], 
+            "restaurant_id": restaurant['id'],
+            "role": "admin"
         }
-    
-    finally:
-        conn.close()
+    )
+    
+    return {
+        "message": "Admin login successful",
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": {
+            "name": f"Admin - {restaurant['name']}",
+            "email": restaurant['admin_id'],
+            "role": "admin",
+            "restaurant_id": restaurant['id'],
+            "restaurant_name": restaurant['name']
+        }
+    }
 
 @app.post("/api/auth/super-admin-login")
 async def super_admin_login(login_data: SuperAdminLogin):
     """Super admin login endpoint"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            SELECT id, name, email, password_hash, role 
-            FROM users WHERE email = ? AND role = 'superadmin' AND is_active = 1
-        ''', (login_data.email,))
-        
-        user = cursor.fetchone()
-        if (not user or 
-            not verify_password(login_data.password, user['password_hash']) or 
-            login_data.securityCode != '777888'):
-            raise HTTPException(status_code=401, detail="Invalid super admin credentials or security code")
-        
-        # Create access token
-        access_token = create_access_token(
-            data={"sub": str(user['id']), "email": user['email'], "role": "superadmin"}
-        )
-        
-        return {
-            "message": "Super admin login successful",
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user": {
-                "id": user['id'],
-                "name": user['name'],
-                "email": user['email'],
-                "role": user['role']
-            }
+    user = await run_db(queries.find_super_admin_by_email, login_data.email)
+    ok, upgraded_hash = await check_credentials(login_data.password, user['password_hash'] if user else None)
+    if not ok or login_data.securityCode != '777888':
+        raise HTTPException(status_code=401, detail="Invalid super admin credentials or security code")
+    if upgraded_hash:
+        await save_upgraded_hash(queries.update_password_hash, user['id'], user['password_hash'], upgraded_hash)
+    
+    # Create access token
+    access_token = create_access_token(
+        data={"sub": str(user['id']), "email": user['email'], "role": "superadmin"}
+    )
+    
+    return {
+        "message": "Super admin login successful",
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": {
+            "id": user['id'],
+            "name": user['name'],
+            "email": user['email'],
+            "role": user['role']
         }
-    
-    finally:
-        conn.close()
+    }
+
+@app.post("/api/auth/logout")
+async def logout(principal: Principal = Depends(get_principal)):
+    """Revoke the caller's access token"""
+    token_cache.revoke(principal.token, principal.expires_at)
+    return {"message": "Logged out successfully"}
 
 # Restaurant endpoints
 @app.get("/api/restaurants")
 async def get_restaurants():
     """Get all active restaurants"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            SELECT id, name, cuisine, rating, image, address, phone, description 
-            FROM restaurants WHERE is_active = 1
-        ''')
-        restaurants = cursor.fetchall()
-        
-        # Get table counts for each restaurant
-        restaurant_list = []
-        for restaurant in restaurants:
-            cursor.execute('''
-                SELECT COUNT(*) as total_tables,
-                       SUM(CASE WHEN status = 'available' THEN 1 ELSE 0 END) as available_tables
-                FROM tables WHERE restaurant_id = ?
-            ''', (restaurant['id'],))
-            table_info = cursor.fetchone()
-            
-            restaurant_dict = dict(restaurant)
-            restaurant_dict['tables'] = []
-            restaurant_dict['total_tables'] = table_info['total_tables'] or 0
-            restaurant_dict['available_tables'] = table_info['available_tables'] or 0
-            restaurant_list.append(restaurant_dict)
-        
-        return restaurant_list
-    
-    finally:
-        conn.close()
+    return raw_json_response(await restaurant_directory.get())
+
+@app.get("/api/dietary-tags")
+async def get_dietary_tags():
+    """Get the dietary tags menu items can be filtered by, with how many items carry each"""
+    return raw_json_response(await dietary_tag_directory.get())
+
+@app.get("/api/search")
+async def search_catalog(
+    q: str = Query(..., max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+    cuisine: Optional[str] = None,
+    category: Optional[str] = None,
+    dietary: Optional[str] = None,
+    exclude_dietary: Optional[str] = None
+):
+    """Search restaurants and menu items by name, cuisine, category and description"""
+    terms = search.words(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query has no words")
+    
+    results = await search.search_shards(terms, limit, cuisine=cuisine, category=category,
+                                         dietary=dietary, exclude_dietary=exclude_dietary)
+    return json_response({"query": q, **results})
 
 @app.get("/api/restaurants/{restaurant_id}")
 async def get_restaurant(restaurant_id: int):
     """Get specific restaurant details"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            SELECT id, name, cuisine, rating, image, address, phone, description 
-            FROM restaurants WHERE id = ? AND is_active = 1
-        ''', (restaurant_id,))
-        restaurant = cursor.fetchone()
-        
-        if not restaurant:
-            raise HTTPException(status_code=404, detail="Restaurant not found")
-        
-        # Get tables for this restaurant
-        cursor.execute('''
-            SELECT id, number, capacity, status, type, features, image, x, y
-            FROM tables WHERE restaurant_id = ?
-        ''', (restaurant_id,))
-        tables = cursor.fetchall()
-        
-        restaurant_dict = dict(restaurant)
-        restaurant_dict['tables'] = [dict(table) for table in tables]
-        
-        return restaurant_dict
+    restaurant = await run_shard(restaurant_id, queries.get_active_restaurant, restaurant_id)
+    if not restaurant:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
     
-    finally:
-        conn.close()
+    return restaurant
 
 @app.get("/api/restaurants/{restaurant_id}/menu")
-async def get_restaurant_menu(restaurant_id: int):
-    """Get menu items for a restaurant"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            SELECT id, name, category, price, description, image, dietary, chef_special, available
-            FROM menu_items WHERE restaurant_id = ? AND available = 1
-            ORDER BY category, name
-        ''', (restaurant_id,))
-        menu_items = cursor.fetchall()
-        
-        return [dict(item) for item in menu_items]
-    
-    finally:
-        conn.close()
+async def get_restaurant_menu(
+    restaurant_id: int,
+    request: Request,
+    dietary: Optional[str] = None,
+    exclude_dietary: Optional[str] = None
+):
+    """Get menu items for a restaurant (cached, supports If-None-Match)
+
+    dietary and exclude_dietary are comma-separated tags the items must all
+    have and must not have. Filtered menus are read from the database.
+    """
+    if dietary or exclude_dietary:
+        return json_response(await run_shard(restaurant_id, queries.list_menu_items, restaurant_id,
+                                             available_only=True, dietary=dietary, exclude_dietary=exclude_dietary))
+    
+    body, etag = await menu_cache.get(restaurant_id)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        menu_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    
+    return raw_json_response(body, headers=headers)
+
+@app.get("/api/restaurants/{restaurant_id}/availability")
+async def get_restaurant_availability(
+    restaurant_id: int,
+    date: str,
+    time: str,
+    guests: int = Query(..., ge=1),
+    duration: int = availability.DEFAULT_BOOKING_MINUTES
+):
+    """Find tables seating the party that are free for the whole slot"""
+    start = parse_slot(date, time, duration)
+    tables = availability.index.find_free_tables(restaurant_id, guests, start, duration)
+    
+    return json_response({
+        "restaurant_id": restaurant_id,
+        "date": date,
+        "time": time,
+        "duration_minutes": duration,
+        "guests": guests,
+        "tables": tables
+    })
 
 # Booking endpoints
 @app.post("/api/bookings")
-async def create_booking(booking_data: BookingCreate, token_data: dict = Depends(verify_token)):
+async def create_booking(booking_data: BookingCreate, principal: Principal = Depends(require_customer)):
     """Create a new booking"""
-    if token_data.get('role') != 'customer':
-        raise HTTPException(status_code=403, detail="Only customers can make bookings")
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    start = parse_slot(booking_data.date, booking_data.time, booking_data.duration_minutes)
     
     try:
-        user_id = int(token_data['sub'])
-        
-        # Check if table is available
-        cursor.execute('''
-            SELECT status FROM tables 
-            WHERE id = ? AND restaurant_id = ?
-        ''', (booking_data.table_id, booking_data.restaurant_id))
-        
-        table = cursor.fetchone()
-        if not table or table['status'] != 'available':
-            raise HTTPException(status_code=400, detail="Table is not available")
-        
-        # Create booking
-        cursor.execute('''
-            INSERT INTO bookings (user_id, restaurant_id, table_id, date, time, guests, special_requests)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, booking_data.restaurant_id, booking_data.table_id, 
-              booking_data.date, booking_data.time, booking_data.guests, 
-              booking_data.special_requests))
-        
-        booking_id = cursor.lastrowid
-        
-        # Update table status
-        cursor.execute('''
-            UPDATE tables SET status = 'reserved' WHERE id = ?
-        ''', (booking_data.table_id,))
-        
-        conn.commit()
-        
-        return {
-            "message": "Booking created successfully",
-            "booking_id": booking_id,
-            "status": "confirmed"
-        }
-    
+        booking_id = await group_commit.writes.run(booking_data.restaurant_id, queries.create_booking,
+                                                   principal.user_id, booking_data, start,
+                                                   booking_data.duration_minutes)
+    except DatabaseBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
+    
+    if booking_id is None:
+        raise HTTPException(status_code=400, detail="Table is not available")
+    
+    availability.index.add_booking(booking_data.table_id, booking_id, start, booking_data.duration_minutes)
+    booking_date, booking_time = availability.slot_date_time(start)
+    events.hub.publish(booking_data.restaurant_id, "booking.created", {
+        "booking_id": booking_id,
+        "table_id": booking_data.table_id,
+        "date": booking_date,
+        "time": booking_time,
+        "duration_minutes": booking_data.duration_minutes,
+        "guests": booking_data.guests,
+        "status": "confirmed"
+    })
+    
+    return {
+        "message": "Booking created successfully",
+        "booking_id": booking_id,
+        "status": "confirmed"
+    }
 
 # Order endpoints
 @app.post("/api/orders")
-async def create_order(order_data: OrderCreate, token_data: dict = Depends(verify_token)):
+async def create_order(order_data: OrderCreate, principal: Principal = Depends(require_customer)):
     """Create a new order"""
-    if token_data.get('role') != 'customer':
-        raise HTTPException(status_code=403, detail="Only customers can place orders")
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+    price_map = await prices.get(order_data.restaurant_id)
+    if price_map is None:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
     try:
-        user_id = int(token_data['sub'])
-        
-        # Create order
-        cursor.execute('''
-            INSERT INTO orders (user_id, restaurant_id, order_type, total_amount, scheduled_time, special_instructions)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, order_data.restaurant_id, order_data.order_type, 
-              order_data.total_amount, order_data.scheduled_time, order_data.special_instructions))
-        
-        order_id = cursor.lastrowid
-        
-        # Add order items
-        for item in order_data.items:
-            cursor.execute('''
-                INSERT INTO order_items (order_id, menu_item_id, quantity, price)
-                VALUES (?, ?, ?, ?)
-            ''', (order_id, item['id'], item['quantity'], item['price']))
-        
-        conn.commit()
-        
-        return {
-            "message": "Order created successfully",
-            "order_id": order_id,
-            "status": "pending"
-        }
+        order_data = price_order(order_data, price_map)
+    except PricingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
+    try:
+        order_id = await group_commit.writes.run(order_data.restaurant_id, queries.create_order, principal.user_id,
+                                                 order_data, price_map.version)
+    except DatabaseBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
+    
+    if order_id is None:
+        prices.invalidate(order_data.restaurant_id)
+        raise HTTPException(status_code=409, detail="The menu changed while the order was being placed, please retry")
+    
+    publish_order(order_id, order_data, principal)
+    
+    return {
+        "message": "Order created successfully",
+        "order_id": order_id,
+        "total_amount": order_data.total_amount,
+        "status": "pending"
+    }
+
+@app.post("/api/orders/bulk")
+async def create_orders_bulk(batch: BulkOrderCreate, principal: Principal = Depends(require_customer)):
+    """Create a batch of orders in one transaction per shard, reporting the outcome of each"""
+    if not batch.orders:
+        raise HTTPException(status_code=400, detail="No orders in batch")
+    if len(batch.orders) > MAX_BULK_ORDERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ORDERS} orders per batch")
+    
+    price_maps = {}
+    for restaurant_id in {order.restaurant_id for order in batch.orders}:
+        price_maps[restaurant_id] = await prices.get(restaurant_id)
+    
+    results = []
+    priced = []
+    for index, order in enumerate(batch.orders):
+        try:
+            priced.append((index, price_order(order, price_maps[order.restaurant_id])))
+        except PricingError as e:
+            results.append({"index": index, "error": str(e), "status": "rejected"})
+    
+    # One transaction per shard; unsharded, that is one for the whole batch
+    groups = {}
+    for index, order in priced:
+        groups.setdefault(shards.shard_of(order.restaurant_id), []).append((index, order))
+    outcomes = await asyncio.gather(*(
+        run_shard_write(group[0][1].restaurant_id, queries.create_orders, principal.user_id,
+                        [order for _, order in group],
+                        {order.restaurant_id: price_maps[order.restaurant_id].version for _, order in group})
+        for group in groups.values()
+    ), return_exceptions=True)
+    
+    errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+    if errors and len(errors) == len(outcomes):
+        if isinstance(errors[0], DatabaseBusy):
+            raise HTTPException(status_code=503, detail=str(errors[0]), headers={"Retry-After": "1"})
+        raise HTTPException(status_code=500, detail=str(errors[0]))
+    
+    for group, order_ids in zip(groups.values(), outcomes):
+        if isinstance(order_ids, Exception):
+            # Orders in other shards were committed, so report this shard's per order
+            results.extend({"index": index, "error": str(order_ids), "status": "rejected"} for index, _ in group)
+            continue
+        for (index, order), order_id in zip(group, order_ids):
+            if order_id is None:
+                prices.invalidate(order.restaurant_id)
+                results.append({"index": index, "error": "The menu changed while the order was being placed, please retry",
+                                "status": "rejected"})
+            else:
+                publish_order(order_id, order, principal)
+                results.append({"index": index, "order_id": order_id, "total_amount": order.total_amount,
+                                "status": "pending"})
+    results.sort(key=lambda result: result["index"])
+    
+    created = sum(1 for result in results if "order_id" in result)
+    
+    return {
+        "message": f"{created} of {len(results)} orders created",
+        "created": created,
+        "rejected": len(results) - created,
+        "results": results
+    }
 
 # Admin endpoints
 @app.get("/api/admin/restaurant")
-async def get_admin_restaurant(token_data: dict = Depends(verify_token)):
+async def get_admin_restaurant(principal: Principal = Depends(require_admin)):
     """Get restaurant data for logged-in admin"""
-    if token_data.get('role') != 'admin':
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    restaurant_id = token_data.get('restaurant_id')
-    if not restaurant_id:
-        raise HTTPException(status_code=400, detail="Invalid admin token")
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    restaurant_id = principal.restaurant_id
     
-    try:
-        cursor.execute('''
-            SELECT id, name, cuisine, rating, image, address, phone, description 
-            FROM restaurants WHERE id = ?
-        ''', (restaurant_id,))
-        restaurant = cursor.fetchone()
-        
-        if not restaurant:
-            raise HTTPException(status_code=404, detail="Restaurant not found")
-        
-        return dict(restaurant)
+    restaurant = await run_db(queries.get_restaurant, restaurant_id)
+    if not restaurant:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
     
-    finally:
-        conn.close()
+    return restaurant
 
 @app.get("/api/admin/menu")
-async def get_admin_menu(token_data: dict = Depends(verify_token)):
-    """Get menu items for admin's restaurant"""
-    if token_data.get('role') != 'admin':
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    restaurant_id = token_data.get('restaurant_id')
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            SELECT id, name, category, price, description, image, dietary, chef_special, available
-            FROM menu_items WHERE restaurant_id = ?
-            ORDER BY category, name
-        ''', (restaurant_id,))
-        menu_items = cursor.fetchall()
-        
-        return [dict(item) for item in menu_items]
+async def get_admin_menu(
+    dietary: Optional[str] = None,
+    exclude_dietary: Optional[str] = None,
+    principal: Principal = Depends(require_admin)
+):
+    """Get menu items for admin's restaurant, optionally filtered by dietary tags"""
+    restaurant_id = principal.restaurant_id
     
-    finally:
-        conn.close()
+    return json_response(await run_shard(restaurant_id, queries.list_menu_items, restaurant_id,
+                                         dietary=dietary, exclude_dietary=exclude_dietary))
 
 @app.post("/api/admin/menu")
-async def create_menu_item(item_data: MenuItemCreate, token_data: dict = Depends(verify_token)):
+async def create_menu_item(item_data: MenuItemCreate, principal: Principal = Depends(require_admin)):
     """Create new menu item"""
-    if token_data.get('role') != 'admin':
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    restaurant_id = token_data.get('restaurant_id')
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    restaurant_id = principal.restaurant_id
     
     try:
-        cursor.execute('''
-            INSERT INTO menu_items (restaurant_id, name, category, price, description, image, dietary, chef_special)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (restaurant_id, item_data.name, item_data.category, item_data.price, 
-              item_data.description, item_data.image, item_data.dietary, item_data.chef_special))
-        
-        item_id = cursor.lastrowid
-        conn.commit()
-        
-        return {
-            "message": "Menu item created successfully",
-            "item_id": item_id
-        }
-    
+        item_id = await run_shard_write(restaurant_id, queries.create_menu_item, restaurant_id, item_data)
+    except DatabaseBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
+    
+    menu_cache.invalidate(restaurant_id)
+    prices.invalidate(restaurant_id)
+    dietary_tag_directory.invalidate()
+    
+    return {
+        "message": "Menu item created successfully",
+        "item_id": item_id
+    }
 
 @app.put("/api/admin/menu/{item_id}")
-async def update_menu_item(item_id: int, item_data: MenuItemUpdate, token_data: dict = Depends(verify_token)):
+async def update_menu_item(item_id: int, item_data: MenuItemUpdate, principal: Principal = Depends(require_admin)):
     """Update menu item"""
-    if token_data.get('role') != 'admin':
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    restaurant_id = token_data.get('restaurant_id')
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    restaurant_id = principal.restaurant_id
     
     try:
-        # Check if item belongs to admin's restaurant
-        cursor.execute('''
-            SELECT id FROM menu_items WHERE id = ? AND restaurant_id = ?
-        ''', (item_id, restaurant_id))
-        
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Menu item not found")
-        
-        # Build update query dynamically
-        update_fields = []
-        update_values = []
-        
-        for field, value in item_data.dict(exclude_unset=True).items():
-            update_fields.append(f"{field} = ?")
-            update_values.append(value)
-        
-        if update_fields:
-            update_values.append(item_id)
-            cursor.execute(f'''
-                UPDATE menu_items SET {", ".join(update_fields)} WHERE id = ?
-            ''', update_values)
-            
-            conn.commit()
-        
-        return {"message": "Menu item updated successfully"}
-    
+        found = await run_shard_write(restaurant_id, queries.update_menu_item, restaurant_id, item_id,
+                                      item_data.dict(exclude_unset=True))
+    except DatabaseBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
+    
+    if not found:
+        raise HTTPException(status_code=404, detail="Menu item not found")
+    
+    menu_cache.invalidate(restaurant_id)
+    prices.invalidate(restaurant_id)
+    dietary_tag_directory.invalidate()
+    
+    return {"message": "Menu item updated successfully"}
 
 @app.delete("/api/admin/menu/{item_id}")
-async def delete_menu_item(item_id: int, token_data: dict = Depends(verify_token)):
+async def delete_menu_item(item_id: int, principal: Principal = Depends(require_admin)):
     """Delete menu item"""
-    if token_data.get('role') != 'admin':
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    restaurant_id = token_data.get('restaurant_id')
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    restaurant_id = principal.restaurant_id
     
     try:
-        cursor.execute('''
-            DELETE FROM menu_items WHERE id = ? AND restaurant_id = ?
-        ''', (item_id, restaurant_id))
-        
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Menu item not found")
-        
-        conn.commit()
-        return {"message": "Menu item deleted successfully"}
-    
+        deleted = await run_shard_write(restaurant_id, queries.delete_menu_item, restaurant_id, item_id)
+    except DatabaseBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
-
-@app.get("/api/admin/orders")
-async def get_admin_orders(token_data: dict = Depends(verify_token)):
-    """Get orders for admin's restaurant"""
-    if token_data.get('role') != 'admin':
-        raise HTTPException(status_code=403, detail="Admin access required")
     
-    restaurant_id = token_data.get('restaurant_id')
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Menu item not found")
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    menu_cache.invalidate(restaurant_id)
+    prices.invalidate(restaurant_id)
+    dietary_tag_directory.invalidate()
     
-    try:
-        cursor.execute('''
-            SELECT o.id, o.order_type, o.status, o.total_amount, o.scheduled_time, 
-                   o.special_instructions, o.created_at, u.name as customer_name, u.email as customer_email
-            FROM orders o
-            JOIN users u ON o.user_id = u.id
-            WHERE o.restaurant_id = ?
-            ORDER BY o.created_at DESC
-        ''', (restaurant_id,))
-        orders = cursor.fetchall()
-        
-        # Get order items for each order
-        order_list = []
-        for order in orders:
-            cursor.execute('''
-                SELECT oi.quantity, oi.price, mi.name as item_name
-                FROM order_items oi
-                JOIN menu_items mi ON oi.menu_item_id = mi.id
-                WHERE oi.order_id = ?
-            ''', (order['id'],))
-            items = cursor.fetchall()
-            
-            order_dict = dict(order)
-            order_dict['items'] = [dict(item) for item in items]
-            order_list.append(order_dict)
-        
-        return order_list
+    return {"message": "Menu item deleted successfully"}
+
+@app.get("/api/admin/orders")
+async def get_admin_orders(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    principal: Principal = Depends(require_admin)
+):
+    """Get a page of orders for admin's restaurant, newest first"""
+    restaurant_id = principal.restaurant_id
+    
+    if status is not None and status not in ORDER_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid status")
     
-    finally:
-        conn.close()
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, 2)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    orders = await run_shard(restaurant_id, queries.list_orders, restaurant_id, limit, after=after, status=status,
+                             date_from=parse_date(date_from, "date_from"),
+                             date_to=parse_date(date_to, "date_to"))
+    
+    return json_response(page(orders, limit, lambda order: (order['created_at'], order['id']), name="orders"))
+
+@app.get("/api/admin/orders/export")
+async def export_admin_orders(
+    export_format: str = Query("ndjson", alias="format"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    gzip: bool = False,
+    principal: Principal = Depends(require_admin)
+):
+    """Stream the full order history of admin's restaurant, oldest first"""
+    return export_response(exports.stream_orders, "orders", principal.restaurant_id,
+                           export_format, gzip, date_from, date_to)
+
+@app.get("/api/admin/analytics")
+async def get_admin_analytics(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    granularity: str = "day",
+    principal: Principal = Depends(require_admin)
+):
+    """Get revenue, order and item-sales analytics for admin's restaurant"""
+    restaurant_id = principal.restaurant_id
+    
+    if granularity not in ANALYTICS_GRANULARITIES:
+        raise HTTPException(status_code=400, detail="Invalid granularity")
+    
+    date_to = parse_date(date_to, "date_to") or datetime.utcnow().strftime("%Y-%m-%d")
+    date_from = parse_date(date_from, "date_from") or (
+        datetime.strptime(date_to, "%Y-%m-%d") - timedelta(days=29)
+    ).strftime("%Y-%m-%d")
+    
+    days = (datetime.strptime(date_to, "%Y-%m-%d") - datetime.strptime(date_from, "%Y-%m-%d")).days
+    if days < 0:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if granularity == "hour" and days >= MAX_HOURLY_ANALYTICS_DAYS:
+        raise HTTPException(status_code=400, detail=f"Hourly analytics is limited to {MAX_HOURLY_ANALYTICS_DAYS} days")
+    
+    return json_response(await run_shard(restaurant_id, queries.sales_analytics, restaurant_id, granularity,
+                                         date_from, date_to))
 
 @app.put("/api/admin/orders/{order_id}/status")
-async def update_order_status(order_id: int, status_data: dict, token_data: dict = Depends(verify_token)):
+async def update_order_status(order_id: int, status_data: dict, principal: Principal = Depends(require_admin)):
     """Update order status"""
-    if token_data.get('role') != 'admin':
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    restaurant_id = token_data.get('restaurant_id')
+    restaurant_id = principal.restaurant_id
     new_status = status_data.get('status')
     
-    if new_status not in ['pending', 'confirmed', 'preparing', 'ready', 'completed', 'cancelled']:
+    if new_status not in ORDER_STATUSES:
         raise HTTPException(status_code=400, detail="Invalid status")
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('''
-            UPDATE orders SET status = ? 
-            WHERE id = ? AND restaurant_id = ?
-        ''', (new_status, order_id, restaurant_id))
-        
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Order not found")
-        
-        conn.commit()
-        return {"message": "Order status updated successfully"}
-    
+        updated = await run_shard_write(restaurant_id, queries.update_order_status, restaurant_id, order_id,
+                                        new_status)
+    except DatabaseBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
-
-@app.get("/api/admin/bookings")
-async def get_admin_bookings(token_data: dict = Depends(verify_token)):
-    """Get bookings for admin's restaurant"""
-    if token_data.get('role') != 'admin':
-        raise HTTPException(status_code=403, detail="Admin access required")
     
-    restaurant_id = token_data.get('restaurant_id')
+    if not updated:
+        raise HTTPException(status_code=404, detail="Order not found")
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    events.hub.publish(restaurant_id, "order.status", {"order_id": order_id, "status": new_status})
     
-    try:
-        cursor.execute('''
-            SELECT b.id, b.date, b.time, b.guests, b.special_requests, b.status, b.created_at,
-                   u.name as customer_name, u.email as customer_email, u.phone as customer_phone,
-                   t.number as table_number, t.capacity as table_capacity
-            FROM bookings b
-            JOIN users u ON b.user_id = u.id
-            JOIN tables t ON b.table_id = t.id
-            WHERE b.restaurant_id = ?
-            ORDER BY b.date DESC, b.time DESC
-        ''', (restaurant_id,))
-        bookings = cursor.fetchall()
-        
-        return [dict(booking) for booking in bookings]
+    return {"message": "Order status updated successfully"}
+
+@app.get("/api/admin/events")
+async def stream_admin_events(
+    request: Request,
+    last_event_id: Optional[str] = None,
+    principal: Principal = Depends(require_stream_admin)
+):
+    """Server-Sent Events stream of new orders, order status changes and bookings for admin's restaurant"""
+    subscription = events.hub.subscribe(principal.restaurant_id,
+                                        request.headers.get("last-event-id") or last_event_id)
     
-    finally:
-        conn.close()
+    return StreamingResponse(
+        events.hub.stream(subscription, principal.expires_at),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/admin/bookings")
+async def get_admin_bookings(principal: Principal = Depends(require_admin)):
+    """Get bookings for admin's restaurant"""
+    restaurant_id = principal.restaurant_id
+    
+    return json_response(await run_shard(restaurant_id, queries.list_bookings, restaurant_id))
+
+@app.get("/api/admin/bookings/export")
+async def export_admin_bookings(
+    export_format: str = Query("ndjson", alias="format"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    gzip: bool = False,
+    principal: Principal = Depends(require_admin)
+):
+    """Stream all bookings of admin's restaurant, by booking date"""
+    return export_response(exports.stream_bookings, "bookings", principal.restaurant_id,
+                           export_format, gzip, date_from, date_to)
 
 # Super Admin endpoints
 @app.get("/api/super-admin/restaurants")
-async def get_all_restaurants_super_admin(token_data: dict = Depends(verify_token)):
-    """Get all restaurants for super admin"""
-    if token_data.get('role') != 'superadmin':
-        raise HTTPException(status_code=403, detail="Super admin access required")
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            SELECT id, name, cuisine, rating, image, address, phone, description, admin_id, is_active, created_at
-            FROM restaurants
-            ORDER BY created_at DESC
-        ''')
-        restaurants = cursor.fetchall()
-        
-        return [dict(restaurant) for restaurant in restaurants]
-    
-    finally:
-        conn.close()
+async def get_all_restaurants_super_admin(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    name: Optional[str] = Query(None, min_length=1, max_length=100),
+    principal: Principal = Depends(require_superadmin)
+):
+    """Get a page of restaurants for super admin, newest first or by name when searching"""
+    sort = "name" if name else "created"
+    after = parse_listing_cursor(cursor, sort)
+    
+    restaurants = await run_db(queries.list_restaurants, limit, sort=sort, after=after, is_active=is_active,
+                               created_from=parse_date(created_from, "created_from"),
+                               created_to=parse_date(created_to, "created_to"), name_prefix=name)
+    
+    return json_response(page(restaurants, limit, listing_key(sort), name="restaurants"))
 
 @app.get("/api/super-admin/users")
-async def get_all_users_super_admin(token_data: dict = Depends(verify_token)):
-    """Get all users for super admin"""
-    if token_data.get('role') != 'superadmin':
-        raise HTTPException(status_code=403, detail="Super admin access required")
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            SELECT id, name, email, phone, role, is_active, created_at
-            FROM users
-            ORDER BY created_at DESC
-        ''')
-        users = cursor.fetchall()
-        
-        return [dict(user) for user in users]
-    
-    finally:
-        conn.close()
+async def get_all_users_super_admin(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    name: Optional[str] = Query(None, min_length=1, max_length=100),
+    email: Optional[str] = Query(None, min_length=1, max_length=254),
+    principal: Principal = Depends(require_superadmin)
+):
+    """Get a page of users for super admin, newest first or by email/name when searching"""
+    if role is not None and role not in USER_ROLES:
+        raise HTTPException(status_code=400, detail="Invalid role")
+    
+    sort = "email" if email else "name" if name else "created"
+    after = parse_listing_cursor(cursor, sort)
+    
+    users = await run_db(queries.list_users, limit, sort=sort, after=after, role=role, is_active=is_active,
+                         created_from=parse_date(created_from, "created_from"),
+                         created_to=parse_date(created_to, "created_to"),
+                         name_prefix=name, email_prefix=email)
+    
+    return json_response(page(users, limit, listing_key(sort), name="users"))
 
 @app.get("/api/super-admin/analytics")
-async def get_analytics_super_admin(token_data: dict = Depends(verify_token)):
-    """Get platform analytics for super admin"""
-    if token_data.get('role') != 'superadmin':
-        raise HTTPException(status_code=403, detail="Super admin access required")
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Get total counts
-        cursor.execute("SELECT COUNT(*) as total_restaurants FROM restaurants WHERE is_active = 1")
-        total_restaurants = cursor.fetchone()['total_restaurants']
-        
-        cursor.execute("SELECT COUNT(*) as total_users FROM users WHERE role = 'customer' AND is_active = 1")
-        total_users = cursor.fetchone()['total_users']
-        
-        cursor.execute("SELECT COUNT(*) as total_orders FROM orders")
-        total_orders = cursor.fetchone()['total_orders']
-        
-        cursor.execute("SELECT COUNT(*) as total_bookings FROM bookings")
-        total_bookings = cursor.fetchone()['total_bookings']
-        
-        cursor.execute("SELECT SUM(total_amount) as total_revenue FROM orders WHERE status = 'completed'")
-        total_revenue = cursor.fetchone()['total_revenue'] or 0
-        
-        return {
-            "total_restaurants": total_restaurants,
-            "total_users": total_users,
-            "total_orders": total_orders,
-            "total_bookings": total_bookings,
-            "total_revenue": total_revenue
-        }
-    
-    finally:
-        conn.close()
+async def get_analytics_super_admin(principal: Principal = Depends(require_superadmin)):
+    """Get platform analytics for super admin, added up over the shards"""
+    catalog_stats, shard_stats = await asyncio.gather(run_db(queries.platform_analytics),
+                                                      run_each_shard(queries.platform_analytics))
+    return sharding.merge_platform_stats(catalog_stats, shard_stats)
+
+@app.get("/api/super-admin/performance")
+async def get_performance_super_admin(principal: Principal = Depends(require_superadmin)):
+    """Get runtime performance statistics for super admin"""
+    return {
+        "db_pool": db_pool.stats(),
+        "db_shards": shards.stats(),
+        "db_writes": database.write_stats(),
+        "group_commit": group_commit.writes.stats(),
+        "restaurant_directory_cache": restaurant_directory.stats(),
+        "dietary_tags_cache": dietary_tag_directory.stats(),
+        "menu_cache": menu_cache.stats(),
+        "price_maps": prices.stats(),
+        "token_cache": token_cache.stats(),
+        "credentials": credential_service.stats(),
+        "exports": exports.stats(),
+        "startup": startup_stats,
+        "availability_index": availability.index.stats(),
+        "events": events.hub.stats(),
+        "json_encoder": encoder()
+    }
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Restaurant Management System maintenance commands
+
+Usage:
+    python manage.py migrate [--target VERSION]
+    python manage.py seed
+    python manage.py generate --preset {tiny,small,medium,large,xl} [--seed N] [--end-date YYYY-MM-DD] [--database PATH] [--force]
+    python manage.py check-plans [--verbose]
+    python manage.py reconcile-stats [--dry-run]
+    python manage.py rebuild-rollups
+    python manage.py rebuild-search
+    python manage.py split-shards --shards N --output DIR
+
+On a sharded database (see sharding.py) migrate, reconcile-stats and the
+rebuild commands run on the catalog and every shard file.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+from contextlib import closing
+from datetime import date
+
+import migrations
+import queries
+import sharding
+from database import DATABASE_PATH, pool, shards
+
+
+def databases():
+    """(path, connection) for the catalog, then each shard file, all migrated"""
+    with pool.connection() as conn:
+        migrations.migrate(conn)
+        yield DATABASE_PATH, conn
+    shards.load()
+    sharding.migrate_shards(shards)
+    if shards.sharded:
+        for shard in shards.pools:
+            with closing(sqlite3.connect(shard.database)) as conn:
+                conn.row_factory = sqlite3.Row
+                yield shard.database, conn
+
+
+def cmd_migrate(args) -> int:
+    with pool.connection() as conn:
+        before = migrations.current_version(conn)
+        applied = migrations.migrate(conn, args.target)
+        after = migrations.current_version(conn)
+
+    if applied:
+        print(f"✅ {DATABASE_PATH}: migrated from version {before} to {after} (applied {applied})")
+    else:
+        print(f"✅ {DATABASE_PATH}: already at version {after}")
+    
+    shards.load()
+    for path, shard_applied in sharding.migrate_shards(shards, args.target).items():
+        if shard_applied:
+            print(f"✅ {path}: applied {shard_applied}")
+    return 0
+
+
+def cmd_seed(args) -> int:
+    import seed
+
+    with pool.connection() as conn:
+        migrations.migrate(conn)
+        if shards.load():
+            print(f"❌ {DATABASE_PATH} is a sharded catalog; seed the database before splitting it")
+            return 1
+        counts = seed.seed_demo_data(conn)
+
+    if not any(counts.values()):
+        print(f"✅ {DATABASE_PATH}: demo data already present")
+    else:
+        inserted = ", ".join(f"{count} {name}" for name, count in counts.items() if count)
+        print(f"✅ {DATABASE_PATH}: inserted {inserted}")
+    return 0
+
+
+def cmd_generate(args) -> int:
+    import datagen
+
+    path = args.database or DATABASE_PATH
+    if os.path.exists(path):
+        if not args.force:
+            print(f"❌ {path} already exists; pass --force to replace it")
+            return 1
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    generator = datagen.DatasetGenerator(args.preset, args.seed, args.end_date)
+    generator.generate(path)
+    print(f"✅ Customers log in as user00000001@example.com / {datagen.CUSTOMER_PASSWORD}, "
+          f"admins as R000001 / {datagen.ADMIN_PASSWORD}; run `manage.py seed` for the super admin")
+    return 0
+
+
+def cmd_check_plans(args) -> int:
+    import query_plans
+
+    failures = query_plans.check_plans(verbose=args.verbose)
+    uncovered = query_plans.uncovered_functions()
+
+    for label, statement, detail in failures:
+        print(f"❌ {label}: {detail}\n   {statement}")
+    for name in uncovered:
+        print(f"❌ queries.{name} is not exercised by query_plans.check_plans()")
+
+    if failures or uncovered:
+        return 1
+    print("✅ No full table scans in queries.py")
+    return 0
+
+
+def cmd_reconcile_stats(args) -> int:
+    drifted = False
+    for path, conn in databases():
+        drift = queries.reconcile_platform_stats(conn, fix=not args.dry_run)
+        if not drift:
+            print(f"✅ {path}: platform_stats matches the source tables")
+            continue
+        drifted = True
+        for field, (stored, actual) in drift.items():
+            print(f"⚠️  {path}: {field}: stored {stored}, actual {actual}")
+
+    if not drifted:
+        return 0
+    if args.dry_run:
+        print("Dry run: platform_stats left unchanged")
+        return 1
+    print("✅ platform_stats recomputed")
+    return 0
+
+
+def cmd_rebuild_rollups(args) -> int:
+    buckets = 0
+    for _, conn in databases():
+        queries.rebuild_sales_rollups(conn)
+        buckets += conn.execute("SELECT COUNT(*) FROM sales_rollups").fetchone()[0]
+
+    print(f"✅ Sales rollups rebuilt ({buckets} buckets)")
+    return 0
+
+
+def cmd_rebuild_search(args) -> int:
+    items = 0
+    for _, conn in databases():
+        queries.rebuild_search_index(conn)
+        items += conn.execute("SELECT COUNT(*) FROM menu_items").fetchone()[0]
+
+    print(f"✅ Search index rebuilt ({items} menu items)")
+    return 0
+
+
+def cmd_split_shards(args) -> int:
+    with pool.connection() as conn:
+        migrations.migrate(conn)
+
+    splitter = sharding.Splitter(DATABASE_PATH, args.output, args.shards)
+    print(f"Splitting {DATABASE_PATH} into {args.shards} shards in {args.output}")
+    try:
+        summary = splitter.split()
+    except (FileExistsError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    print(f"✅ Split in {summary['seconds']:.1f}s; serve it with DATABASE_PATH={summary['catalog']}")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Restaurant Management System maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate", help="apply pending schema migrations")
+    migrate.add_argument("--target", type=int, default=None, help="stop at this schema version")
+    migrate.set_defaults(handler=cmd_migrate)
+
+    seed = commands.add_parser("seed", help="insert demo restaurants, menus and accounts if missing")
+    seed.set_defaults(handler=cmd_seed)
+
+    generate = commands.add_parser("generate", help="build a large synthetic dataset for load testing")
+    generate.add_argument("--preset", required=True, choices=["tiny", "small", "medium", "large", "xl"],
+                          help="dataset size")
+    generate.add_argument("--seed", type=int, default=1, help="random seed; same seed, same data")
+    generate.add_argument("--end-date", type=date.fromisoformat, default=None,
+                          help="last day of order history (default: today)")
+    generate.add_argument("--database", default=None, help="output file (default: DATABASE_PATH)")
+    generate.add_argument("--force", action="store_true", help="replace the output file if it exists")
+    generate.set_defaults(handler=cmd_generate)
+
+    check_plans = commands.add_parser("check-plans", help="fail if any query falls back to a full table scan")
+    check_plans.add_argument("--verbose", action="store_true", help="print every query plan line")
+    check_plans.set_defaults(handler=cmd_check_plans)
+
+    reconcile = commands.add_parser("reconcile-stats", help="recompute platform_stats and report drift")
+    reconcile.add_argument("--dry-run", action="store_true", help="report drift without fixing it")
+    reconcile.set_defaults(handler=cmd_reconcile_stats)
+
+    rollups = commands.add_parser("rebuild-rollups", help="recompute sales rollups from orders")
+    rollups.set_defaults(handler=cmd_rebuild_rollups)
+
+    search = commands.add_parser("rebuild-search", help="re-index restaurants and menu items for search")
+    search.set_defaults(handler=cmd_rebuild_search)
+
+    split = commands.add_parser("split-shards", help="copy the database into a catalog and per-restaurant shards")
+    split.add_argument("--shards", type=int, required=True, help="number of shard files (restaurant_id %% N)")
+    split.add_argument("--output", required=True, help="directory for catalog.db and the shard files")
+    split.set_defaults(handler=cmd_split_shards)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
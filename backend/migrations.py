@@ -0,0 +1,859 @@
+"""
+Versioned schema migrations.
+
+Each migration is a function registered with @migration(version, name). They
+run in version order, each in its own transaction, and the applied versions
+are recorded in the schema_migrations table so every migration runs exactly
+once per database. Migration bodies are still written to be idempotent
+(IF NOT EXISTS) so they are safe on databases created before versioning.
+"""
+
+import sqlite3
+from datetime import datetime
+
+import dietary_tags
+
+MIGRATIONS = []
+
+
+def migration(version: int, name: str):
+    """Register a migration function taking a cursor"""
+    def register(fn):
+        if any(existing[0] == version for existing in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return fn
+    return register
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(conn) -> int:
+    """Highest applied migration version, 0 for a fresh database"""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def migrate(conn, target: int = None) -> list:
+    """Apply pending migrations up to target (default: latest); returns applied versions"""
+    # Fast path for every start after the first: one read, no writes
+    if current_version(conn) >= (latest_version() if target is None else target):
+        return []
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+    applied = []
+    for version, name, fn in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        if version <= current_version(conn):
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have applied it while we waited for the lock
+            if version <= current_version(conn):
+                conn.rollback()
+                continue
+            cursor = conn.cursor()
+            fn(cursor)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (?, ?)",
+                (version, name)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+
+    return applied
+
+
+@migration(1, "initial_schema")
+def _initial_schema(cursor):
+    # Users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            phone TEXT,
+            password_hash TEXT NOT NULL,
+            role TEXT DEFAULT 'customer',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1
+        )
+    ''')
+
+    # Restaurants table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS restaurants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            cuisine TEXT NOT NULL,
+            rating REAL DEFAULT 4.5,
+            image TEXT,
+            address TEXT,
+            phone TEXT,
+            description TEXT,
+            admin_id TEXT UNIQUE NOT NULL,
+            admin_password_hash TEXT NOT NULL,
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Tables table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tables (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            restaurant_id INTEGER,
+            number INTEGER NOT NULL,
+            capacity INTEGER NOT NULL,
+            status TEXT DEFAULT 'available',
+            type TEXT DEFAULT 'standard',
+            features TEXT,
+            image TEXT,
+            x INTEGER DEFAULT 0,
+            y INTEGER DEFAULT 0,
+            FOREIGN KEY (restaurant_id) REFERENCES restaurants (id)
+        )
+    ''')
+
+    # Menu items table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS menu_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            restaurant_id INTEGER,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            price REAL NOT NULL,
+            description TEXT,
+            image TEXT,
+            dietary TEXT,
+            chef_special BOOLEAN DEFAULT 0,
+            available BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (restaurant_id) REFERENCES restaurants (id)
+        )
+    ''')
+
+    # Bookings table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            restaurant_id INTEGER,
+            table_id INTEGER,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            guests INTEGER NOT NULL,
+            special_requests TEXT,
+            status TEXT DEFAULT 'confirmed',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (restaurant_id) REFERENCES restaurants (id),
+            FOREIGN KEY (table_id) REFERENCES tables (id)
+        )
+    ''')
+
+    # Orders table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            restaurant_id INTEGER,
+            order_type TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            total_amount REAL NOT NULL,
+            scheduled_time TEXT,
+            special_instructions TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (restaurant_id) REFERENCES restaurants (id)
+        )
+    ''')
+
+    # Order items table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            menu_item_id INTEGER,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            FOREIGN KEY (order_id) REFERENCES orders (id),
+            FOREIGN KEY (menu_item_id) REFERENCES menu_items (id)
+        )
+    ''')
+
+    # AI chat history table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ai_chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            message TEXT NOT NULL,
+            response TEXT NOT NULL,
+            context TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+@migration(2, "secondary_indexes")
+def _secondary_indexes(cursor):
+    # Admin order listing: keyset pages by (created_at, id), optionally per status
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_orders_restaurant_created
+        ON orders (restaurant_id, created_at, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_orders_restaurant_status_created
+        ON orders (restaurant_id, status, created_at, id)
+    ''')
+    # Revenue totals read only the index
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_orders_status_amount
+        ON orders (status, total_amount)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_order_items_order
+        ON order_items (order_id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_bookings_restaurant_date
+        ON bookings (restaurant_id, date, time)
+    ''')
+    # Covers the directory's per-restaurant table counts
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tables_restaurant_status
+        ON tables (restaurant_id, status)
+    ''')
+    # Matches the menu's ORDER BY category, name
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_menu_items_restaurant_category
+        ON menu_items (restaurant_id, category, name)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_role_active
+        ON users (role, is_active)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_created
+        ON users (created_at)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_restaurants_active
+        ON restaurants (is_active)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_restaurants_created
+        ON restaurants (created_at)
+    ''')
+
+
+@migration(3, "platform_stats")
+def _platform_stats(cursor):
+    # Single-row table of platform totals, maintained by the triggers below in
+    # the same transaction as the write that changes them
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS platform_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_restaurants INTEGER NOT NULL DEFAULT 0,
+            total_users INTEGER NOT NULL DEFAULT 0,
+            total_orders INTEGER NOT NULL DEFAULT 0,
+            total_bookings INTEGER NOT NULL DEFAULT 0,
+            total_revenue REAL NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO platform_stats
+            (id, total_restaurants, total_users, total_orders, total_bookings, total_revenue)
+        VALUES (
+            1,
+            (SELECT COUNT(*) FROM restaurants WHERE is_active = 1),
+            (SELECT COUNT(*) FROM users WHERE role = 'customer' AND is_active = 1),
+            (SELECT COUNT(*) FROM orders),
+            (SELECT COUNT(*) FROM bookings),
+            (SELECT COALESCE(SUM(total_amount), 0) FROM orders WHERE status = 'completed')
+        )
+    ''')
+
+    # Active customers
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_users_insert AFTER INSERT ON users
+        WHEN NEW.role = 'customer' AND NEW.is_active = 1
+        BEGIN
+            UPDATE platform_stats SET total_users = total_users + 1 WHERE id = 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_users_update AFTER UPDATE OF role, is_active ON users
+        BEGIN
+            UPDATE platform_stats
+            SET total_users = total_users
+                + (CASE WHEN NEW.role = 'customer' AND NEW.is_active = 1 THEN 1 ELSE 0 END)
+                - (CASE WHEN OLD.role = 'customer' AND OLD.is_active = 1 THEN 1 ELSE 0 END)
+            WHERE id = 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_users_delete AFTER DELETE ON users
+        WHEN OLD.role = 'customer' AND OLD.is_active = 1
+        BEGIN
+            UPDATE platform_stats SET total_users = total_users - 1 WHERE id = 1;
+        END
+    ''')
+
+    # Active restaurants
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_restaurants_insert AFTER INSERT ON restaurants
+        WHEN NEW.is_active = 1
+        BEGIN
+            UPDATE platform_stats SET total_restaurants = total_restaurants + 1 WHERE id = 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_restaurants_update AFTER UPDATE OF is_active ON restaurants
+        BEGIN
+            UPDATE platform_stats
+            SET total_restaurants = total_restaurants
+                + (CASE WHEN NEW.is_active = 1 THEN 1 ELSE 0 END)
+                - (CASE WHEN OLD.is_active = 1 THEN 1 ELSE 0 END)
+            WHERE id = 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_restaurants_delete AFTER DELETE ON restaurants
+        WHEN OLD.is_active = 1
+        BEGIN
+            UPDATE platform_stats SET total_restaurants = total_restaurants - 1 WHERE id = 1;
+        END
+    ''')
+
+    # Orders and completed-order revenue
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_orders_insert AFTER INSERT ON orders
+        BEGIN
+            UPDATE platform_stats
+            SET total_orders = total_orders + 1,
+                total_revenue = total_revenue
+                    + (CASE WHEN NEW.status = 'completed' THEN NEW.total_amount ELSE 0 END)
+            WHERE id = 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_orders_update AFTER UPDATE OF status, total_amount ON orders
+        BEGIN
+            UPDATE platform_stats
+            SET total_revenue = total_revenue
+                + (CASE WHEN NEW.status = 'completed' THEN NEW.total_amount ELSE 0 END)
+                - (CASE WHEN OLD.status = 'completed' THEN OLD.total_amount ELSE 0 END)
+            WHERE id = 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_orders_delete AFTER DELETE ON orders
+        BEGIN
+            UPDATE platform_stats
+            SET total_orders = total_orders - 1,
+                total_revenue = total_revenue
+                    - (CASE WHEN OLD.status = 'completed' THEN OLD.total_amount ELSE 0 END)
+            WHERE id = 1;
+        END
+    ''')
+
+    # Bookings
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_bookings_insert AFTER INSERT ON bookings
+        BEGIN
+            UPDATE platform_stats SET total_bookings = total_bookings + 1 WHERE id = 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_bookings_delete AFTER DELETE ON bookings
+        BEGIN
+            UPDATE platform_stats SET total_bookings = total_bookings - 1 WHERE id = 1;
+        END
+    ''')
+
+
+ROLLUP_BUCKETS = (("hour", "strftime('%Y-%m-%d %H:00', {created_at})"), ("day", "date({created_at})"))
+
+
+def _rollup_statements(row: str, sign: str) -> list:
+    """Upserts applying one completed order (row = NEW/OLD) to both rollup tables"""
+    statements = []
+    for period, bucket in ROLLUP_BUCKETS:
+        bucket_sql = bucket.format(created_at=f"{row}.created_at")
+        statements.append(f'''
+            INSERT INTO sales_rollups (restaurant_id, period, bucket, revenue, order_count)
+            VALUES ({row}.restaurant_id, '{period}', {bucket_sql}, {sign}{row}.total_amount, {sign}1)
+            ON CONFLICT (restaurant_id, period, bucket) DO UPDATE SET
+                revenue = revenue + excluded.revenue,
+                order_count = order_count + excluded.order_count;
+        ''')
+        statements.append(f'''
+            INSERT INTO item_sales_rollups (restaurant_id, period, bucket, menu_item_id, units, revenue)
+            SELECT {row}.restaurant_id, '{period}', {bucket_sql}, oi.menu_item_id,
+                   {sign}SUM(oi.quantity), {sign}SUM(oi.quantity * oi.price)
+            FROM order_items oi WHERE oi.order_id = {row}.id
+            GROUP BY oi.menu_item_id
+            ON CONFLICT (restaurant_id, period, bucket, menu_item_id) DO UPDATE SET
+                units = units + excluded.units,
+                revenue = revenue + excluded.revenue;
+        ''')
+    return statements
+
+
+@migration(4, "sales_rollups")
+def _sales_rollups(cursor):
+    # Completed-order revenue and order counts per restaurant per hour/day
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_rollups (
+            restaurant_id INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            revenue REAL NOT NULL DEFAULT 0,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (restaurant_id, period, bucket)
+        ) WITHOUT ROWID
+    ''')
+
+    # Units sold and revenue per menu item per restaurant per hour/day
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS item_sales_rollups (
+            restaurant_id INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            menu_item_id INTEGER NOT NULL,
+            units INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (restaurant_id, period, bucket, menu_item_id)
+        ) WITHOUT ROWID
+    ''')
+
+    # An order counts once it is completed, and stops counting if it leaves that state
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_orders_insert AFTER INSERT ON orders
+        WHEN NEW.status = 'completed'
+        BEGIN
+            {"".join(_rollup_statements("NEW", ""))}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_orders_completed AFTER UPDATE OF status ON orders
+        WHEN NEW.status = 'completed' AND OLD.status IS NOT 'completed'
+        BEGIN
+            {"".join(_rollup_statements("NEW", ""))}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_orders_uncompleted AFTER UPDATE OF status ON orders
+        WHEN OLD.status = 'completed' AND NEW.status IS NOT 'completed'
+        BEGIN
+            {"".join(_rollup_statements("OLD", "-"))}
+        END
+    ''')
+
+    # Items added to an order that is already completed
+    item_statements = []
+    for period, bucket in ROLLUP_BUCKETS:
+        bucket_sql = bucket.format(created_at="o.created_at")
+        item_statements.append(f'''
+            INSERT INTO item_sales_rollups (restaurant_id, period, bucket, menu_item_id, units, revenue)
+            SELECT o.restaurant_id, '{period}', {bucket_sql}, NEW.menu_item_id,
+                   NEW.quantity, NEW.quantity * NEW.price
+            FROM orders o WHERE o.id = NEW.order_id
+            ON CONFLICT (restaurant_id, period, bucket, menu_item_id) DO UPDATE SET
+                units = units + excluded.units,
+                revenue = revenue + excluded.revenue;
+        ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_order_items_insert AFTER INSERT ON order_items
+        WHEN (SELECT status FROM orders WHERE id = NEW.order_id) = 'completed'
+        BEGIN
+            {"".join(item_statements)}
+        END
+    ''')
+
+    # Backfill from the orders completed so far
+    rebuild_sales_rollups(cursor)
+
+
+def rebuild_sales_rollups(cursor):
+    """Recompute both rollup tables from orders and order_items"""
+    cursor.execute("DELETE FROM sales_rollups")
+    cursor.execute("DELETE FROM item_sales_rollups")
+    for period, bucket in ROLLUP_BUCKETS:
+        bucket_sql = bucket.format(created_at="o.created_at")
+        cursor.execute(f'''
+            INSERT INTO sales_rollups (restaurant_id, period, bucket, revenue, order_count)
+            SELECT o.restaurant_id, '{period}', {bucket_sql}, SUM(o.total_amount), COUNT(*)
+            FROM orders o WHERE o.status = 'completed'
+            GROUP BY 1, 3
+        ''')
+        cursor.execute(f'''
+            INSERT INTO item_sales_rollups (restaurant_id, period, bucket, menu_item_id, units, revenue)
+            SELECT o.restaurant_id, '{period}', {bucket_sql}, oi.menu_item_id,
+                   SUM(oi.quantity), SUM(oi.quantity * oi.price)
+            FROM orders o JOIN order_items oi ON oi.order_id = o.id
+            WHERE o.status = 'completed'
+            GROUP BY 1, 3, 4
+        ''')
+
+
+@migration(5, "booking_durations")
+def _booking_durations(cursor):
+    # Bookings hold a table for a time slot instead of flipping tables.status
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(bookings)").fetchall()}
+    if "duration_minutes" not in columns:
+        cursor.execute("ALTER TABLE bookings ADD COLUMN duration_minutes INTEGER NOT NULL DEFAULT 90")
+
+    # Slot conflict checks look up one table's bookings around a date
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_bookings_table_date
+        ON bookings (table_id, date)
+    ''')
+    # The availability index loads only upcoming bookings on startup
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_bookings_date
+        ON bookings (date)
+    ''')
+
+
+@migration(6, "menu_versions")
+def _menu_versions(cursor):
+    # Bumped by the triggers below whenever a restaurant's prices or
+    # availability change, so a cached price map can be checked for staleness
+    # with one primary-key lookup inside the order transaction
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(restaurants)").fetchall()}
+    if "menu_version" not in columns:
+        cursor.execute("ALTER TABLE restaurants ADD COLUMN menu_version INTEGER NOT NULL DEFAULT 0")
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_menu_version_insert AFTER INSERT ON menu_items
+        BEGIN
+            UPDATE restaurants SET menu_version = menu_version + 1 WHERE id = NEW.restaurant_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_menu_version_update
+        AFTER UPDATE OF restaurant_id, price, available ON menu_items
+        BEGIN
+            UPDATE restaurants SET menu_version = menu_version + 1 WHERE id = OLD.restaurant_id;
+            UPDATE restaurants SET menu_version = menu_version + 1
+            WHERE id = NEW.restaurant_id AND NEW.restaurant_id IS NOT OLD.restaurant_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_menu_version_delete AFTER DELETE ON menu_items
+        BEGIN
+            UPDATE restaurants SET menu_version = menu_version + 1 WHERE id = OLD.restaurant_id;
+        END
+    ''')
+
+
+@migration(7, "super_admin_listing_indexes")
+def _super_admin_listing_indexes(cursor):
+    # Keyset pages of users and restaurants, newest first, with or without
+    # the role/active filter; rowid breaks created_at ties
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_role_created
+        ON users (role, created_at)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_active_created
+        ON users (is_active, created_at)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_restaurants_active_created
+        ON restaurants (is_active, created_at)
+    ''')
+    cursor.execute("DROP INDEX IF EXISTS idx_restaurants_active")
+    # Case-insensitive prefix search, paged in name/email order
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_name_nocase
+        ON users (name COLLATE NOCASE)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_email_nocase
+        ON users (email COLLATE NOCASE)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_restaurants_name_nocase
+        ON restaurants (name COLLATE NOCASE)
+    ''')
+
+
+SEARCH_TOKENIZER = "unicode61 remove_diacritics 2"
+
+
+@migration(8, "search_index")
+def _search_index(cursor):
+    # Restaurants are indexed straight from their own rows (external content)
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS restaurant_search USING fts5(
+            name, cuisine, description,
+            content='restaurants', content_rowid='id',
+            tokenize='{SEARCH_TOKENIZER}', prefix='2 3'
+        )
+    ''')
+    # Menu items are indexed with their restaurant's cuisine, so "thai curry"
+    # finds curries at Thai restaurants and a cuisine filter narrows the match
+    # inside FTS5. cuisine is not a menu_items column, so the index is
+    # contentless: the triggers supply the values, and a 'delete' must repeat
+    # exactly the values that were indexed
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS menu_search USING fts5(
+            name, category, description, cuisine,
+            content='',
+            tokenize='{SEARCH_TOKENIZER}', prefix='2 3'
+        )
+    ''')
+
+    restaurant_cuisine = "(SELECT cuisine FROM restaurants WHERE id = {row}.restaurant_id)"
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_search_menu_items_insert AFTER INSERT ON menu_items
+        BEGIN
+            INSERT INTO menu_search (rowid, name, category, description, cuisine)
+            VALUES (NEW.id, NEW.name, NEW.category, NEW.description, {restaurant_cuisine.format(row="NEW")});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_search_menu_items_update
+        AFTER UPDATE OF name, category, description, restaurant_id ON menu_items
+        BEGIN
+            INSERT INTO menu_search (menu_search, rowid, name, category, description, cuisine)
+            VALUES ('delete', OLD.id, OLD.name, OLD.category, OLD.description, {restaurant_cuisine.format(row="OLD")});
+            INSERT INTO menu_search (rowid, name, category, description, cuisine)
+            VALUES (NEW.id, NEW.name, NEW.category, NEW.description, {restaurant_cuisine.format(row="NEW")});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_search_menu_items_delete AFTER DELETE ON menu_items
+        BEGIN
+            INSERT INTO menu_search (menu_search, rowid, name, category, description, cuisine)
+            VALUES ('delete', OLD.id, OLD.name, OLD.category, OLD.description, {restaurant_cuisine.format(row="OLD")});
+        END
+    ''')
+
+    # A restaurant's cuisine change (or its deletion, which leaves its items
+    # with no cuisine) re-indexes its menu items
+    reindex_menu = '''
+        INSERT INTO menu_search (menu_search, rowid, name, category, description, cuisine)
+        SELECT 'delete', id, name, category, description, OLD.cuisine FROM menu_items WHERE restaurant_id = OLD.id;
+        INSERT INTO menu_search (rowid, name, category, description, cuisine)
+        SELECT id, name, category, description, {cuisine} FROM menu_items WHERE restaurant_id = OLD.id;
+    '''
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_search_restaurants_insert AFTER INSERT ON restaurants
+        BEGIN
+            INSERT INTO restaurant_search (rowid, name, cuisine, description)
+            VALUES (NEW.id, NEW.name, NEW.cuisine, NEW.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_search_restaurants_update
+        AFTER UPDATE OF name, cuisine, description ON restaurants
+        BEGIN
+            INSERT INTO restaurant_search (restaurant_search, rowid, name, cuisine, description)
+            VALUES ('delete', OLD.id, OLD.name, OLD.cuisine, OLD.description);
+            INSERT INTO restaurant_search (rowid, name, cuisine, description)
+            VALUES (NEW.id, NEW.name, NEW.cuisine, NEW.description);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_search_restaurants_cuisine AFTER UPDATE OF cuisine ON restaurants
+        WHEN NEW.cuisine IS NOT OLD.cuisine
+        BEGIN
+            {reindex_menu.format(cuisine="NEW.cuisine")}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_search_restaurants_delete AFTER DELETE ON restaurants
+        BEGIN
+            INSERT INTO restaurant_search (restaurant_search, rowid, name, cuisine, description)
+            VALUES ('delete', OLD.id, OLD.name, OLD.cuisine, OLD.description);
+            {reindex_menu.format(cuisine="NULL")}
+        END
+    ''')
+
+    # Backfill from the rows so far
+    rebuild_search_index(cursor)
+
+
+def rebuild_search_index(cursor):
+    """Re-index every restaurant and menu item"""
+    cursor.execute("INSERT INTO restaurant_search (restaurant_search) VALUES ('rebuild')")
+    cursor.execute("INSERT INTO menu_search (menu_search) VALUES ('delete-all')")
+    cursor.execute('''
+        INSERT INTO menu_search (rowid, name, category, description, cuisine)
+        SELECT m.id, m.name, m.category, m.description, r.cuisine
+        FROM menu_items m
+        LEFT JOIN restaurants r ON r.id = m.restaurant_id
+    ''')
+    # One segment per index after a bulk load
+    cursor.execute("INSERT INTO restaurant_search (restaurant_search) VALUES ('optimize')")
+    cursor.execute("INSERT INTO menu_search (menu_search) VALUES ('optimize')")
+
+
+# Tags in the dictionary from the start, in bit order
+STANDARD_DIETARY_TAGS = ["vegetarian", "vegan", "gluten-free", "dairy-free", "healthy", "spicy"]
+
+
+@migration(9, "dietary_tags")
+def _dietary_tags(cursor):
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(menu_items)").fetchall()}
+    if "dietary_mask" not in columns:
+        cursor.execute("ALTER TABLE menu_items ADD COLUMN dietary_mask INTEGER NOT NULL DEFAULT 0")
+
+    # bit is the tag's bit in dietary_mask; 63 would be the sign bit
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dietary_tags (
+            bit INTEGER PRIMARY KEY CHECK (bit BETWEEN 0 AND 62),
+            name TEXT UNIQUE NOT NULL
+        )
+    ''')
+    # Items by tag, for lookups that start from a tag rather than a menu
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS menu_item_dietary_tags (
+            tag_bit INTEGER NOT NULL,
+            menu_item_id INTEGER NOT NULL,
+            PRIMARY KEY (tag_bit, menu_item_id),
+            FOREIGN KEY (tag_bit) REFERENCES dietary_tags (bit),
+            FOREIGN KEY (menu_item_id) REFERENCES menu_items (id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Canonicalise the existing lists and register every tag they use
+    tags = list(STANDARD_DIETARY_TAGS)
+    for (text,) in cursor.execute(
+        "SELECT DISTINCT dietary FROM menu_items WHERE dietary IS NOT NULL"
+    ).fetchall():
+        stored = dietary_tags.canonical(text)
+        if stored != text:
+            cursor.execute("UPDATE menu_items SET dietary = ? WHERE dietary = ?", (stored, text))
+        tags.extend(tag for tag in dietary_tags.parse(text) if tag not in tags)
+    if len(tags) > dietary_tags.MAX_TAGS:
+        raise ValueError(f"menu_items use {len(tags)} dietary tags, at most {dietary_tags.MAX_TAGS} are supported")
+    cursor.executemany(
+        "INSERT OR IGNORE INTO dietary_tags (bit, name) VALUES (?, ?)",
+        list(enumerate(tags)),
+    )
+
+    # The triggers read tags from the canonical list; a tag that is not in
+    # the dictionary is left out of the mask, so create_menu_item and
+    # update_menu_item register new tags first
+    item_tags = "SELECT bit FROM dietary_tags WHERE instr(',' || {row}.dietary || ',', ',' || name || ',') > 0"
+    old_tags = "SELECT bit FROM dietary_tags WHERE OLD.dietary_mask & (1 << bit)"
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_dietary_menu_items_insert AFTER INSERT ON menu_items
+        WHEN NEW.dietary IS NOT NULL
+        BEGIN
+            UPDATE menu_items SET dietary_mask = (
+                SELECT COALESCE(SUM(1 << bit), 0) FROM ({item_tags.format(row="NEW")})
+            ) WHERE id = NEW.id;
+            INSERT INTO menu_item_dietary_tags (tag_bit, menu_item_id)
+            SELECT bit, NEW.id FROM ({item_tags.format(row="NEW")});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_dietary_menu_items_update AFTER UPDATE OF dietary ON menu_items
+        WHEN NEW.dietary IS NOT OLD.dietary
+        BEGIN
+            DELETE FROM menu_item_dietary_tags
+            WHERE tag_bit IN ({old_tags}) AND menu_item_id = OLD.id;
+            UPDATE menu_items SET dietary_mask = (
+                SELECT COALESCE(SUM(1 << bit), 0) FROM ({item_tags.format(row="NEW")})
+            ) WHERE id = NEW.id;
+            INSERT INTO menu_item_dietary_tags (tag_bit, menu_item_id)
+            SELECT bit, NEW.id FROM ({item_tags.format(row="NEW")});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_dietary_menu_items_delete AFTER DELETE ON menu_items
+        WHEN OLD.dietary_mask != 0
+        BEGIN
+            DELETE FROM menu_item_dietary_tags
+            WHERE tag_bit IN ({old_tags}) AND menu_item_id = OLD.id;
+        END
+    ''')
+
+    # Backfill masks and the join table
+    rebuild_dietary_index(cursor)
+
+
+def rebuild_dietary_index(cursor):
+    """Recompute every menu item's dietary_mask and the menu_item_dietary_tags rows from its dietary list"""
+    cursor.execute('''
+        UPDATE menu_items SET dietary_mask = CASE WHEN dietary IS NULL THEN 0 ELSE (
+            SELECT COALESCE(SUM(1 << bit), 0) FROM dietary_tags
+            WHERE instr(',' || menu_items.dietary || ',', ',' || name || ',') > 0
+        ) END
+    ''')
+    cursor.execute("DELETE FROM menu_item_dietary_tags")
+    cursor.execute('''
+        INSERT INTO menu_item_dietary_tags (tag_bit, menu_item_id)
+        SELECT t.bit, m.id
+        FROM dietary_tags t
+        JOIN menu_items m ON m.dietary_mask & (1 << t.bit)
+        ORDER BY t.bit, m.id
+    ''')
+
+
+@migration(10, "shards")
+def _shards(cursor):
+    # Shard files of a split database (database.ShardMap), by path relative
+    # to this file. Empty, as it stays in the shard files themselves, means
+    # this file holds every table.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS shards (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE
+        )
+    ''')
+
+
+@migration(11, "canonical_booking_slots")
+def _canonical_booking_slots(cursor):
+    # Bookings used to store the date and time as sent, and strptime accepts
+    # "7:00" and "2030-1-6". The overlap check compares them as text, so
+    # rewrite every such booking zero-padded, as create_booking now stores them.
+    rows = cursor.execute('''
+        SELECT id, date, time FROM bookings
+        WHERE date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+           OR time NOT GLOB '[0-9][0-9]:[0-9][0-9]'
+    ''').fetchall()
+    for booking_id, date, time in rows:
+        try:
+            moment = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
+        except (TypeError, ValueError):
+            continue
+        cursor.execute("UPDATE bookings SET date = ?, time = ? WHERE id = ?",
+                       (moment.strftime("%Y-%m-%d"), moment.strftime("%H:%M"), booking_id))
+
+
+@migration(12, "search_rank")
+def _search_rank(cursor):
+    # ORDER BY rank sorts matches by bm25 with these column weights: name
+    # counts most, then category or cuisine, then description. FTS5 keeps
+    # the setting in the index's config table, so rebuilds leave it in place.
+    cursor.execute("INSERT INTO restaurant_search (restaurant_search, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')")
+    cursor.execute("INSERT INTO menu_search (menu_search, rank) VALUES ('rank', 'bm25(10.0, 4.0, 1.0, 2.0)')")
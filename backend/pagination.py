@@ -0,0 +1,45 @@
+"""
+Keyset pagination helpers.
+
+List endpoints page through results by the sort key of the last row seen
+instead of OFFSET, so every page costs the same no matter how deep it is.
+The key travels to the client as an opaque cursor string.
+"""
+
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(*values) -> str:
+    """Encode the sort key of the last row on a page"""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Decode a cursor produced by encode_cursor(); raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    # The values become SQL parameters, so only plain scalars are let through
+    if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def page(rows: list, limit: int, key, name: str = "items") -> dict:
+    """Build a page response from up to limit + 1 rows fetched in sort order"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        name: rows,
+        "next_cursor": encode_cursor(*key(rows[-1])) if has_more else None,
+        "has_more": has_more,
+    }
@@ -0,0 +1,137 @@
+"""
+Server-side order pricing.
+
+Orders are priced from the menu, never from prices sent by the client. Each
+restaurant's menu is kept in memory as a PriceMap: {item_id: (price,
+available)} stamped with the restaurant's menu_version, which triggers bump on
+every price or availability change. A cart is priced against the map in one
+pass with no database round trips.
+
+The order transaction re-reads menu_version and refuses the order if it no
+longer matches the map it was priced with, so a map left stale by a write in
+another worker process can never put a wrong price on an order. The admin
+menu endpoints invalidate the map in this process straight away;
+PRICE_MAP_TTL bounds how long another process may keep rejecting an item
+that has since become available.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import queries
+from database import run_shard
+
+PRICE_MAP_CACHE_SIZE = int(os.getenv("PRICE_MAP_CACHE_SIZE", "1024"))
+PRICE_MAP_TTL = float(os.getenv("PRICE_MAP_TTL", "60"))
+
+
+class PricingError(ValueError):
+    """A cart that cannot be priced"""
+
+
+class PriceMap:
+    """Prices and availability of one restaurant's menu at one menu version"""
+
+    __slots__ = ("restaurant_id", "version", "items", "loaded_at")
+
+    def __init__(self, restaurant_id: int, version: int, items: dict):
+        self.restaurant_id = restaurant_id
+        self.version = version
+        self.items = items  # item_id -> (price, available)
+        self.loaded_at = time.monotonic()
+
+    def price_cart(self, cart: list) -> tuple:
+        """Price {"id", "quantity"} lines in one pass; returns (priced lines, total)"""
+        if not cart:
+            raise PricingError("Order has no items")
+
+        items = self.items
+        lines = []
+        total = 0.0
+        for line in cart:
+            item_id, quantity = line.get('id'), line.get('quantity')
+            if not isinstance(item_id, int) or isinstance(item_id, bool):
+                raise PricingError(f"Invalid item id {item_id!r}" if item_id is not None else "Order item has no id")
+            entry = items.get(item_id)
+            if entry is None or not entry[1]:
+                raise PricingError(f"Menu item {item_id} is not available at this restaurant")
+            if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+                raise PricingError(f"Invalid quantity for menu item {item_id}")
+            lines.append({'id': item_id, 'quantity': quantity, 'price': entry[0]})
+            total += entry[0] * quantity
+        return lines, round(total, 2)
+
+
+class PriceMapCache:
+    """Bounded LRU cache of PriceMaps keyed by restaurant id"""
+
+    def __init__(self, max_entries: int, ttl: float = 0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # restaurant_id -> PriceMap
+        self._generations = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._load_total = 0.0
+        self._loads = 0
+
+    def _load(self, conn, restaurant_id: int):
+        with self._lock:
+            generation = self._generations.get(restaurant_id, 0)
+        start = time.perf_counter()
+        menu = queries.menu_price_map(conn, restaurant_id)
+        elapsed = time.perf_counter() - start
+        if menu is None:
+            return None
+        price_map = PriceMap(restaurant_id, *menu)
+        with self._lock:
+            self._loads += 1
+            self._load_total += elapsed
+            # Skip storing if the menu was changed while we were loading
+            if self._generations.get(restaurant_id, 0) == generation:
+                self._entries[restaurant_id] = price_map
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+        return price_map
+
+    async def get(self, restaurant_id: int):
+        """Return the restaurant's PriceMap, or None if it is not an active restaurant"""
+        with self._lock:
+            price_map = self._entries.get(restaurant_id)
+            if price_map is not None and (not self.ttl or time.monotonic() - price_map.loaded_at < self.ttl):
+                self._entries.move_to_end(restaurant_id)
+                self._hits += 1
+                return price_map
+            self._misses += 1
+        return await run_shard(restaurant_id, self._load, restaurant_id)
+
+    def invalidate(self, restaurant_id: int):
+        """Drop the restaurant's map; the next get() reloads it"""
+        with self._lock:
+            self._generations[restaurant_id] = self._generations.get(restaurant_id, 0) + 1
+            self._entries.pop(restaurant_id, None)
+            self._invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "avg_load_ms": round(self._load_total / self._loads * 1000, 3) if self._loads else 0.0,
+                "ttl_seconds": self.ttl,
+            }
+
+
+prices = PriceMapCache(PRICE_MAP_CACHE_SIZE, ttl=PRICE_MAP_TTL)
@@ -0,0 +1,965 @@
+"""
+Data-access functions for the Restaurant Management System API.
+
+Every function takes an open connection as its first argument and runs
+synchronously. Route handlers call them through database.run_db(), which
+executes them on the database thread pool so the event loop never blocks
+on SQLite.
+"""
+
+import availability
+import dietary_tags
+import migrations
+
+def _tuple_cursor(conn):
+    """A cursor that returns plain tuples instead of sqlite3.Row objects
+
+    List queries read their rows with _rows(), which builds each dict in one
+    pass from the tuple instead of going through Row and then dict(row).
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor
+
+def _rows(cursor) -> list:
+    """Fetch the remaining rows of a tuple cursor as dicts keyed by column name"""
+    names = [column[0] for column in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+# Users
+def find_user_by_email(conn, email: str):
+    """Get an active user by email"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, name, email, phone, password_hash, role
+        FROM users WHERE email = ? AND is_active = 1
+    ''', (email,))
+    user = cursor.fetchone()
+    return dict(user) if user else None
+
+def find_super_admin_by_email(conn, email: str):
+    """Get an active super admin by email"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, name, email, password_hash, role
+        FROM users WHERE email = ? AND role = 'superadmin' AND is_active = 1
+    ''', (email,))
+    user = cursor.fetchone()
+    return dict(user) if user else None
+
+def create_user(conn, name: str, email: str, phone, password_hash: str, role: str = 'customer'):
+    """Create a user; returns the new id, or None if the email is taken"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE email = ?", (email,))
+    if cursor.fetchone():
+        return None
+
+    cursor.execute('''
+        INSERT INTO users (name, email, phone, password_hash, role)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (name, email, phone, password_hash, role))
+
+    user_id = cursor.lastrowid
+    conn.commit()
+    return user_id
+
+def update_password_hash(conn, user_id: int, old_hash: str, new_hash: str) -> bool:
+    """Replace a user's password hash unless it has changed since it was read"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?
+    ''', (new_hash, user_id, old_hash))
+    conn.commit()
+    return cursor.rowcount > 0
+
+# Restaurants
+def find_restaurant_admin(conn, admin_id: str):
+    """Get an active restaurant by its admin login id"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, name, cuisine, admin_id, admin_password_hash
+        FROM restaurants WHERE admin_id = ? AND is_active = 1
+    ''', (admin_id,))
+    restaurant = cursor.fetchone()
+    return dict(restaurant) if restaurant else None
+
+def update_admin_password_hash(conn, restaurant_id: int, old_hash: str, new_hash: str) -> bool:
+    """Replace a restaurant admin's password hash unless it has changed since it was read"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE restaurants SET admin_password_hash = ? WHERE id = ? AND admin_password_hash = ?
+    ''', (new_hash, restaurant_id, old_hash))
+    conn.commit()
+    return cursor.rowcount > 0
+
+def list_active_restaurants(conn):
+    """Get all active restaurants with table counts in a single query"""
+    cursor = _tuple_cursor(conn)
+    cursor.execute('''
+        SELECT r.id, r.name, r.cuisine, r.rating, r.image, r.address, r.phone, r.description,
+               COUNT(t.id) as total_tables,
+               COALESCE(SUM(CASE WHEN t.status = 'available' THEN 1 ELSE 0 END), 0) as available_tables
+        FROM restaurants r
+        LEFT JOIN tables t ON t.restaurant_id = r.id
+        WHERE r.is_active = 1
+        GROUP BY r.id
+        ORDER BY r.id
+    ''')
+
+    restaurant_list = _rows(cursor)
+    for restaurant in restaurant_list:
+        restaurant['tables'] = []
+
+    return restaurant_list
+
+def get_active_restaurant(conn, restaurant_id: int):
+    """Get an active restaurant with its tables"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, name, cuisine, rating, image, address, phone, description
+        FROM restaurants WHERE id = ? AND is_active = 1
+    ''', (restaurant_id,))
+    restaurant = cursor.fetchone()
+
+    if not restaurant:
+        return None
+
+    # Get tables for this restaurant
+    cursor.execute('''
+        SELECT id, number, capacity, status, type, features, image, x, y
+        FROM tables WHERE restaurant_id = ?
+    ''', (restaurant_id,))
+    tables = cursor.fetchall()
+
+    restaurant_dict = dict(restaurant)
+    restaurant_dict['tables'] = [dict(table) for table in tables]
+    return restaurant_dict
+
+def get_restaurant(conn, restaurant_id: int):
+    """Get a restaurant's public details"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, name, cuisine, rating, image, address, phone, description
+        FROM restaurants WHERE id = ?
+    ''', (restaurant_id,))
+    restaurant = cursor.fetchone()
+    return dict(restaurant) if restaurant else None
+
+# Super-admin listings page by (sort column, id). Each sort has an index
+# that yields rows already in that order, so a page reads limit + 1 rows.
+LISTING_SORTS = {
+    "created": ("created_at", "DESC"),
+    "name": ("name", "ASC"),
+    "email": ("email", "ASC"),
+}
+
+def _listing_page(conn, table: str, columns: str, limit: int, sort: str, after,
+                  equals: dict, created_from, created_to, prefixes: dict):
+    """One keyset page of table; equals are exact filters, prefixes case-insensitive prefix searches"""
+    sort_column, direction = LISTING_SORTS[sort]
+    collate = " COLLATE NOCASE" if sort != "created" else ""
+    searching = sort != "created"
+    conditions, params = [], []
+
+    # When paging by name or email, every other filter is checked row by row
+    # (the unary + keeps the planner off its index) so the rows still come
+    # off the sort index in order instead of being collected and sorted
+    for column, value in equals.items():
+        if value is not None:
+            conditions.append(f"{'+' if searching else ''}{column} = ?")
+            params.append(value)
+    if created_from:
+        conditions.append(f"{'+' if searching else ''}created_at >= ?")
+        params.append(created_from)
+    # The cursor is already inside the range, and the planner can only seek on one upper bound
+    if created_to and (searching or not after):
+        conditions.append(f"{'+' if searching else ''}created_at < date(?, '+1 day')")
+        params.append(created_to)
+    for column, prefix in prefixes.items():
+        if not prefix:
+            continue
+        # prefix <= value < prefix + U+10FFFF, as a range on the NOCASE index
+        name = column if column == sort_column else f"+{column}"
+        if column != sort_column or not after:
+            conditions.append(f"{name} COLLATE NOCASE >= ?")
+            params.append(prefix)
+        conditions.append(f"{name} COLLATE NOCASE < ?")
+        params.append(prefix + "\U0010ffff")
+    if after:
+        # (key, id) past the cursor, spelled out so the planner can seek on the key
+        op = '<' if direction == 'DESC' else '>'
+        conditions.append(f"{sort_column}{collate} {op}= ? AND ({sort_column}{collate} {op} ? OR id {op} ?)")
+        params.extend((after[0], after[0], after[1]))
+    params.append(limit + 1)
+
+    cursor = _tuple_cursor(conn)
+    cursor.execute(f'''
+        SELECT {columns}
+        FROM {table}
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY {sort_column}{collate} {direction}, id {direction}
+        LIMIT ?
+    ''', params)
+    return _rows(cursor)
+
+def list_restaurants(conn, limit: int, sort: str = "created", after=None, is_active=None,
+                     created_from=None, created_to=None, name_prefix=None):
+    """Get one page of all restaurants, newest first or by name
+
+    after is the (sort key, id) of the last restaurant on the previous page.
+    created_from/created_to are inclusive YYYY-MM-DD bounds on created_at.
+    Returns up to limit + 1 restaurants so the caller can tell if more exist.
+    """
+    return _listing_page(
+        conn, "restaurants",
+        "id, name, cuisine, rating, image, address, phone, description, admin_id, is_active, created_at",
+        limit, sort, after, {"is_active": is_active}, created_from, created_to, {"name": name_prefix},
+    )
+
+def list_users(conn, limit: int, sort: str = "created", after=None, role=None, is_active=None,
+               created_from=None, created_to=None, name_prefix=None, email_prefix=None):
+    """Get one page of all users, newest first or by name or email
+
+    Takes the same after/created_from/created_to arguments as list_restaurants.
+    """
+    return _listing_page(
+        conn, "users", "id, name, email, phone, role, is_active, created_at",
+        limit, sort, after, {"role": role, "is_active": is_active}, created_from, created_to,
+        {"name": name_prefix, "email": email_prefix},
+    )
+
+# Menu items
+def _dietary_bits(conn, tags: list) -> dict:
+    """Bit numbers of those tags that are in the dietary tag dictionary"""
+    if not tags:
+        return {}
+    cursor = _tuple_cursor(conn)
+    cursor.execute(f'''
+        SELECT name, bit FROM dietary_tags WHERE name IN ({", ".join("?" * len(tags))})
+    ''', tags)
+    return dict(cursor.fetchall())
+
+def _dietary_conditions(conn, dietary, exclude_dietary, column: str = "dietary_mask"):
+    """SQL conditions and params for items with every tag in dietary and none in exclude_dietary
+
+    Both are comma-separated tag lists. Returns None when a required tag is
+    not in the dictionary, since then no item can match.
+    """
+    include, exclude = dietary_tags.parse(dietary), dietary_tags.parse(exclude_dietary)
+    bits = _dietary_bits(conn, include + exclude)
+    if any(tag not in bits for tag in include):
+        return None
+    include_mask = sum(1 << bits[tag] for tag in include)
+    exclude_mask = sum(1 << bits[tag] for tag in exclude if tag in bits)
+
+    conditions, params = [], []
+    if include_mask:
+        conditions.append(f"{column} & ? = ?")
+        params.extend((include_mask, include_mask))
+    if exclude_mask:
+        conditions.append(f"{column} & ? = 0")
+        params.append(exclude_mask)
+    return conditions, params
+
+def _register_dietary_tags(conn, tags: list):
+    """Add tags missing from the dietary tag dictionary; raises ValueError once it is full"""
+    known = _dietary_bits(conn, tags)
+    cursor = conn.cursor()
+    for tag in tags:
+        if tag not in known:
+            # The CHECK on bit turns a full dictionary into an ignored insert
+            cursor.execute('''
+                INSERT OR IGNORE INTO dietary_tags (bit, name)
+                SELECT COALESCE(MAX(bit) + 1, 0), ? FROM dietary_tags
+            ''', (tag,))
+    if len(known) < len(tags) and len(_dietary_bits(conn, tags)) < len(tags):
+        raise ValueError(f"Too many distinct dietary tags, at most {dietary_tags.MAX_TAGS} are supported")
+
+def list_dietary_tags(conn):
+    """Get every dietary tag with the number of menu items that carry it"""
+    cursor = _tuple_cursor(conn)
+    cursor.execute('''
+        SELECT t.name, (SELECT COUNT(*) FROM menu_item_dietary_tags j WHERE j.tag_bit = t.bit) as items
+        FROM dietary_tags t
+        ORDER BY t.bit
+    ''')
+    return _rows(cursor)
+
+def list_menu_items(conn, restaurant_id: int, available_only: bool = False, dietary=None, exclude_dietary=None):
+    """Get menu items for a restaurant
+
+    dietary and exclude_dietary are comma-separated tag lists: items must
+    have every tag in the first and none in the second.
+    """
+    conditions, params = ["restaurant_id = ?"], [restaurant_id]
+    if available_only:
+        conditions.append("available = 1")
+    if dietary or exclude_dietary:
+        tag_filter = _dietary_conditions(conn, dietary, exclude_dietary)
+        if tag_filter is None:
+            return []
+        conditions.extend(tag_filter[0])
+        params.extend(tag_filter[1])
+
+    cursor = _tuple_cursor(conn)
+    cursor.execute(f'''
+        SELECT id, name, category, price, description, image, dietary, chef_special, available
+        FROM menu_items WHERE {" AND ".join(conditions)}
+        ORDER BY category, name
+    ''', params)
+    return _rows(cursor)
+
+def create_menu_item(conn, restaurant_id: int, item_data):
+    """Create a menu item and return its id; raises ValueError if the dietary tag dictionary is full"""
+    tags = dietary_tags.parse(item_data.dietary)
+    _register_dietary_tags(conn, tags)
+
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO menu_items (restaurant_id, name, category, price, description, image, dietary, chef_special)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (restaurant_id, item_data.name, item_data.category, item_data.price,
+          item_data.description, item_data.image, ",".join(tags) or None, item_data.chef_special))
+
+    item_id = cursor.lastrowid
+    conn.commit()
+    return item_id
+
+def update_menu_item(conn, restaurant_id: int, item_id: int, fields: dict) -> bool:
+    """Update a menu item; returns False if it is not on this restaurant's menu
+
+    Raises ValueError if new dietary tags would overfill the tag dictionary.
+    """
+    cursor = conn.cursor()
+
+    # Check if item belongs to admin's restaurant
+    cursor.execute('''
+        SELECT id FROM menu_items WHERE id = ? AND restaurant_id = ?
+    ''', (item_id, restaurant_id))
+
+    if not cursor.fetchone():
+        return False
+
+    if "dietary" in fields:
+        tags = dietary_tags.parse(fields["dietary"])
+        _register_dietary_tags(conn, tags)
+        fields = {**fields, "dietary": ",".join(tags) or None}
+
+    # Build update query dynamically
+    update_fields = []
+    update_values = []
+
+    for field, value in fields.items():
+        update_fields.append(f"{field} = ?")
+        update_values.append(value)
+
+    if update_fields:
+        update_values.append(item_id)
+        cursor.execute(f'''
+            UPDATE menu_items SET {", ".join(update_fields)} WHERE id = ?
+        ''', update_values)
+
+        conn.commit()
+
+    return True
+
+def delete_menu_item(conn, restaurant_id: int, item_id: int) -> bool:
+    """Delete a menu item; returns False if it is not on this restaurant's menu"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        DELETE FROM menu_items WHERE id = ? AND restaurant_id = ?
+    ''', (item_id, restaurant_id))
+
+    if cursor.rowcount == 0:
+        return False
+
+    conn.commit()
+    return True
+
+def rebuild_dietary_index(conn):
+    """Recompute every menu item's dietary tag mask and join rows"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        migrations.rebuild_dietary_index(conn.cursor())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+# Search. Both functions walk their FTS5 matches newest first and stop after
+# limit rows, so a broad query reads no more than a narrow one; search.py
+# ranks the candidates.
+def _restaurant_search(cuisine):
+    """FROM/WHERE clause and params for active restaurants matching an FTS5 query, which comes first"""
+    conditions, params = ["restaurant_search MATCH ?", "r.is_active = 1"], []
+    if cuisine:
+        conditions.append("r.cuisine = ?")
+        params.append(cuisine)
+    return f'''
+        FROM restaurant_search
+        JOIN restaurants r ON r.id = restaurant_search.rowid
+        WHERE {" AND ".join(conditions)}
+    ''', params
+
+def search_restaurants(conn, match: str, limit: int, cuisine=None):
+    """Up to limit active restaurants matching an FTS5 query, best match first
+
+    score is the index's rank (bm25 with the weights set by migration 12),
+    lower being better, so results from several queries can be merged.
+    """
+    clause, params = _restaurant_search(cuisine)
+    cursor = _tuple_cursor(conn)
+    cursor.execute(f'''
+        SELECT r.id, r.name, r.cuisine, r.rating, r.image, r.address, r.description,
+               restaurant_search.rank as score
+        {clause}
+        ORDER BY restaurant_search.rank, r.id DESC
+        LIMIT ?
+    ''', [match, *params, limit])
+    return _rows(cursor)
+
+def count_search_restaurants(conn, match: str, cuisine=None) -> int:
+    """Number of active restaurants matching an FTS5 query"""
+    clause, params = _restaurant_search(cuisine)
+    return conn.execute(f"SELECT COUNT(*) {clause}", [match, *params]).fetchone()[0]
+
+def _menu_item_search(conn, cuisine, category, dietary, exclude_dietary):
+    """FROM/WHERE clause and params for available menu items of active restaurants matching an FTS5 query
+
+    The query is the first param. Returns None when a required dietary tag
+    is unknown, since then nothing matches.
+    """
+    conditions, params = ["menu_search MATCH ?", "m.available = 1", "r.is_active = 1"], []
+    if cuisine:
+        conditions.append("r.cuisine = ?")
+        params.append(cuisine)
+    if category:
+        conditions.append("m.category = ?")
+        params.append(category)
+    if dietary or exclude_dietary:
+        tag_filter = _dietary_conditions(conn, dietary, exclude_dietary, column="m.dietary_mask")
+        if tag_filter is None:
+            return None
+        conditions.extend(tag_filter[0])
+        params.extend(tag_filter[1])
+    return f'''
+        FROM menu_search
+        JOIN menu_items m ON m.id = menu_search.rowid
+        JOIN restaurants r ON r.id = m.restaurant_id
+        WHERE {" AND ".join(conditions)}
+    ''', params
+
+def search_menu_items(conn, match: str, limit: int, cuisine=None, category=None,
+                      dietary=None, exclude_dietary=None):
+    """Up to limit available menu items of active restaurants matching an FTS5 query, best match first
+
+    Each row carries its restaurant's name and cuisine, and a score as in
+    search_restaurants(). dietary and exclude_dietary filter by tag as in
+    list_menu_items().
+    """
+    search = _menu_item_search(conn, cuisine, category, dietary, exclude_dietary)
+    if search is None:
+        return []
+    clause, params = search
+    cursor = _tuple_cursor(conn)
+    cursor.execute(f'''
+        SELECT m.id, m.restaurant_id, r.name as restaurant_name, r.cuisine, m.name, m.category, m.price,
+               m.description, m.image, m.dietary, m.chef_special, menu_search.rank as score
+        {clause}
+        ORDER BY menu_search.rank, m.id DESC
+        LIMIT ?
+    ''', [match, *params, limit])
+    return _rows(cursor)
+
+def search_menu_facets(conn, match: str, cuisine=None, category=None, dietary=None, exclude_dietary=None) -> dict:
+    """Counts of the menu items search_menu_items() would match, in total and by cuisine, category and dietary tag
+
+    Counts every match, so its cost grows with how many items the query
+    matches. SQLite groups the matches by cuisine, category and tag mask,
+    a few thousand groups at most, and the groups are summed here.
+    """
+    facets = {"matches": 0, "cuisine": {}, "category": {}, "dietary": {}}
+    search = _menu_item_search(conn, cuisine, category, dietary, exclude_dietary)
+    if search is None:
+        return facets
+    clause, params = search
+    cursor = _tuple_cursor(conn)
+    cursor.execute(f'''
+        SELECT r.cuisine, m.category, m.dietary_mask, COUNT(*)
+        {clause}
+        GROUP BY r.cuisine, m.category, m.dietary_mask
+    ''', [match, *params])
+    groups = cursor.fetchall()
+    cursor.execute("SELECT bit, name FROM dietary_tags")
+    tags = cursor.fetchall()
+
+    for cuisine_name, category_name, mask, count in groups:
+        facets["matches"] += count
+        if cuisine_name:
+            facets["cuisine"][cuisine_name] = facets["cuisine"].get(cuisine_name, 0) + count
+        if category_name:
+            facets["category"][category_name] = facets["category"].get(category_name, 0) + count
+        for bit, name in tags:
+            if mask >> bit & 1:
+                facets["dietary"][name] = facets["dietary"].get(name, 0) + count
+    return facets
+
+def rebuild_search_index(conn):
+    """Re-index every restaurant and menu item for search"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        migrations.rebuild_search_index(conn.cursor())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+# Bookings
+def create_booking(conn, user_id: int, booking_data, start: int, duration_minutes: int):
+    """Book a table for [start, start + duration_minutes) in slot minutes
+
+    Returns the booking id, or None if the table does not exist or the slot
+    overlaps another confirmed booking for that table. Raises ValueError for
+    a date in the past or a party the table cannot seat. The booking is
+    stored under the date and time of start, zero-padded, whatever spelling
+    the request used, so the overlap check compares like with like. The
+    caller commits, so the group commit queue can batch bookings into one
+    transaction.
+    """
+    if start < availability.day_start():
+        raise ValueError("Bookings cannot be made for a past date")
+
+    cursor = conn.cursor()
+
+    # Check the table belongs to this restaurant and seats the party
+    cursor.execute('''
+        SELECT capacity FROM tables
+        WHERE id = ? AND restaurant_id = ?
+    ''', (booking_data.table_id, booking_data.restaurant_id))
+
+    table = cursor.fetchone()
+    if not table:
+        return None
+    if not 1 <= booking_data.guests <= table['capacity']:
+        raise ValueError(f"Table seats 1 to {table['capacity']} guests")
+
+    # Check no confirmed booking on this table overlaps the slot
+    slot_begin = availability.slot_datetime(start)
+    slot_end = availability.slot_datetime(start + duration_minutes)
+    cursor.execute('''
+        SELECT 1 FROM bookings
+        WHERE table_id = ? AND status = 'confirmed'
+          AND date BETWEEN date(?, '-1 day') AND date(?)
+          AND datetime(date || ' ' || time) < ?
+          AND datetime(date || ' ' || time, '+' || duration_minutes || ' minutes') > ?
+        LIMIT 1
+    ''', (booking_data.table_id, slot_begin, slot_end, slot_end, slot_begin))
+
+    if cursor.fetchone():
+        return None
+
+    # Create booking
+    booking_date, booking_time = availability.slot_date_time(start)
+    cursor.execute('''
+        INSERT INTO bookings (user_id, restaurant_id, table_id, date, time, guests, special_requests, duration_minutes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (user_id, booking_data.restaurant_id, booking_data.table_id,
+          booking_date, booking_time, booking_data.guests,
+          booking_data.special_requests, duration_minutes))
+
+    return cursor.lastrowid
+
+def list_bookings(conn, restaurant_id: int):
+    """Get bookings for a restaurant, latest first"""
+    cursor = _tuple_cursor(conn)
+    cursor.execute('''
+        SELECT b.id, b.date, b.time, b.guests, b.special_requests, b.status, b.created_at,
+               u.name as customer_name, u.email as customer_email, u.phone as customer_phone,
+               t.number as table_number, t.capacity as table_capacity
+        FROM bookings b
+        JOIN users u ON b.user_id = u.id
+        JOIN tables t ON b.table_id = t.id
+        WHERE b.restaurant_id = ?
+        ORDER BY b.date DESC, b.time DESC
+    ''', (restaurant_id,))
+    return _rows(cursor)
+
+def export_bookings(conn, restaurant_id: int, limit: int, until: str, after=None,
+                    date_from=None, date_to=None):
+    """Get the next chunk of a restaurant's bookings, by booking date and time, for export
+
+    after is the (date, time, id) of the last booking already exported; until
+    caps created_at like export_orders. date_from/date_to are inclusive
+    bounds on the booking date.
+    """
+    cursor = _tuple_cursor(conn)
+
+    conditions = ["b.restaurant_id = ?", "b.created_at <= ?"]
+    params = [restaurant_id, until]
+    # The cursor is already past date_from, and the planner seeks on only one lower bound
+    if date_from and not after:
+        conditions.append("b.date >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("b.date <= ?")
+        params.append(date_to)
+    if after:
+        conditions.append("(b.date, b.time, b.id) > (?, ?, ?)")
+        params.extend(after)
+    params.append(limit)
+
+    cursor.execute(f'''
+        SELECT b.id, b.date, b.time, b.duration_minutes, b.guests, b.status, b.special_requests,
+               b.created_at, t.number as table_number, t.capacity as table_capacity,
+               u.name as customer_name, u.email as customer_email, u.phone as customer_phone
+        FROM bookings b
+        JOIN users u ON b.user_id = u.id
+        JOIN tables t ON b.table_id = t.id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY b.date, b.time, b.id
+        LIMIT ?
+    ''', params)
+    return _rows(cursor)
+
+# Orders
+def menu_price_map(conn, restaurant_id: int):
+    """Get an active restaurant's (menu_version, {item_id: (price, available)}), or None"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT r.menu_version, m.id, m.price, m.available
+        FROM restaurants r
+        LEFT JOIN menu_items m ON m.restaurant_id = r.id
+        WHERE r.id = ? AND r.is_active = 1
+    ''', (restaurant_id,))
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    items = {row['id']: (row['price'], bool(row['available'])) for row in rows if row['id'] is not None}
+    return rows[0]['menu_version'], items
+
+def _menu_versions(cursor, restaurant_ids) -> dict:
+    """Current menu_version of each active restaurant in restaurant_ids"""
+    restaurant_ids = sorted(set(restaurant_ids))
+    cursor.execute(f'''
+        SELECT id, menu_version FROM restaurants
+        WHERE id IN ({', '.join('?' * len(restaurant_ids))}) AND is_active = 1
+    ''', restaurant_ids)
+    return {row['id']: row['menu_version'] for row in cursor.fetchall()}
+
+def _insert_orders(cursor, user_id: int, orders: list) -> list:
+    """Insert orders and all their items with two executemany calls; return the new order ids"""
+    cursor.executemany('''
+        INSERT INTO orders (user_id, restaurant_id, order_type, total_amount, scheduled_time, special_instructions)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(user_id, order.restaurant_id, order.order_type, order.total_amount,
+           order.scheduled_time, order.special_instructions) for order in orders])
+
+    # orders uses AUTOINCREMENT and the caller holds the write lock, so the
+    # rows just inserted got consecutive ids ending at last_insert_rowid()
+    last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+    order_ids = list(range(last_id - len(orders) + 1, last_id + 1))
+
+    cursor.executemany('''
+        INSERT INTO order_items (order_id, menu_item_id, quantity, price)
+        VALUES (?, ?, ?, ?)
+    ''', [(order_id, item['id'], item['quantity'], item['price'])
+          for order_id, order in zip(order_ids, orders) for item in order.items])
+    return order_ids
+
+def create_order(conn, user_id: int, order_data, menu_version: int):
+    """Create a priced order with its items and return the order id
+
+    Returns None without writing if the restaurant's menu is no longer at
+    menu_version, the version the order was priced against. The caller
+    commits, as for create_booking.
+    """
+    cursor = conn.cursor()
+    if _menu_versions(cursor, [order_data.restaurant_id]).get(order_data.restaurant_id) != menu_version:
+        return None
+
+    return _insert_orders(cursor, user_id, [order_data])[0]
+
+def create_orders(conn, user_id: int, orders: list, menu_versions: dict) -> list:
+    """Create a batch of priced orders in one transaction
+
+    menu_versions maps each restaurant id to the menu version its orders were
+    priced against. Returns the new order id for each order, in input order,
+    or None for orders whose restaurant menu has changed since.
+    """
+    cursor = conn.cursor()
+    current = _menu_versions(cursor, menu_versions)
+    accepted = [current.get(order.restaurant_id) == menu_versions[order.restaurant_id] for order in orders]
+
+    valid = [order for order, ok in zip(orders, accepted) if ok]
+    order_ids = iter(_insert_orders(cursor, user_id, valid) if valid else ())
+    conn.commit()
+
+    return [next(order_ids) if ok else None for ok in accepted]
+
+def list_orders(conn, restaurant_id: int, limit: int, after=None, status=None,
+                date_from=None, date_to=None):
+    """Get one page of a restaurant's orders with their items, newest first
+
+    after is the (created_at, id) of the last order on the previous page.
+    date_from/date_to are inclusive YYYY-MM-DD bounds on created_at.
+    Returns up to limit + 1 orders so the caller can tell if more exist.
+    """
+    cursor = _tuple_cursor(conn)
+
+    conditions = ["o.restaurant_id = ?"]
+    params = [restaurant_id]
+    if status:
+        conditions.append("o.status = ?")
+        params.append(status)
+    if date_from:
+        conditions.append("o.created_at >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("o.created_at < date(?, '+1 day')")
+        params.append(date_to)
+    if after:
+        conditions.append("(o.created_at, o.id) < (?, ?)")
+        params.extend(after)
+    params.append(limit + 1)
+
+    cursor.execute(f'''
+        SELECT o.id, o.order_type, o.status, o.total_amount, o.scheduled_time,
+               o.special_instructions, o.created_at, u.name as customer_name, u.email as customer_email
+        FROM orders o
+        JOIN users u ON o.user_id = u.id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY o.created_at DESC, o.id DESC
+        LIMIT ?
+    ''', params)
+    order_list = _rows(cursor)
+    orders_by_id = {}
+    for order in order_list:
+        order['items'] = []
+        orders_by_id[order['id']] = order
+
+    if not order_list:
+        return order_list
+
+    # Get the items for the whole page in one query
+    placeholders = ", ".join("?" * len(orders_by_id))
+    cursor.execute(f'''
+        SELECT oi.order_id, oi.quantity, oi.price, mi.name as item_name
+        FROM order_items oi
+        JOIN menu_items mi ON oi.menu_item_id = mi.id
+        WHERE oi.order_id IN ({placeholders})
+        ORDER BY oi.order_id, oi.id
+    ''', list(orders_by_id))
+    for order_id, quantity, price, item_name in cursor.fetchall():
+        orders_by_id[order_id]['items'].append({"quantity": quantity, "price": price, "item_name": item_name})
+
+    return order_list
+
+def export_orders(conn, restaurant_id: int, limit: int, until: str, after=None,
+                  date_from=None, date_to=None):
+    """Get the next chunk of a restaurant's orders with their items, oldest first, for export
+
+    after is the (created_at, id) of the last order already exported; until
+    caps created_at at the moment the export started, so orders placed while
+    it runs don't keep extending it. date_from/date_to are inclusive
+    YYYY-MM-DD bounds on created_at.
+    """
+    cursor = _tuple_cursor(conn)
+
+    conditions = ["o.restaurant_id = ?", "o.created_at <= ?"]
+    params = [restaurant_id, until]
+    # The cursor is already past date_from, and the planner seeks on only one lower bound
+    if date_from and not after:
+        conditions.append("o.created_at >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("o.created_at < date(?, '+1 day')")
+        params.append(date_to)
+    if after:
+        conditions.append("(o.created_at, o.id) > (?, ?)")
+        params.extend(after)
+    params.append(limit)
+
+    cursor.execute(f'''
+        SELECT o.id, o.created_at, o.status, o.order_type, o.total_amount, o.scheduled_time,
+               o.special_instructions, u.name as customer_name, u.email as customer_email
+        FROM orders o
+        JOIN users u ON o.user_id = u.id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY o.created_at, o.id
+        LIMIT ?
+    ''', params)
+    orders_by_id = {}
+    for order in _rows(cursor):
+        order['items'] = []
+        orders_by_id[order['id']] = order
+
+    if not orders_by_id:
+        return []
+
+    placeholders = ", ".join("?" * len(orders_by_id))
+    cursor.execute(f'''
+        SELECT oi.order_id, oi.menu_item_id, mi.name as item_name, oi.quantity, oi.price
+        FROM order_items oi
+        LEFT JOIN menu_items mi ON oi.menu_item_id = mi.id
+        WHERE oi.order_id IN ({placeholders})
+        ORDER BY oi.order_id, oi.id
+    ''', list(orders_by_id))
+    for order_id, menu_item_id, item_name, quantity, price in cursor.fetchall():
+        orders_by_id[order_id]['items'].append({
+            "menu_item_id": menu_item_id, "item_name": item_name, "quantity": quantity, "price": price,
+        })
+
+    return list(orders_by_id.values())
+
+def update_order_status(conn, restaurant_id: int, order_id: int, new_status: str) -> bool:
+    """Set an order's status; returns False if the order is not found"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE orders SET status = ?
+        WHERE id = ? AND restaurant_id = ?
+    ''', (new_status, order_id, restaurant_id))
+
+    if cursor.rowcount == 0:
+        return False
+
+    conn.commit()
+    return True
+
+# Analytics
+PLATFORM_STATS_FIELDS = ("total_restaurants", "total_users", "total_orders", "total_bookings", "total_revenue")
+
+def platform_analytics(conn):
+    """Platform-wide totals from the trigger-maintained platform_stats row"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT total_restaurants, total_users, total_orders, total_bookings, total_revenue
+        FROM platform_stats WHERE id = 1
+    ''')
+    stats = cursor.fetchone()
+    if not stats:
+        return compute_platform_analytics(conn)
+
+    stats = dict(stats)
+    stats['total_revenue'] = round(stats['total_revenue'], 2)
+    return stats
+
+def compute_platform_analytics(conn):
+    """Platform-wide totals recomputed from the source tables"""
+    cursor = conn.cursor()
+
+    # Get total counts
+    cursor.execute("SELECT COUNT(*) as total_restaurants FROM restaurants WHERE is_active = 1")
+    total_restaurants = cursor.fetchone()['total_restaurants']
+
+    cursor.execute("SELECT COUNT(*) as total_users FROM users WHERE role = 'customer' AND is_active = 1")
+    total_users = cursor.fetchone()['total_users']
+
+    cursor.execute("SELECT COUNT(*) as total_orders FROM orders")
+    total_orders = cursor.fetchone()['total_orders']
+
+    cursor.execute("SELECT COUNT(*) as total_bookings FROM bookings")
+    total_bookings = cursor.fetchone()['total_bookings']
+
+    cursor.execute("SELECT SUM(total_amount) as total_revenue FROM orders WHERE status = 'completed'")
+    total_revenue = cursor.fetchone()['total_revenue'] or 0
+
+    return {
+        "total_restaurants": total_restaurants,
+        "total_users": total_users,
+        "total_orders": total_orders,
+        "total_bookings": total_bookings,
+        "total_revenue": total_revenue
+    }
+
+def reconcile_platform_stats(conn, fix: bool = True) -> dict:
+    """Recompute platform_stats from scratch; returns {field: (stored, actual)} for drifted fields"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT total_restaurants, total_users, total_orders, total_bookings, total_revenue
+            FROM platform_stats WHERE id = 1
+        ''')
+        stored = cursor.fetchone()
+        actual = compute_platform_analytics(conn)
+
+        drift = {}
+        for field in PLATFORM_STATS_FIELDS:
+            stored_value = stored[field] if stored else None
+            if stored_value is None or abs(stored_value - actual[field]) > 0.005:
+                drift[field] = (stored_value, actual[field])
+
+        if fix and drift:
+            cursor.execute('''
+                INSERT OR REPLACE INTO platform_stats
+                    (id, total_restaurants, total_users, total_orders, total_bookings, total_revenue, updated_at)
+                VALUES (1, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', tuple(actual[field] for field in PLATFORM_STATS_FIELDS))
+            conn.commit()
+        else:
+            conn.rollback()
+        return drift
+    except Exception:
+        conn.rollback()
+        raise
+
+def sales_analytics(conn, restaurant_id: int, granularity: str, date_from: str, date_to: str):
+    """Revenue series and top items for a restaurant from the sales rollups
+
+    granularity is 'hour', 'day' or 'month' (months are summed from daily buckets);
+    date_from/date_to are inclusive YYYY-MM-DD dates.
+    """
+    cursor = conn.cursor()
+    period = 'hour' if granularity == 'hour' else 'day'
+    bucket = "substr(bucket, 1, 7)" if granularity == 'month' else "bucket"
+
+    cursor.execute(f'''
+        SELECT {bucket} as bucket, SUM(revenue) as revenue, SUM(order_count) as order_count
+        FROM sales_rollups
+        WHERE restaurant_id = ? AND period = ? AND bucket >= ? AND bucket < date(?, '+1 day')
+        GROUP BY 1
+        HAVING SUM(order_count) > 0
+        ORDER BY 1
+    ''', (restaurant_id, period, date_from, date_to))
+    series = [
+        {"bucket": row['bucket'], "revenue": round(row['revenue'], 2), "order_count": row['order_count']}
+        for row in cursor.fetchall()
+    ]
+
+    cursor.execute('''
+        SELECT r.menu_item_id, mi.name as item_name, SUM(r.units) as units, SUM(r.revenue) as revenue
+        FROM item_sales_rollups r
+        LEFT JOIN menu_items mi ON mi.id = r.menu_item_id
+        WHERE r.restaurant_id = ? AND r.period = 'day' AND r.bucket >= ? AND r.bucket < date(?, '+1 day')
+        GROUP BY r.menu_item_id
+        HAVING SUM(r.units) > 0
+        ORDER BY units DESC, revenue DESC
+    ''', (restaurant_id, date_from, date_to))
+    items = [
+        {"menu_item_id": row['menu_item_id'], "item_name": row['item_name'],
+         "units": row['units'], "revenue": round(row['revenue'], 2)}
+        for row in cursor.fetchall()
+    ]
+
+    return {
+        "restaurant_id": restaurant_id,
+        "granularity": granularity,
+        "date_from": date_from,
+        "date_to": date_to,
+        "totals": {
+            "revenue": round(sum(point['revenue'] for point in series), 2),
+            "order_count": sum(point['order_count'] for point in series),
+        },
+        "series": series,
+        "items": items,
+    }
+
+def rebuild_sales_rollups(conn):
+    """Recompute the sales rollup tables from orders and order_items"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        migrations.rebuild_sales_rollups(conn.cursor())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
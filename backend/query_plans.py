@@ -0,0 +1,213 @@
+"""
+Query-plan regression check.
+
+Runs every data-access function in queries.py against a small fixture
+database built by the migrations, records each SQL statement it executes and
+asks SQLite for its EXPLAIN QUERY PLAN. Any statement that reads a table with
+a plain full scan (no index) is reported as a failure, except in the
+rebuild commands listed in FULL_REBUILDS, which read every row by design,
+and of the tables in BOUNDED_TABLES, which never hold more than a few
+dozen rows.
+
+Run it with:  python manage.py check-plans
+"""
+
+import os
+import re
+import sqlite3
+import tempfile
+from types import SimpleNamespace
+
+import migrations
+import queries
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+TABLE_REF = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+FULL_REBUILDS = {"rebuild_search_index", "rebuild_dietary_index"}
+BOUNDED_TABLES = {"dietary_tags"}
+
+
+def _fixture(conn):
+    """Minimal rows so every code path in queries.py issues its statements"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO restaurants (id, name, cuisine, description, admin_id, admin_password_hash)
+        VALUES (1, 'Plan Check Bistro', 'Test', 'Fixture', 'PC001', 'x')
+    ''')
+    cursor.execute('''
+        INSERT INTO users (id, name, email, password_hash, role)
+        VALUES (1, 'Customer', 'customer@example.com', 'x', 'customer')
+    ''')
+    cursor.execute('''
+        INSERT INTO users (id, name, email, password_hash, role)
+        VALUES (2, 'Owner', 'owner@example.com', 'x', 'superadmin')
+    ''')
+    cursor.execute('''
+        INSERT INTO tables (id, restaurant_id, number, capacity) VALUES (1, 1, 1, 4), (2, 1, 2, 2)
+    ''')
+    cursor.execute('''
+        INSERT INTO menu_items (id, restaurant_id, name, category, price) VALUES (1, 1, 'Soup', 'Starters', 5.0)
+    ''')
+    cursor.execute('''
+        INSERT INTO orders (id, user_id, restaurant_id, order_type, total_amount) VALUES (1, 1, 1, 'dine-in', 5.0)
+    ''')
+    cursor.execute('''
+        INSERT INTO order_items (order_id, menu_item_id, quantity, price) VALUES (1, 1, 1, 5.0)
+    ''')
+    cursor.execute('''
+        INSERT INTO bookings (user_id, restaurant_id, table_id, date, time, guests) VALUES (1, 1, 2, '2025-01-01', '19:00', 2)
+    ''')
+    conn.commit()
+
+
+def _calls():
+    """(label, function, args, kwargs) for every function in queries.py"""
+    booking = SimpleNamespace(restaurant_id=1, table_id=1, date='2999-01-02', time='19:00',
+                              guests=2, special_requests=None)
+    order = SimpleNamespace(restaurant_id=1, order_type='dine-in', total_amount=5.0,
+                            scheduled_time=None, special_instructions=None,
+                            items=[{'id': 1, 'quantity': 1, 'price': 5.0}])
+    menu_item = SimpleNamespace(name='Salad', category='Starters', price=6.0, description='',
+                                image='', dietary='Vegan, nut free', chef_special=False)
+    return [
+        ("find_user_by_email", queries.find_user_by_email, ('customer@example.com',), {}),
+        ("find_super_admin_by_email", queries.find_super_admin_by_email, ('owner@example.com',), {}),
+        ("create_user", queries.create_user, ('New', 'new@example.com', None, 'x'), {}),
+        ("update_password_hash", queries.update_password_hash, (1, 'x', 'y'), {}),
+        ("find_restaurant_admin", queries.find_restaurant_admin, ('PC001',), {}),
+        ("update_admin_password_hash", queries.update_admin_password_hash, (1, 'x', 'y'), {}),
+        ("list_active_restaurants", queries.list_active_restaurants, (), {}),
+        ("get_active_restaurant", queries.get_active_restaurant, (1,), {}),
+        ("get_restaurant", queries.get_restaurant, (1,), {}),
+        ("list_restaurants", queries.list_restaurants, (50,), {}),
+        ("list_restaurants(active page)", queries.list_restaurants, (50,),
+         {"after": ['2999-01-01 00:00:00', 999], "is_active": True,
+          "created_from": '2000-01-01', "created_to": '2999-01-01'}),
+        ("list_restaurants(name search)", queries.list_restaurants, (50,),
+         {"sort": "name", "after": ['Plan', 0], "name_prefix": 'pl'}),
+        ("list_users", queries.list_users, (50,), {}),
+        ("list_users(role page)", queries.list_users, (50,),
+         {"after": ['2999-01-01 00:00:00', 999], "role": 'customer', "is_active": True,
+          "created_from": '2000-01-01', "created_to": '2999-01-01'}),
+        ("list_users(inactive)", queries.list_users, (50,), {"is_active": False}),
+        ("list_users(name search)", queries.list_users, (50,),
+         {"sort": "name", "after": ['Cust', 0], "name_prefix": 'cu', "role": 'customer', "is_active": True}),
+        ("list_users(name and email search)", queries.list_users, (50,),
+         {"sort": "email", "email_prefix": 'cu', "name_prefix": 'cu', "created_from": '2000-01-01'}),
+        ("list_users(email search)", queries.list_users, (50,),
+         {"sort": "email", "after": ['cust', 0], "email_prefix": 'CUST'}),
+        ("list_dietary_tags", queries.list_dietary_tags, (), {}),
+        ("list_menu_items", queries.list_menu_items, (1,), {}),
+        ("list_menu_items(available_only)", queries.list_menu_items, (1,), {"available_only": True}),
+        ("list_menu_items(dietary)", queries.list_menu_items, (1,),
+         {"available_only": True, "dietary": 'vegan,gluten-free', "exclude_dietary": 'spicy'}),
+        ("search_restaurants", queries.search_restaurants, ('"plan"*', 500), {}),
+        ("search_restaurants(cuisine)", queries.search_restaurants, ('"plan"* AND cuisine : "test"', 500),
+         {"cuisine": 'Test'}),
+        ("count_search_restaurants", queries.count_search_restaurants, ('"plan"* AND cuisine : "test"',),
+         {"cuisine": 'Test'}),
+        ("search_menu_items", queries.search_menu_items, ('"sou"*', 500), {}),
+        ("search_menu_items(filtered)", queries.search_menu_items, ('"sou"* AND category : "starters"', 500),
+         {"cuisine": 'Test', "category": 'Starters', "dietary": 'vegan', "exclude_dietary": 'spicy'}),
+        ("search_menu_facets", queries.search_menu_facets, ('"sou"*',), {}),
+        ("search_menu_facets(filtered)", queries.search_menu_facets, ('"sou"* AND category : "starters"',),
+         {"cuisine": 'Test', "category": 'Starters', "dietary": 'vegan', "exclude_dietary": 'spicy'}),
+        ("menu_price_map", queries.menu_price_map, (1,), {}),
+        # The fixture's one menu item puts the restaurant at menu version 1
+        ("create_order", queries.create_order, (1, order, 1), {}),
+        ("create_orders", queries.create_orders, (1, [order, order], {1: 1}), {}),
+        ("create_menu_item", queries.create_menu_item, (1, menu_item), {}),
+        ("update_menu_item", queries.update_menu_item, (1, 1, {"price": 5.5}), {}),
+        ("update_menu_item(dietary)", queries.update_menu_item, (1, 1, {"dietary": 'vegan,spicy'}), {}),
+        ("create_booking", queries.create_booking, (1, booking, 525_426_900, 90), {}),
+        ("list_bookings", queries.list_bookings, (1,), {}),
+        ("list_orders", queries.list_orders, (1, 50), {}),
+        ("list_orders(filtered page)", queries.list_orders, (1, 50),
+         {"after": ['2999-01-01 00:00:00', 999], "status": 'pending',
+          "date_from": '2000-01-01', "date_to": '2999-01-01'}),
+        ("export_orders", queries.export_orders, (1, 1000, '2999-01-01 00:00:00'), {}),
+        ("export_orders(range)", queries.export_orders, (1, 1000, '2999-01-01 00:00:00'),
+         {"after": ['2000-01-01 00:00:00', 0], "date_from": '2000-01-01', "date_to": '2999-01-01'}),
+        ("export_bookings", queries.export_bookings, (1, 1000, '2999-01-01 00:00:00'), {}),
+        ("export_bookings(range)", queries.export_bookings, (1, 1000, '2999-01-01 00:00:00'),
+         {"after": ['2000-01-01', '00:00', 0], "date_from": '2000-01-01', "date_to": '2999-01-01'}),
+        ("update_order_status", queries.update_order_status, (1, 1, 'completed'), {}),
+        ("platform_analytics", queries.platform_analytics, (), {}),
+        ("compute_platform_analytics", queries.compute_platform_analytics, (), {}),
+        ("reconcile_platform_stats", queries.reconcile_platform_stats, (), {}),
+        ("sales_analytics(day)", queries.sales_analytics, (1, 'day', '2000-01-01', '2999-01-01'), {}),
+        ("sales_analytics(hour)", queries.sales_analytics, (1, 'hour', '2000-01-01', '2999-01-01'), {}),
+        ("sales_analytics(month)", queries.sales_analytics, (1, 'month', '2000-01-01', '2999-01-01'), {}),
+        ("rebuild_sales_rollups", queries.rebuild_sales_rollups, (), {}),
+        ("rebuild_search_index", queries.rebuild_search_index, (), {}),
+        ("rebuild_dietary_index", queries.rebuild_dietary_index, (), {}),
+        ("delete_menu_item", queries.delete_menu_item, (1, 2), {}),
+    ]
+
+
+def _table_aliases(statement: str, tables: set) -> dict:
+    """Map every name a statement uses for a real table (including aliases) to the table"""
+    names = {}
+    for table, alias in TABLE_REF.findall(statement):
+        if table in tables:
+            names[table] = table
+            if alias and alias.upper() not in ("WHERE", "ON", "SET", "JOIN", "LEFT", "INNER",
+                                              "ORDER", "GROUP", "LIMIT", "VALUES"):
+                names[alias] = table
+    return names
+
+
+def uncovered_functions() -> list:
+    """Public functions in queries.py that check_plans() does not exercise"""
+    covered = {fn.__name__ for _, fn, _, _ in _calls()}
+    return sorted(
+        name for name, obj in vars(queries).items()
+        if callable(obj) and getattr(obj, "__module__", None) == queries.__name__
+        and not name.startswith("_") and name not in covered
+    )
+
+
+def check_plans(verbose: bool = False, target: int = None) -> list:
+    """Return a list of (label, statement, plan detail) for every full table scan"""
+    with tempfile.TemporaryDirectory(prefix="query-plans-") as directory:
+        conn = sqlite3.connect(os.path.join(directory, "plans.db"))
+        try:
+            return _check(conn, verbose, target)
+        finally:
+            conn.close()
+
+
+def _check(conn, verbose: bool, target: int) -> list:
+    conn.row_factory = sqlite3.Row
+    migrations.migrate(conn, target)
+    _fixture(conn)
+
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    failures = []
+
+    for label, fn, args, kwargs in _calls():
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            fn(conn, *args, **kwargs)
+        finally:
+            conn.set_trace_callback(None)
+            if conn.in_transaction:
+                conn.commit()
+
+        for statement in statements:
+            if not statement.lstrip().upper().startswith(EXPLAINABLE):
+                continue
+            plan = conn.execute("EXPLAIN QUERY PLAN " + statement).fetchall()
+            names = _table_aliases(statement, tables)
+            for row in plan:
+                detail = row[3]
+                if verbose:
+                    print(f"{label}: {detail}")
+                match = FULL_SCAN.match(detail)
+                if (match and match.group(1) in names and label not in FULL_REBUILDS
+                        and names[match.group(1)] not in BOUNDED_TABLES):
+                    failures.append((label, " ".join(statement.split()), detail))
+
+    return failures
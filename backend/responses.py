@@ -0,0 +1,45 @@
+"""
+JSON response bodies encoded straight to bytes.
+
+A dict or list returned from a route goes through FastAPI's
+jsonable_encoder(), which walks and copies every row, before json.dumps()
+runs. For list endpoints that walk costs several times more than the query
+itself. List handlers instead return json_response(), which encodes the
+query result in one pass with orjson (or the stdlib encoder when orjson is
+not installed) and hands the bytes to a plain Response.
+
+The output matches FastAPI's JSONResponse: compact separators, UTF-8, no
+ASCII escaping.
+"""
+
+import json
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def dumps(value) -> bytes:
+    """Encode a response body as compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(value, status_code: int = 200, headers: dict = None) -> Response:
+    """A response for value that skips FastAPI's jsonable_encoder pass"""
+    return raw_json_response(dumps(value), status_code, headers)
+
+
+def raw_json_response(body: bytes, status_code: int = 200, headers: dict = None) -> Response:
+    """A response for a body that is already encoded JSON"""
+    return Response(content=body, status_code=status_code, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+
+def encoder() -> str:
+    return "orjson" if orjson is not None else "json"
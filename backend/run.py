@@ -4,14 +4,17 @@ Restaurant Management System Backend Runner
 Run this file to start the backend server
 """
 
+import os
+
 import uvicorn
 from main import app
 
 if __name__ == "__main__":
+    port = int(os.getenv("PORT", "8000"))
     print("🚀 Starting Restaurant Management System Backend...")
-    print("📊 Database will be automatically initialized on first run")
-    print("🌐 API will be available at: http://localhost:8000")
-    print("📖 API Documentation: http://localhost:8000/docs")
+    print("📊 Schema migrations run automatically; load demo data with: python manage.py seed")
+    print(f"🌐 API will be available at: http://localhost:{port}")
+    print(f"📖 API Documentation: http://localhost:{port}/docs")
     print("🔧 Admin Panel APIs: /api/admin/*")
     print("👑 Super Admin APIs: /api/super-admin/*")
     print("\n" + "="*50)
@@ -30,7 +33,7 @@ if __name__ == "__main__":
     uvicorn.run(
         "main:app", 
         host="0.0.0.0", 
-        port=8000, 
-        reload=True,
+        port=port, 
+        reload=os.getenv("RELOAD", "1") == "1",
         log_level="info"
     )
\ No newline at end of file
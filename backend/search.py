@@ -0,0 +1,111 @@
+"""
+Full-text search over restaurants and menu items.
+
+The restaurant_search and menu_search FTS5 indexes (migration 8) are kept
+in step with their tables by triggers, so every write path updates them
+in the same transaction. A search matches every word of the query, the
+last one also as a prefix, so results follow the user as they type.
+
+Results are ranked by FTS5's bm25, weighted by column (migration 12),
+so the best matches come first however old they are. Facet counts are
+exact: a grouped COUNT over every match of the query and its filters.
+Both read every match, so a broad prefix like "chi" costs far more than
+a word or two; a broad search of a million-item catalog takes hundreds of
+milliseconds. On a sharded database each shard ranks and counts its own
+menu items, the best of each are merged by score and the counts summed.
+bm25 weighs words by their frequency within each shard, so scores from
+shards of very different content are only roughly comparable.
+"""
+
+import asyncio
+import re
+import unicodedata
+from collections import Counter
+
+import queries
+from database import run_db, run_each_shard
+
+MAX_SEARCH_TERMS = 8
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _fold(text: str) -> str:
+    """Lower-cased text without diacritics"""
+    text = text.lower()
+    if not text.isascii():
+        text = "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+    return text
+
+
+def words(text: str) -> list:
+    """Lower-cased words of text without diacritics, split the way the FTS5 tokenizer splits them"""
+    return _WORD.findall(_fold(text)) if text else []
+
+
+def _phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _match(terms: list, columns: dict) -> str:
+    """FTS5 query for every term, the last as a prefix, in rows whose given columns contain the given values"""
+    match = " ".join(_phrase(term) for term in terms) + "*"
+    filters = [f"{column} : {_phrase(value)}" for column, value in columns.items() if value]
+    return " AND ".join([f"({match})"] + filters) if filters else match
+
+
+def restaurant_results(conn, terms: list, limit: int, cuisine=None) -> tuple:
+    """The limit best restaurants matching terms, and how many match"""
+    match = _match(terms, {"cuisine": cuisine})
+    return (queries.search_restaurants(conn, match, limit, cuisine),
+            queries.count_search_restaurants(conn, match, cuisine))
+
+
+def menu_item_results(conn, terms: list, limit: int, cuisine=None, category=None,
+                      dietary=None, exclude_dietary=None) -> tuple:
+    """The limit best menu items matching terms, and their facet counts"""
+    match = _match(terms, {"cuisine": cuisine, "category": category})
+    return (queries.search_menu_items(conn, match, limit, cuisine, category, dietary, exclude_dietary),
+            queries.search_menu_facets(conn, match, cuisine, category, dietary, exclude_dietary))
+
+
+def _best(rows: list, limit: int) -> list:
+    """The limit lowest-scoring rows, without their scores"""
+    best = sorted(rows, key=lambda row: row["score"])[:limit]
+    for row in best:
+        del row["score"]
+    return best
+
+
+def results(limit: int, restaurants: tuple, item_results: list) -> dict:
+    """Response from restaurant_results() and each shard's menu_item_results()"""
+    restaurant_rows, restaurant_count = restaurants
+    facets = {"cuisine": Counter(), "category": Counter(), "dietary": Counter()}
+    for _, shard_facets in item_results:
+        for name, counts in facets.items():
+            counts.update(shard_facets[name])
+    return {
+        "restaurants": _best(restaurant_rows, limit),
+        "menu_items": _best([item for items, _ in item_results for item in items], limit),
+        "facets": {name: dict(counts.most_common()) for name, counts in facets.items()},
+        "matches": {"restaurants": restaurant_count,
+                    "menu_items": sum(shard_facets["matches"] for _, shard_facets in item_results)},
+    }
+
+
+def search(conn, terms: list, limit: int, cuisine=None, category=None, dietary=None, exclude_dietary=None) -> dict:
+    """Best-ranked restaurants and menu items in one unsharded database, with facets over every matching item"""
+    terms = terms[:MAX_SEARCH_TERMS]
+    return results(limit, restaurant_results(conn, terms, limit, cuisine),
+                   [menu_item_results(conn, terms, limit, cuisine, category, dietary, exclude_dietary)])
+
+
+async def search_shards(terms: list, limit: int, cuisine=None, category=None, dietary=None,
+                        exclude_dietary=None) -> dict:
+    """search() over the catalog's restaurants and every shard's menu items"""
+    terms = terms[:MAX_SEARCH_TERMS]
+    restaurants, item_results = await asyncio.gather(
+        run_db(restaurant_results, terms, limit, cuisine),
+        run_each_shard(menu_item_results, terms, limit, cuisine, category, dietary, exclude_dietary),
+    )
+    return results(limit, restaurants, item_results)
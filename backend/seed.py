@@ -0,0 +1,117 @@
+"""
+Demo data for local development.
+
+Inserted only by `python manage.py seed`, never on server startup. Seeding
+is idempotent: restaurants that already exist keep their rows, and demo
+passwords are hashed only for accounts that are actually inserted.
+"""
+
+import credentials
+
+DEMO_RESTAURANTS = [
+    (1, 'The Golden Spoon', 'Fine Dining', 4.8, 'https://images.pexels.com/photos/262978/pexels-photo-262978.jpeg', 
+     '123 Gourmet Street, Downtown', '+1 (555) 123-4567', 'Exquisite fine dining experience with contemporary cuisine', 
+     'GS001', 'admin123'),
+    (2, 'Sakura Sushi', 'Japanese', 4.6, 'https://images.pexels.com/photos/357756/pexels-photo-357756.jpeg', 
+     '456 Zen Garden Ave, Midtown', '+1 (555) 234-5678', 'Authentic Japanese cuisine with fresh sushi and sashimi', 
+     'SS002', 'admin123'),
+    (3, 'Mama\'s Italian', 'Italian', 4.7, 'https://images.pexels.com/photos/315755/pexels-photo-315755.jpeg', 
+     '789 Pasta Lane, Little Italy', '+1 (555) 345-6789', 'Traditional Italian flavors in a cozy family atmosphere', 
+     'MI003', 'admin123')
+]
+
+DEMO_TABLE_COUNTS = {1: 20, 2: 15, 3: 18}
+
+DEMO_MENU_ITEMS = [
+    # The Golden Spoon
+    (1, 'Wagyu Beef Tenderloin', 'Mains', 89.99, 'Premium wagyu beef with truffle sauce and seasonal vegetables', 
+     'https://images.pexels.com/photos/361184/asparagus-steak-veal-steak-veal-361184.jpeg', 'gluten-free', 1, 1),
+    (1, 'Pan-Seared Salmon', 'Mains', 32.99, 'Fresh Atlantic salmon with lemon herb butter and quinoa', 
+     'https://images.pexels.com/photos/262959/pexels-photo-262959.jpeg', 'gluten-free,healthy', 0, 1),
+    (1, 'Truffle Arancini', 'Starters', 18.99, 'Crispy risotto balls with black truffle and parmesan', 
+     'https://images.pexels.com/photos/4518843/pexels-photo-4518843.jpeg', 'vegetarian', 0, 1),
+    (1, 'Lobster Thermidor', 'Mains', 65.99, 'Fresh lobster with creamy cognac sauce and herbs', 
+     'https://images.pexels.com/photos/725991/pexels-photo-725991.jpeg', 'gluten-free', 0, 1),
+    (1, 'Chocolate Soufflé', 'Desserts', 16.99, 'Warm chocolate soufflé with vanilla ice cream', 
+     'https://images.pexels.com/photos/291528/pexels-photo-291528.jpeg', 'vegetarian', 0, 1),
+    
+    # Sakura Sushi
+    (2, 'Sashimi Platter', 'Sashimi', 45.99, 'Fresh selection of tuna, salmon, and yellowtail', 
+     'https://images.pexels.com/photos/357756/pexels-photo-357756.jpeg', 'gluten-free,healthy', 0, 1),
+    (2, 'Dragon Roll', 'Sushi', 18.99, 'Eel and cucumber topped with avocado and eel sauce', 
+     'https://images.pexels.com/photos/2098085/pexels-photo-2098085.jpeg', '', 0, 1),
+    (2, 'Miso Soup', 'Starters', 6.99, 'Traditional soybean paste soup with tofu and seaweed', 
+     'https://images.pexels.com/photos/5409751/pexels-photo-5409751.jpeg', 'vegetarian,healthy', 0, 1),
+    
+    # Mama's Italian
+    (3, 'Margherita Pizza', 'Pizza', 22.99, 'Fresh mozzarella, tomato sauce, and basil', 
+     'https://images.pexels.com/photos/315755/pexels-photo-315755.jpeg', 'vegetarian', 0, 1),
+    (3, 'Fettuccine Alfredo', 'Pasta', 19.99, 'Creamy parmesan sauce with fresh fettuccine', 
+     'https://images.pexels.com/photos/1279330/pexels-photo-1279330.jpeg', 'vegetarian', 0, 1),
+    (3, 'Tiramisu', 'Desserts', 12.99, 'Classic Italian dessert with coffee and mascarpone', 
+     'https://images.pexels.com/photos/6880219/pexels-photo-6880219.jpeg', 'vegetarian', 0, 1)
+]
+
+DEMO_SUPER_ADMIN = ('Platform Owner', 'owner@restaurantai.com', 'superadmin2025')
+
+
+def _demo_tables(restaurant_id: int) -> list:
+    tables = []
+    table_count = DEMO_TABLE_COUNTS[restaurant_id]
+    for i in range(1, table_count + 1):
+        capacity = [2, 4, 6, 8][i % 4]
+        status = 'available' if i <= table_count * 0.6 else ['reserved', 'occupied', 'cleaning'][i % 3]
+        x = (i % 5) * 18 + 10
+        y = (i // 5) * 20 + 10
+        table_type = ['window', 'corner', 'center', 'private'][i % 4]
+        features = 'WiFi,Power Outlet,Premium View,Quiet Zone'
+        image = 'https://images.pexels.com/photos/67468/pexels-photo-67468.jpeg?auto=compress&cs=tinysrgb&w=300&h=200&fit=crop&crop=center'
+        tables.append((restaurant_id, i, capacity, status, table_type, features, image, x, y))
+    return tables
+
+
+def seed_demo_data(conn) -> dict:
+    """Insert whichever demo restaurants and accounts are missing; returns counts inserted"""
+    cursor = conn.cursor()
+    counts = {"restaurants": 0, "tables": 0, "menu_items": 0, "users": 0}
+
+    cursor.execute(f"SELECT id FROM restaurants WHERE id IN ({', '.join('?' * len(DEMO_RESTAURANTS))})",
+                   [row[0] for row in DEMO_RESTAURANTS])
+    existing = {row[0] for row in cursor.fetchall()}
+    new_restaurants = [row for row in DEMO_RESTAURANTS if row[0] not in existing]
+    new_ids = {row[0] for row in new_restaurants}
+
+    cursor.executemany('''
+        INSERT INTO restaurants
+        (id, name, cuisine, rating, image, address, phone, description, admin_id, admin_password_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [row[:-1] + (credentials.hash_password(row[-1]),) for row in new_restaurants])
+    counts["restaurants"] = len(new_restaurants)
+
+    tables = [table for restaurant_id in sorted(new_ids) for table in _demo_tables(restaurant_id)]
+    cursor.executemany('''
+        INSERT INTO tables
+        (restaurant_id, number, capacity, status, type, features, image, x, y)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', tables)
+    counts["tables"] = len(tables)
+
+    menu_items = [item for item in DEMO_MENU_ITEMS if item[0] in new_ids]
+    cursor.executemany('''
+        INSERT INTO menu_items
+        (restaurant_id, name, category, price, description, image, dietary, chef_special, available)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', menu_items)
+    counts["menu_items"] = len(menu_items)
+
+    name, email, password = DEMO_SUPER_ADMIN
+    cursor.execute("SELECT 1 FROM users WHERE email = ?", (email,))
+    if cursor.fetchone() is None:
+        cursor.execute('''
+            INSERT INTO users (name, email, password_hash, role)
+            VALUES (?, ?, ?, 'superadmin')
+        ''', (name, email, credentials.hash_password(password)))
+        counts["users"] = 1
+
+    conn.commit()
+    return counts
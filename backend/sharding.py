@@ -0,0 +1,214 @@
+"""
+Splitting a database into a catalog and restaurant shards.
+
+`python manage.py split-shards --shards N --output DIR` copies the database
+at DATABASE_PATH into DIR/catalog.db and N shard files; the source is only
+read. Point DATABASE_PATH at the new catalog to serve from the split.
+
+- The catalog keeps users, restaurants and the AI chat history, and lists
+  the shard files in its shards table (see database.ShardMap).
+- Shard k gets the tables, menu items, orders, order items and bookings of
+  the restaurants whose id % N == k, plus a copy of those restaurants' rows
+  without their admin credentials, so directory, menu, pricing and search
+  queries run inside the shard. menu_version is maintained in the shard
+  copy, the only place menu writes reach.
+- Every file has the full schema, so the triggers keep platform_stats,
+  the sales rollups and the search and dietary indexes per file. The
+  catalog's platform_stats counts restaurants and users, each shard's its
+  orders, bookings and revenue; merge_platform_stats() adds them up.
+- Shard k's AUTOINCREMENT sequences continue from k << SHARD_ID_BITS, or the
+  source's last id for shard 0, so new ids never collide across shards.
+
+N equal to the number of restaurants gives every restaurant its own file.
+Restaurants are only added by seeding and generating, which work on an
+unsharded database, so split after loading them.
+"""
+
+import os
+import sqlite3
+import time
+
+import migrations
+import queries
+
+SHARD_ID_BITS = 40
+
+CATALOG_TABLES = ("users", "restaurants", "ai_chat_history")
+# (table, parent table, column referencing the parent's id), copied in order
+SHARD_TABLES = (
+    ("tables", "restaurants", "restaurant_id"),
+    ("menu_items", "restaurants", "restaurant_id"),
+    ("orders", "restaurants", "restaurant_id"),
+    ("order_items", "orders", "order_id"),
+    ("bookings", "restaurants", "restaurant_id"),
+)
+# Catalog columns left out of the shard copies of restaurants
+REPLICA_BLANKED = {"admin_password_hash": "''"}
+
+TENANT_STATS_FIELDS = ("total_orders", "total_bookings", "total_revenue")
+
+
+def shard_path(index: int) -> str:
+    return f"shard_{index:04d}.db"
+
+
+def merge_platform_stats(catalog: dict, shard_stats: list) -> dict:
+    """Platform totals from the catalog's platform_stats and every shard's"""
+    merged = dict(catalog)
+    for field in TENANT_STATS_FIELDS:
+        merged[field] = sum(stats[field] for stats in shard_stats)
+    merged['total_revenue'] = round(merged['total_revenue'], 2)
+    return merged
+
+
+def merge_dietary_tags(shard_tags: list) -> list:
+    """Per-shard list_dietary_tags() results as one list, counts added up by tag name"""
+    items = {}
+    for tags in shard_tags:
+        for tag in tags:
+            items[tag['name']] = items.get(tag['name'], 0) + tag['items']
+    return [{"name": name, "items": count} for name, count in items.items()]
+
+
+def migrate_shards(shard_map, target: int = None) -> dict:
+    """Apply pending migrations to every shard file; returns {path: applied versions}
+
+    Shard files are migrated over plain connections, since pooled ones see
+    the catalog's users through a view.
+    """
+    applied = {}
+    if shard_map.sharded:
+        for shard in shard_map.pools:
+            conn = sqlite3.connect(shard.database)
+            conn.row_factory = sqlite3.Row
+            try:
+                applied[shard.database] = migrations.migrate(conn, target)
+            finally:
+                conn.close()
+    return applied
+
+
+class Splitter:
+    """Copies one unsharded database into a catalog and shard_count shard files"""
+
+    def __init__(self, source: str, output: str, shard_count: int, progress=print):
+        self.source = os.path.abspath(source)
+        self.output = output
+        self.shard_count = shard_count
+        self.progress = progress
+
+    def _columns(self, conn, schema: str, table: str) -> list:
+        return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})").fetchall()]
+
+    def _copy(self, conn, table: str, source_sql: str, params=(), overrides=None) -> int:
+        """INSERT the source rows selected by 'SELECT <columns> <source_sql>' into main.table"""
+        source_columns = set(self._columns(conn, "source", table))
+        columns = [column for column in self._columns(conn, "main", table) if column in source_columns]
+        values = [(overrides or {}).get(column, f"x.{column}") for column in columns]
+        cursor = conn.execute(
+            f"INSERT INTO main.{table} ({', '.join(columns)}) SELECT {', '.join(values)} {source_sql}",
+            params
+        )
+        return cursor.rowcount
+
+    def _copy_dietary_tags(self, conn):
+        # Same bits as the source; migration 9 has seeded only the standard tags
+        conn.execute("DELETE FROM main.dietary_tags")
+        self._copy(conn, "dietary_tags", "FROM source.dietary_tags x")
+
+    def _build(self, path: str, load) -> dict:
+        """Create a migrated file at path, fill it with load(conn) and rebuild what triggers maintain"""
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        try:
+            migrations.migrate(conn)
+            # As in datagen: indexes and triggers are recreated once the rows are in
+            deferred = conn.execute('''
+                SELECT type, name, sql FROM sqlite_master
+                WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+            ''').fetchall()
+            for kind, name, _ in deferred:
+                conn.execute(f"DROP {kind.upper()} {name}")
+            conn.commit()
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("ATTACH DATABASE ? AS source", (self.source,))
+
+            counts = load(conn)
+            conn.commit()
+            conn.execute("DETACH DATABASE source")
+
+            for kind, _, sql in deferred:
+                if kind == 'index':
+                    conn.execute(sql)
+            queries.rebuild_sales_rollups(conn)
+            queries.reconcile_platform_stats(conn, fix=True)
+            queries.rebuild_dietary_index(conn)
+            queries.rebuild_search_index(conn)
+            for kind, _, sql in deferred:
+                if kind == 'trigger':
+                    conn.execute(sql)
+            conn.commit()
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA journal_mode = WAL")
+        finally:
+            conn.close()
+        return counts
+
+    def _load_catalog(self, conn) -> dict:
+        counts = {table: self._copy(conn, table, f"FROM source.{table} x") for table in CATALOG_TABLES}
+        self._copy_dietary_tags(conn)
+        conn.executemany("INSERT INTO shards (id, path) VALUES (?, ?)",
+                         [(index, shard_path(index)) for index in range(self.shard_count)])
+        return counts
+
+    def _load_shard(self, conn, index: int, last_ids: dict) -> dict:
+        counts = {"restaurants": self._copy(conn, "restaurants", "FROM source.restaurants x WHERE x.id % ? = ?",
+                                            (self.shard_count, index), overrides=REPLICA_BLANKED)}
+        # Walk this shard's parent rows and probe the source's indexes for their children
+        for table, parent, column in SHARD_TABLES:
+            counts[table] = self._copy(conn, table, f'''
+                FROM main.{parent} p CROSS JOIN source.{table} x ON x.{column} = p.id
+            ''')
+        self._copy_dietary_tags(conn)
+
+        first_id = index << SHARD_ID_BITS
+        for table, _, _ in SHARD_TABLES:
+            seq = max(first_id, last_ids.get(table, 0))
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, seq))
+        return counts
+
+    def split(self) -> dict:
+        """Write the catalog and shard files; the output directory must not hold a catalog yet"""
+        if self.shard_count < 1:
+            raise ValueError("Need at least one shard")
+        catalog_path = os.path.join(self.output, "catalog.db")
+        if os.path.exists(catalog_path):
+            raise FileExistsError(f"{catalog_path} already exists")
+        os.makedirs(self.output, exist_ok=True)
+
+        source = sqlite3.connect(self.source)
+        try:
+            if migrations.current_version(source) < migrations.latest_version():
+                raise ValueError(f"{self.source} is not fully migrated; run `manage.py migrate` first")
+            if source.execute("SELECT COUNT(*) FROM shards").fetchone()[0]:
+                raise ValueError(f"{self.source} is already a sharded catalog")
+            last_ids = dict(source.execute("SELECT name, seq FROM sqlite_sequence").fetchall())
+        finally:
+            source.close()
+        if max(last_ids.values(), default=0) >= 1 << SHARD_ID_BITS:
+            raise ValueError(f"Source ids exceed {SHARD_ID_BITS} bits; shard id ranges would overlap")
+
+        start = time.perf_counter()
+        shards = []
+        for index in range(self.shard_count):
+            path = os.path.join(self.output, shard_path(index))
+            counts = self._build(path, lambda conn: self._load_shard(conn, index, last_ids))
+            shards.append({"path": path, **counts})
+            self.progress(f"  {shard_path(index)}: {counts['restaurants']:,} restaurants, "
+                          f"{counts['orders']:,} orders, {counts['bookings']:,} bookings")
+        # The catalog goes last: until it lists the shards, nothing treats the output as a split
+        catalog = self._build(catalog_path, self._load_catalog)
+        self.progress(f"  catalog.db: {catalog['users']:,} users, {catalog['restaurants']:,} restaurants")
+        return {"catalog": catalog_path, "shards": shards, "seconds": round(time.perf_counter() - start, 2)}